@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class UserContextBackend(ModelBackend):
+    """
+    Autenticação padrão do Django, mas o usuário da sessão é carregado junto
+    com perfil, assinatura, salão e vínculo de funcionário em uma única
+    consulta, em vez de uma consulta por relação a cada acesso em views e
+    templates.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related(
+                'profile', 'subscription', 'salon', 'employee_profile__salon'
+            ).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -7,6 +7,7 @@ from django.views.generic import CreateView
 from django.contrib.auth.views import LoginView
 from .forms import CustomUserCreationForm, UserProfileForm
 from .models import UserProfile
+from subscriptions.utils.access import subscription_access
 
 class RegisterView(CreateView):
     form_class = CustomUserCreationForm
@@ -36,12 +37,12 @@ def register_view(request):
             
             # Se for plano pago (VIP), fazer login automático e redirecionar para pagamento
             if plan == 'vip':
-                login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+                login(request, user, backend='accounts.backends.UserContextBackend')
                 
                 # Buscar o plano VIP para redirecionar para pagamento
-                from admin_panel.models import PlanPricing
+                from admin_panel.utils.pricing import get_plan
                 try:
-                    vip_plan = PlanPricing.objects.filter(plan_type='vip_30', is_active=True).first()
+                    vip_plan = get_plan('vip_30')
                     if vip_plan:
                         messages.info(request, 'Conta criada! Complete o pagamento para ativar sua assinatura VIP.')
                         return redirect('payments:gerar_pix', plan_id=vip_plan.id)
@@ -110,15 +111,15 @@ def dashboard_view(request):
     
     if profile.user_type == 'owner':
         # Verificar se tem assinatura ativa
-        subscription = getattr(request.user, 'subscription', None)
+        access = subscription_access(request)
         
         # Se não tem assinatura, redirecionar para escolher plano
-        if not subscription:
+        if not access['exists']:
             messages.info(request, 'Escolha um plano para começar a usar o sistema.')
             return redirect('subscriptions:detail')
         
         # Se tem assinatura mas ela expirou, redirecionar para renovação
-        if subscription and not subscription.is_active():
+        if not access['active']:
             messages.warning(request, 'Sua assinatura expirou. Renove para continuar usando o sistema.')
             return redirect('subscriptions:detail')
         
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from admin_panel.utils.cashback import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = 'Confere os saldos de cashback contra as transações e corrige divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas informa as divergências, sem corrigir',
+        )
+
+    def handle(self, *args, **options):
+        drifted, missing = reconcile_balances(dry_run=options['dry_run'])
+        action = 'encontrado(s)' if options['dry_run'] else 'corrigido(s)'
+        self.stdout.write(
+            self.style.SUCCESS(f'{drifted} saldo(s) divergente(s) e {missing} saldo(s) ausente(s) {action}')
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from admin_panel.utils.metrics import refresh_platform_metrics
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os indicadores da plataforma exibidos nos painéis do administrador'
+
+    def handle(self, *args, **options):
+        metrics = refresh_platform_metrics()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Indicadores atualizados em {timezone.localtime(metrics["computed_at"]):%d/%m/%Y %H:%M:%S}'
+            )
+        )
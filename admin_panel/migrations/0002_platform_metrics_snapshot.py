@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformMetricsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(default='platform', max_length=30, unique=True, verbose_name='Chave')),
+                ('total_owners', models.PositiveIntegerField(default=0, verbose_name='Comerciantes')),
+                ('total_clients', models.PositiveIntegerField(default=0, verbose_name='Clientes')),
+                ('total_salons', models.PositiveIntegerField(default=0, verbose_name='Salões')),
+                ('total_appointments', models.PositiveIntegerField(default=0, verbose_name='Agendamentos')),
+                ('active_subscriptions', models.PositiveIntegerField(default=0, verbose_name='Assinaturas vigentes')),
+                ('expired_subscriptions', models.PositiveIntegerField(default=0, verbose_name='Assinaturas vencidas')),
+                ('expiring_soon', models.PositiveIntegerField(default=0, verbose_name='Expirando em breve')),
+                ('trial_count', models.PositiveIntegerField(default=0, verbose_name='Plano teste')),
+                ('vip_count', models.PositiveIntegerField(default=0, verbose_name='Plano VIP')),
+                ('active_count', models.PositiveIntegerField(default=0, verbose_name='Status ativo')),
+                ('expired_count', models.PositiveIntegerField(default=0, verbose_name='Status expirado')),
+                ('cancelled_count', models.PositiveIntegerField(default=0, verbose_name='Status cancelado')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado em')),
+            ],
+            options={
+                'verbose_name': 'Indicadores da Plataforma',
+                'verbose_name_plural': 'Indicadores da Plataforma',
+            },
+        ),
+    ]
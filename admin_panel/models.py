@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
 from decimal import Decimal
 import uuid
 
@@ -138,17 +140,9 @@ class PlanPricing(models.Model):
     
     @classmethod
     def get_plan_price(cls, plan_type):
-        """Retorna o preço de um plano específico"""
-        try:
-            plan = cls.objects.get(plan_type=plan_type, is_active=True)
-            return plan.price
-        except cls.DoesNotExist:
-            # Valores padrão caso não existam na base
-            defaults = {
-                'trial_10': Decimal('0.00'),
-                'vip_30': Decimal('49.90'),
-            }
-            return defaults.get(plan_type, Decimal('0.00'))
+        """Retorna o preço de um plano específico (do registro de preços em cache)"""
+        from .utils.pricing import plan_price
+        return plan_price(plan_type)
     
     class Meta:
         verbose_name = "Preço do Plano"
@@ -276,6 +270,31 @@ class CashbackTransaction(models.Model):
     
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.user.email} - R$ {self.amount}"
+
+    # Campos que definem o efeito da transação no saldo
+    BALANCE_FIELDS = ('user_id', 'transaction_type', 'amount')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Guarda usuário, tipo e valor carregados para corrigir o saldo se a
+        transação for alterada. Com only()/defer() sem esses campos nada é
+        guardado (ler um campo adiado aqui voltaria a chamar from_db).
+        """
+        instance = super().from_db(db, field_names, values)
+        if set(cls.BALANCE_FIELDS) <= set(field_names):
+            instance._loaded_balance = instance.loaded_balance()
+        return instance
+
+    def loaded_balance(self):
+        """(usuário, tipo, valor) com os campos em memória, ou None se algum foi adiado"""
+        if not all(name in self.__dict__ for name in self.BALANCE_FIELDS):
+            return None
+        return self.user_id, self.transaction_type, self.amount
+
+    def stored_balance(self):
+        """(usuário, tipo, valor) gravados no banco, em uma consulta, ou None"""
+        return CashbackTransaction.objects.filter(pk=self.pk).values_list(*self.BALANCE_FIELDS).first()
     
     class Meta:
         verbose_name = "Transação de Cashback"
@@ -319,14 +338,13 @@ class UserCashbackBalance(models.Model):
         return f"{self.user.email} - Saldo: R$ {self.available_balance}"
     
     def update_balance(self):
-        """Atualiza o saldo baseado nas transações"""
-        earned = self.user.cashback_transactions.filter(
-            transaction_type='earned'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-        
-        paid = self.user.cashback_transactions.filter(
-            transaction_type='paid'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        """
+        Recalcula o saldo a partir de todas as transações (uma consulta).
+        O saldo já é mantido pelos sinais das transações; use para reparos pontuais.
+        """
+        from .utils.cashback import transaction_totals
+
+        earned, paid = transaction_totals([self.user_id]).get(self.user_id, (Decimal('0.00'), Decimal('0.00')))
         
         self.total_earned = earned
         self.total_paid = paid
@@ -336,3 +354,110 @@ class UserCashbackBalance(models.Model):
     class Meta:
         verbose_name = "Saldo de Cashback"
         verbose_name_plural = "Saldos de Cashback"
+
+
+class PlatformMetricsSnapshot(models.Model):
+    """Indicadores da plataforma pré-calculados para os painéis do administrador"""
+
+    key = models.CharField(max_length=30, unique=True, default='platform', verbose_name='Chave')
+
+    total_owners = models.PositiveIntegerField(default=0, verbose_name='Comerciantes')
+    total_clients = models.PositiveIntegerField(default=0, verbose_name='Clientes')
+    total_salons = models.PositiveIntegerField(default=0, verbose_name='Salões')
+    total_appointments = models.PositiveIntegerField(default=0, verbose_name='Agendamentos')
+
+    # Assinaturas vigentes, vencidas e expirando em 3 dias (na data do cálculo)
+    active_subscriptions = models.PositiveIntegerField(default=0, verbose_name='Assinaturas vigentes')
+    expired_subscriptions = models.PositiveIntegerField(default=0, verbose_name='Assinaturas vencidas')
+    expiring_soon = models.PositiveIntegerField(default=0, verbose_name='Expirando em breve')
+
+    # Assinaturas por plano e por status
+    trial_count = models.PositiveIntegerField(default=0, verbose_name='Plano teste')
+    vip_count = models.PositiveIntegerField(default=0, verbose_name='Plano VIP')
+    active_count = models.PositiveIntegerField(default=0, verbose_name='Status ativo')
+    expired_count = models.PositiveIntegerField(default=0, verbose_name='Status expirado')
+    cancelled_count = models.PositiveIntegerField(default=0, verbose_name='Status cancelado')
+
+    computed_at = models.DateTimeField(verbose_name='Calculado em')
+
+    METRIC_FIELDS = (
+        'total_owners', 'total_clients', 'total_salons', 'total_appointments',
+        'active_subscriptions', 'expired_subscriptions', 'expiring_soon',
+        'trial_count', 'vip_count', 'active_count', 'expired_count', 'cancelled_count',
+    )
+
+    def __str__(self):
+        return f"Indicadores da plataforma em {timezone.localtime(self.computed_at):%d/%m/%Y %H:%M}"
+
+    def as_dict(self):
+        """Indicadores e a data do cálculo"""
+        data = {name: getattr(self, name) for name in self.METRIC_FIELDS}
+        data['computed_at'] = self.computed_at
+        return data
+
+    class Meta:
+        verbose_name = "Indicadores da Plataforma"
+        verbose_name_plural = "Indicadores da Plataforma"
+
+
+@receiver(pre_save, sender=CashbackTransaction)
+@receiver(pre_delete, sender=CashbackTransaction)
+def snapshot_cashback_transaction(sender, instance, **kwargs):
+    """
+    Transação carregada sem usuário, tipo ou valor (only/defer): lê do banco,
+    antes da alteração, o efeito que os sinais seguintes vão descontar.
+    """
+    if instance._state.adding or getattr(instance, '_loaded_balance', None) is not None:
+        return
+    instance._loaded_balance = instance.stored_balance()
+
+
+@receiver(post_save, sender=CashbackTransaction)
+def update_cashback_balance_on_save(sender, instance, created, **kwargs):
+    """Soma a transação ao saldo (e retira o efeito antigo quando é uma alteração)"""
+    from .utils.cashback import apply_balance_delta, balance_delta
+
+    # Estado novo sem ler campos adiados: da memória ou, se faltar algo, do banco
+    current = instance.loaded_balance() or instance.stored_balance()
+
+    # Um delta líquido por usuário: se o saldo ainda não existe, ele é criado
+    # a partir dos totais (que já incluem a alteração) sem somar nada depois
+    deltas = {}
+    loaded = getattr(instance, '_loaded_balance', None)
+    if loaded and not created:
+        old_user_id, old_type, old_amount = loaded
+        earned, paid = balance_delta(old_type, old_amount)
+        deltas[old_user_id] = -earned, -paid
+
+    if current:
+        user_id, transaction_type, amount = current
+        earned, paid = balance_delta(transaction_type, amount)
+        old_earned, old_paid = deltas.get(user_id, (0, 0))
+        deltas[user_id] = old_earned + earned, old_paid + paid
+
+    for user_id, (earned, paid) in deltas.items():
+        apply_balance_delta(user_id, earned, paid)
+    instance._loaded_balance = current
+
+
+@receiver(post_delete, sender=CashbackTransaction)
+def update_cashback_balance_on_delete(sender, instance, **kwargs):
+    """Retira a transação apagada do saldo"""
+    from .utils.cashback import apply_balance_delta, balance_delta
+
+    loaded = getattr(instance, '_loaded_balance', None) or instance.loaded_balance()
+    if loaded is None:
+        return
+    user_id, transaction_type, amount = loaded
+    earned, paid = balance_delta(transaction_type, amount)
+    apply_balance_delta(user_id, -earned, -paid)
+
+
+@receiver(post_save, sender=PlanPricing)
+@receiver(post_delete, sender=PlanPricing)
+def invalidate_plan_pricing_registry(sender, instance, **kwargs):
+    """Preço, descrição ou status de um plano mudou: recarrega o registro após o commit"""
+    from django.db import transaction
+    from .utils.pricing import invalidate_plan_pricing
+
+    transaction.on_commit(invalidate_plan_pricing)
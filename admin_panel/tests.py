@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from admin_panel.models import CashbackTransaction, Product, PurchaseTracking, UserCashbackBalance
+from admin_panel.utils.cashback import reconcile_balances
+
+
+class CashbackBalanceTests(TestCase):
+    """Saldo de cashback mantido por deltas e conferido pela reconciliação"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        self.product = Product.objects.create(
+            name='Shampoo', description='Shampoo', category='other', brand='Marca', price=Decimal('50.00'),
+            affiliate_link='https://example.com/shampoo', cashback_percentage=Decimal('10.00')
+        )
+
+    def add_transaction(self, amount, transaction_type='earned', user=None):
+        user = user or self.user
+        purchase = PurchaseTracking.objects.create(
+            product=self.product, user=user, purchase_amount=Decimal('50.00'),
+            cashback_percentage_at_purchase=Decimal('10.00'), cashback_amount=amount, ip_address='127.0.0.1'
+        )
+        return CashbackTransaction.objects.create(
+            purchase_tracking=purchase, user=user, transaction_type=transaction_type,
+            amount=amount, description='Cashback'
+        )
+
+    def balance(self, user=None):
+        balance = UserCashbackBalance.objects.get(user=user or self.user)
+        return balance.total_earned, balance.total_paid, balance.available_balance
+
+    def test_deltas_follow_create_edit_and_delete(self):
+        earned = self.add_transaction(Decimal('10.00'))
+        self.add_transaction(Decimal('4.00'), 'paid')
+        self.assertEqual(self.balance(), (Decimal('10.00'), Decimal('4.00'), Decimal('6.00')))
+
+        earned = CashbackTransaction.objects.get(pk=earned.pk)
+        earned.amount = Decimal('12.00')
+        earned.save()
+        self.assertEqual(self.balance(), (Decimal('12.00'), Decimal('4.00'), Decimal('8.00')))
+
+        earned.delete()
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('4.00'), Decimal('-4.00')))
+
+    def test_edit_without_balance_row_is_not_counted_twice(self):
+        transaction = self.add_transaction(Decimal('10.00'))
+        UserCashbackBalance.objects.all().delete()
+
+        transaction = CashbackTransaction.objects.get(pk=transaction.pk)
+        transaction.amount = Decimal('15.00')
+        transaction.save()
+        self.assertEqual(self.balance(), (Decimal('15.00'), Decimal('0.00'), Decimal('15.00')))
+
+    def test_moving_a_transaction_to_another_user(self):
+        other = User.objects.create_user('outro', 'outro@example.com', 'senha')
+        self.add_transaction(Decimal('1.00'), user=other)
+        transaction = CashbackTransaction.objects.get(pk=self.add_transaction(Decimal('10.00')).pk)
+
+        transaction.user = other
+        transaction.save()
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('0.00'), Decimal('0.00')))
+        self.assertEqual(self.balance(other), (Decimal('11.00'), Decimal('0.00'), Decimal('11.00')))
+
+    def test_deferred_fields_do_not_recurse(self):
+        transaction = self.add_transaction(Decimal('10.00'))
+        self.assertEqual(CashbackTransaction.objects.only('id').get(pk=transaction.pk).amount, Decimal('10.00'))
+
+        deferred = CashbackTransaction.objects.only('id', 'description').get(pk=transaction.pk)
+        deferred.description = 'Alterado'
+        deferred.save()
+        self.assertEqual(self.balance(), (Decimal('10.00'), Decimal('0.00'), Decimal('10.00')))
+
+        CashbackTransaction.objects.only('id').get(pk=transaction.pk).delete()
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('0.00'), Decimal('0.00')))
+
+    def test_reconcile_fixes_drift_and_creates_missing_balances(self):
+        self.add_transaction(Decimal('10.00'))
+        self.add_transaction(Decimal('3.00'), 'paid')
+        other = User.objects.create_user('outro', 'outro@example.com', 'senha')
+        self.add_transaction(Decimal('7.00'), user=other)
+
+        UserCashbackBalance.objects.filter(user=self.user).update(total_earned=Decimal('99.00'))
+        UserCashbackBalance.objects.filter(user=other).delete()
+
+        self.assertEqual(reconcile_balances(dry_run=True), (1, 1))
+        self.assertEqual(self.balance()[0], Decimal('99.00'))
+
+        self.assertEqual(reconcile_balances(), (1, 1))
+        self.assertEqual(self.balance(), (Decimal('10.00'), Decimal('3.00'), Decimal('7.00')))
+        self.assertEqual(self.balance(other), (Decimal('7.00'), Decimal('0.00'), Decimal('7.00')))
+        self.assertEqual(reconcile_balances(), (0, 0))
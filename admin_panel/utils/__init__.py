@@ -0,0 +1 @@
+# Utils package for admin_panel
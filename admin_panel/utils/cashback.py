@@ -0,0 +1,153 @@
+"""
+Saldos de cashback.
+O UserCashbackBalance é mantido por deltas atômicos (F()) a cada transação
+gravada, em vez de somar todo o histórico do usuário. A reconciliação em lote
+confere e corrige eventuais divergências.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+# Efeito de cada tipo de transação no saldo: (ganho, pago)
+BALANCE_EFFECTS = {
+    'earned': (1, 0),
+    'paid': (0, 1),
+}
+
+
+def balance_delta(transaction_type, amount):
+    """(delta ganho, delta pago) de uma transação; tipos sem efeito retornam zeros"""
+    earned_sign, paid_sign = BALANCE_EFFECTS.get(transaction_type, (0, 0))
+    amount = Decimal(str(amount))
+    return amount * earned_sign, amount * paid_sign
+
+
+def transaction_totals(users=None):
+    """
+    Totais ganho/pago por usuário a partir das transações, em uma consulta.
+
+    Returns:
+        dict: user_id -> (total_earned, total_paid)
+    """
+    from admin_panel.models import CashbackTransaction
+
+    zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=10, decimal_places=2))
+    transactions = CashbackTransaction.objects.all()
+    if users is not None:
+        transactions = transactions.filter(user__in=users)
+
+    rows = transactions.values('user_id').annotate(
+        earned=Coalesce(Sum('amount', filter=Q(transaction_type='earned')), zero),
+        paid=Coalesce(Sum('amount', filter=Q(transaction_type='paid')), zero),
+    ).order_by()
+    return {row['user_id']: (row['earned'], row['paid']) for row in rows}
+
+
+def apply_balance_delta(user_id, earned, paid):
+    """
+    Soma os deltas ao saldo do usuário com um UPDATE atômico. Se o saldo ainda
+    não existe, ele é criado já com os totais de todas as transações.
+    """
+    from admin_panel.models import UserCashbackBalance
+
+    if not earned and not paid:
+        return
+
+    balance = UserCashbackBalance.objects.filter(user_id=user_id)
+    if balance.update(
+        total_earned=F('total_earned') + earned,
+        total_paid=F('total_paid') + paid,
+        available_balance=F('available_balance') + earned - paid,
+        updated_at=timezone.now()
+    ):
+        return
+
+    total_earned, total_paid = transaction_totals([user_id]).get(user_id, (Decimal('0.00'), Decimal('0.00')))
+    try:
+        with transaction.atomic():
+            UserCashbackBalance.objects.create(
+                user_id=user_id,
+                total_earned=total_earned,
+                total_paid=total_paid,
+                available_balance=total_earned - total_paid
+            )
+    except IntegrityError:
+        # Outra transação criou o saldo no meio tempo
+        balance.update(
+            total_earned=F('total_earned') + earned,
+            total_paid=F('total_paid') + paid,
+            available_balance=F('available_balance') + earned - paid,
+            updated_at=timezone.now()
+        )
+
+
+def reconcile_balances(dry_run=False, batch_size=500):
+    """
+    Confere todos os saldos contra as transações e corrige os divergentes em
+    lote (bulk_update/bulk_create).
+
+    Os saldos a corrigir são travados (select_for_update) e os totais deles
+    recalculados com a trava, para não perder deltas gravados no meio tempo.
+
+    Returns:
+        Tuple[int, int]: (saldos corrigidos, saldos criados)
+    """
+    from admin_panel.models import UserCashbackBalance
+
+    totals = transaction_totals()
+    zero = (Decimal('0.00'), Decimal('0.00'))
+
+    drifted_ids = []
+    seen = set()
+    for balance in UserCashbackBalance.objects.order_by('pk').iterator(chunk_size=batch_size):
+        seen.add(balance.user_id)
+        total_earned, total_paid = totals.get(balance.user_id, zero)
+        if (balance.total_earned, balance.total_paid, balance.available_balance) != (
+            total_earned, total_paid, total_earned - total_paid
+        ):
+            drifted_ids.append(balance.user_id)
+
+    missing = [
+        UserCashbackBalance(
+            user_id=user_id,
+            total_earned=total_earned,
+            total_paid=total_paid,
+            available_balance=total_earned - total_paid
+        )
+        for user_id, (total_earned, total_paid) in totals.items()
+        if user_id not in seen
+    ]
+
+    if dry_run:
+        return len(drifted_ids), len(missing)
+
+    now = timezone.now()
+    drifted = 0
+    for start in range(0, len(drifted_ids), batch_size):
+        user_ids = drifted_ids[start:start + batch_size]
+        with transaction.atomic():
+            balances = list(
+                UserCashbackBalance.objects.select_for_update().filter(user_id__in=user_ids).order_by('pk')
+            )
+            locked_totals = transaction_totals(user_ids)
+            changed = []
+            for balance in balances:
+                total_earned, total_paid = locked_totals.get(balance.user_id, zero)
+                expected = (total_earned, total_paid, total_earned - total_paid)
+                if (balance.total_earned, balance.total_paid, balance.available_balance) != expected:
+                    balance.total_earned, balance.total_paid, balance.available_balance = expected
+                    balance.updated_at = now
+                    changed.append(balance)
+            UserCashbackBalance.objects.bulk_update(
+                changed, ['total_earned', 'total_paid', 'available_balance', 'updated_at'], batch_size=batch_size
+            )
+            drifted += len(changed)
+
+    # Saldos que passaram a existir desde a leitura são mantidos
+    UserCashbackBalance.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+
+    return drifted, len(missing)
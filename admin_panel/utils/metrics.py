@@ -0,0 +1,88 @@
+"""
+Indicadores da plataforma para os painéis do administrador.
+Os totais são calculados periodicamente (refresh_platform_metrics) e guardados
+em PlatformMetricsSnapshot e no cache; os painéis leem o instantâneo e mostram
+a data do cálculo. Se o instantâneo estiver velho demais, é recalculado na hora.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.utils.cache import cached_get
+
+
+PLATFORM_METRICS_CACHE_KEY = 'admin_panel:platform_metrics'
+
+
+def get_max_age():
+    """Idade máxima (segundos) do instantâneo antes de recalcular"""
+    return getattr(settings, 'PLATFORM_METRICS_MAX_AGE_SECONDS', 300)
+
+
+def compute_platform_metrics(now=None):
+    """Calcula os indicadores a partir das tabelas (quatro consultas de agregação)"""
+    from appointments.models import Appointment
+    from salons.models import Salon
+    from salons.utils.stats import subscription_stats, user_type_stats
+
+    subscriptions = subscription_stats(now)
+    return {
+        **user_type_stats(),
+        'total_salons': Salon.objects.count(),
+        'total_appointments': Appointment.objects.count(),
+        'active_subscriptions': subscriptions['active'],
+        'expired_subscriptions': subscriptions['expired'],
+        'expiring_soon': subscriptions['expiring_soon'],
+        'trial_count': subscriptions['trial_count'],
+        'vip_count': subscriptions['vip_count'],
+        'active_count': subscriptions['active_count'],
+        'expired_count': subscriptions['expired_count'],
+        'cancelled_count': subscriptions['cancelled_count'],
+    }
+
+
+def refresh_platform_metrics():
+    """
+    Recalcula e grava o instantâneo dos indicadores.
+
+    Returns:
+        dict: Indicadores e computed_at
+    """
+    from admin_panel.models import PlatformMetricsSnapshot
+
+    now = timezone.now()
+    snapshot, created = PlatformMetricsSnapshot.objects.update_or_create(
+        key='platform',
+        defaults={**compute_platform_metrics(now), 'computed_at': now}
+    )
+    metrics = snapshot.as_dict()
+    cache.set(PLATFORM_METRICS_CACHE_KEY, metrics, get_max_age())
+    return metrics
+
+
+def get_platform_metrics(force_refresh=False):
+    """
+    Indicadores da plataforma: do cache, do instantâneo gravado ou, se não
+    houver um recente, recalculados na hora.
+
+    Returns:
+        dict: Indicadores e computed_at (data do cálculo)
+    """
+    from admin_panel.models import PlatformMetricsSnapshot
+
+    if force_refresh:
+        return refresh_platform_metrics()
+
+    metrics = cached_get('platform_metrics', PLATFORM_METRICS_CACHE_KEY)
+    if metrics is not None:
+        return metrics
+
+    snapshot = PlatformMetricsSnapshot.objects.filter(key='platform').first()
+    if snapshot:
+        remaining = get_max_age() - (timezone.now() - snapshot.computed_at).total_seconds()
+        if remaining > 0:
+            metrics = snapshot.as_dict()
+            cache.set(PLATFORM_METRICS_CACHE_KEY, metrics, int(remaining) or 1)
+            return metrics
+
+    return refresh_platform_metrics()
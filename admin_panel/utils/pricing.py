@@ -0,0 +1,100 @@
+"""
+Registro de preços dos planos (PlanPricing ativos).
+Os planos são lidos do banco de uma vez e guardados no cache compartilhado e
+em memória no processo. Alterações em PlanPricing trocam a versão do registro
+(após o commit), o que faz todos os processos recarregarem na próxima leitura.
+Valores cobrados (PIX e checkout) não usam o registro: são lidos do banco no
+momento do pagamento.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from core.utils.cache import bump_version, cached_get, get_version
+
+
+PLAN_PRICING_CACHE_KEY = 'admin_panel:plan_pricing'
+PLAN_PRICING_VERSION_KEY = 'admin_panel:plan_pricing:version'
+
+# Limite de segurança no cache compartilhado; a invalidação é feita pelos sinais
+PLAN_PRICING_CACHE_TIMEOUT = 60 * 60
+
+# Valores usados quando o plano não está cadastrado (ou está inativo)
+DEFAULT_PRICES = {
+    'trial_10': Decimal('0.00'),
+    'vip_30': Decimal('49.90'),
+}
+
+DEFAULT_DESCRIPTIONS = {
+    'trial_10': 'Teste gratuito por 10 dias com acesso completo',
+    'vip_30': 'Plano premium com todos os recursos por 30 dias',
+}
+
+# Cópia local do processo: (versão, planos por tipo)
+_registry = {'version': None, 'plans': {}}
+
+
+def load_active_plans():
+    """Planos ativos direto do banco, por tipo (uma consulta)"""
+    from admin_panel.models import PlanPricing
+
+    return {plan.plan_type: plan for plan in PlanPricing.objects.filter(is_active=True).order_by('plan_type')}
+
+
+def active_plans():
+    """
+    Planos ativos por tipo: da memória do processo se a versão não mudou,
+    senão do cache compartilhado e, por último, do banco.
+    """
+    version = get_version(PLAN_PRICING_VERSION_KEY)
+    if _registry['version'] == version:
+        return _registry['plans']
+
+    key = f"{PLAN_PRICING_CACHE_KEY}:v{version}"
+    plans = cached_get('plan_pricing', key)
+    if plans is None:
+        plans = load_active_plans()
+        cache.set(key, plans, PLAN_PRICING_CACHE_TIMEOUT)
+
+    _registry['version'] = version
+    _registry['plans'] = plans
+    return plans
+
+
+def active_plan_list():
+    """Planos ativos ordenados por tipo, para listagens"""
+    return list(active_plans().values())
+
+
+def get_plan(plan_type):
+    """Plano ativo do tipo informado, ou None"""
+    return active_plans().get(plan_type)
+
+
+def get_plan_for_payment(plan_id):
+    """Plano ativo pelo id lido direto do banco, para o valor cobrado, ou None"""
+    from admin_panel.models import PlanPricing
+
+    return PlanPricing.objects.filter(id=plan_id, is_active=True).first()
+
+
+def plan_price(plan_type):
+    """Preço do plano (valor padrão se não estiver cadastrado)"""
+    plan = get_plan(plan_type)
+    if plan is None:
+        return DEFAULT_PRICES.get(plan_type, Decimal('0.00'))
+    return plan.price
+
+
+def plan_description(plan_type):
+    """Descrição do plano (texto padrão se não estiver cadastrado)"""
+    plan = get_plan(plan_type)
+    if plan is None:
+        return DEFAULT_DESCRIPTIONS.get(plan_type, '')
+    return plan.description
+
+
+def invalidate_plan_pricing():
+    """Troca a versão do registro; cada processo recarrega na próxima leitura"""
+    _registry['version'] = None
+    bump_version(PLAN_PRICING_VERSION_KEY)
@@ -10,8 +10,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from .models import Product, PlanPricing, PurchaseTracking, CashbackTransaction, UserCashbackBalance
+from .utils.metrics import get_platform_metrics
 from accounts.models import UserProfile
 from salons.models import Salon
+from salons.utils.stats import appointment_stats, salon_catalog_stats
 from subscriptions.models import Subscription
 from appointments.models import Appointment
 from decimal import Decimal
@@ -31,28 +33,8 @@ def is_admin_user(user):
 @user_passes_test(is_admin_user)
 def admin_dashboard(request):
     """Dashboard principal do administrador"""
-    # Estatísticas gerais
-    total_owners = UserProfile.objects.filter(user_type='owner').count()
-    total_clients = UserProfile.objects.filter(user_type='client').count()
-    total_salons = Salon.objects.count()
-    total_appointments = Appointment.objects.count()
-
-    # Assinaturas ativas e expiradas
-    active_subscriptions = Subscription.objects.filter(
-        status='active',
-        end_date__gt=timezone.now()
-    ).count()
-
-    expired_subscriptions = Subscription.objects.filter(
-        Q(status='expired') | Q(end_date__lte=timezone.now())
-    ).count()
-
-    # Assinaturas expirando em 3 dias
-    expiring_soon = Subscription.objects.filter(
-        status='active',
-        end_date__lte=timezone.now() + timedelta(days=3),
-        end_date__gt=timezone.now()
-    ).count()
+    # Estatísticas gerais e de assinaturas (instantâneo pré-calculado)
+    metrics = get_platform_metrics(force_refresh=request.GET.get('refresh') == '1')
 
     # Últimos comerciantes cadastrados
     recent_owners = UserProfile.objects.filter(
@@ -67,13 +49,14 @@ def admin_dashboard(request):
     ).select_related('user').order_by('end_date')[:10]
 
     context = {
-        'total_owners': total_owners,
-        'total_clients': total_clients,
-        'total_salons': total_salons,
-        'total_appointments': total_appointments,
-        'active_subscriptions': active_subscriptions,
-        'expired_subscriptions': expired_subscriptions,
-        'expiring_soon': expiring_soon,
+        'total_owners': metrics['total_owners'],
+        'total_clients': metrics['total_clients'],
+        'total_salons': metrics['total_salons'],
+        'total_appointments': metrics['total_appointments'],
+        'active_subscriptions': metrics['active_subscriptions'],
+        'expired_subscriptions': metrics['expired_subscriptions'],
+        'expiring_soon': metrics['expiring_soon'],
+        'metrics_computed_at': metrics['computed_at'],
         'recent_owners': recent_owners,
         'expiring_subscriptions': expiring_subscriptions,
     }
@@ -126,12 +109,10 @@ def owner_detail(request, owner_id):
 
     # Estatísticas
     if salon:
-        total_services = salon.services.filter(is_active=True).count()
-        total_appointments = Appointment.objects.filter(salon=salon).count()
-        pending_appointments = Appointment.objects.filter(
-            salon=salon,
-            status='scheduled'
-        ).count()
+        total_services = salon_catalog_stats(salon)['total_services']
+        salon_stats = appointment_stats(Appointment.objects.filter(salon=salon))
+        total_appointments = salon_stats['total_appointments']
+        pending_appointments = salon_stats['pending_appointments']
     else:
         total_services = 0
         total_appointments = 0
@@ -197,17 +178,11 @@ def manage_subscription(request, owner_id):
 @user_passes_test(is_admin_user)
 def subscription_reports(request):
     """Relatórios de assinaturas"""
-    # Assinaturas por tipo
-    trial_count = Subscription.objects.filter(plan_type='trial_10').count()
-    vip_count = Subscription.objects.filter(plan_type='vip_30').count()
-
-    # Assinaturas por status
-    active_count = Subscription.objects.filter(status='active').count()
-    expired_count = Subscription.objects.filter(status='expired').count()
-    cancelled_count = Subscription.objects.filter(status='cancelled').count()
+    # Assinaturas por tipo e por status (instantâneo pré-calculado)
+    counts = get_platform_metrics(force_refresh=request.GET.get('refresh') == '1')
 
     # Receita estimada (simulação)
-    monthly_revenue = vip_count * 50  # Assumindo R$ 50 por plano VIP
+    monthly_revenue = counts['vip_count'] * 50  # Assumindo R$ 50 por plano VIP
 
     # Assinaturas expirando nos próximos 7 dias
     expiring_soon = Subscription.objects.filter(
@@ -217,13 +192,14 @@ def subscription_reports(request):
     ).select_related('user').order_by('end_date')
 
     return render(request, 'admin_panel/subscription_reports.html', {
-        'trial_count': trial_count,
-        'vip_count': vip_count,
-        'active_count': active_count,
-        'expired_count': expired_count,
-        'cancelled_count': cancelled_count,
+        'trial_count': counts['trial_count'],
+        'vip_count': counts['vip_count'],
+        'active_count': counts['active_count'],
+        'expired_count': counts['expired_count'],
+        'cancelled_count': counts['cancelled_count'],
         'monthly_revenue': monthly_revenue,
         'expiring_soon': expiring_soon,
+        'metrics_computed_at': counts['computed_at'],
     })
 
 
@@ -549,12 +525,7 @@ def webhook_purchase_confirmation(request):
                         'description': f'Cashback da compra {order_id} - {purchase_tracking.product.name}',
                     }
                 )
-
-                # Atualizar saldo do usuário
-                balance, created = UserCashbackBalance.objects.get_or_create(
-                    user=purchase_tracking.user
-                )
-                balance.update_balance()
+                # O saldo do usuário é atualizado pelo sinal da transação (delta atômico)
 
         logger.info(f"Compra confirmada via webhook: {order_id} - Cashback: R$ {cashback_amount}")
         
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from appointments.models import Appointment
+from appointments.utils.assignment import assign_employees
+
+
+class Command(BaseCommand):
+    help = 'Atribui funcionários aos agendamentos futuros que ainda não têm responsável'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--salon-id',
+            type=int,
+            help='ID específico do salão para processar (opcional)',
+        )
+        parser.add_argument(
+            '--date',
+            help='Processar apenas esta data (AAAA-MM-DD)',
+        )
+        parser.add_argument(
+            '--policy',
+            choices=['least_booked', 'round_robin', 'earliest_free'],
+            help='Forçar uma política de distribuição em vez da configurada no salão',
+        )
+
+    def handle(self, *args, **options):
+        appointments = Appointment.objects.filter(
+            employee__isnull=True,
+            status__in=['pending', 'scheduled', 'confirmed']
+        ).select_related('salon')
+
+        if options.get('salon_id'):
+            appointments = appointments.filter(salon_id=options['salon_id'])
+
+        if options.get('date'):
+            try:
+                date = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Data inválida, use o formato AAAA-MM-DD')
+            appointments = appointments.filter(appointment_date=date)
+        else:
+            appointments = appointments.filter(appointment_date__gte=timezone.localdate())
+
+        assigned, unassigned = assign_employees(appointments, policy=options.get('policy'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(assigned)} agendamento(s) atribuído(s)')
+        )
+        for appointment in unassigned:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Sem funcionário livre: #{appointment.id} {appointment.appointment_date} '
+                    f'{appointment.appointment_time:%H:%M}'
+                )
+            )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from appointments.utils.completion import OUTBOX_BATCH_SIZE, process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Aplica os efeitos pendentes dos eventos de agendamento (lançamentos financeiros das conclusões)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help=f'Quantidade de eventos por lote (padrão: {OUTBOX_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        processed = process_outbox(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'{processed} evento(s) processado(s)')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from appointments.utils.holds import purge_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Remove reservas temporárias de horário já expiradas'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_holds()
+        self.stdout.write(
+            self.style.SUCCESS(f'{deleted} reserva(s) expirada(s) removida(s)')
+        )
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:39
+
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, migrations, models, transaction
+from django.utils import timezone
+
+
+EXCLUSION_CONSTRAINT = 'appointment_employee_no_overlap'
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_starts_ends(apps, schema_editor):
+    """Preenche starts_at/ends_at dos agendamentos existentes"""
+    Appointment = apps.get_model('appointments', 'Appointment')
+    tz = timezone.get_default_timezone()
+
+    batch = []
+    for appointment in Appointment.objects.select_related('service').iterator(chunk_size=500):
+        appointment.starts_at = timezone.make_aware(
+            datetime.combine(appointment.appointment_date, appointment.appointment_time), tz
+        )
+        appointment.ends_at = appointment.starts_at + timedelta(minutes=appointment.service.duration)
+        batch.append(appointment)
+        if len(batch) >= 500:
+            Appointment.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+            batch = []
+
+    if batch:
+        Appointment.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    """
+    No PostgreSQL, impede no próprio banco dois agendamentos ativos sobrepostos
+    para o mesmo funcionário. Se já houver sobreposições gravadas (ou a extensão
+    btree_gist não puder ser criada), a restrição não é instalada e a validação
+    continua apenas na aplicação.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    table = apps.get_model('appointments', 'Appointment')._meta.db_table
+    try:
+        with transaction.atomic():
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+            schema_editor.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {EXCLUSION_CONSTRAINT} "
+                f"EXCLUDE USING gist (employee_id WITH =, tstzrange(starts_at, ends_at, '[)') WITH &&) "
+                f"WHERE (employee_id IS NOT NULL AND status IN ('scheduled', 'confirmed'))"
+            )
+    except DatabaseError as e:
+        logger.warning(
+            'Restrição %s não criada (btree_gist indisponível ou sobreposições já gravadas); '
+            'a validação de conflitos continua apenas na aplicação: %s', EXCLUSION_CONSTRAINT, e
+        )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    table = apps.get_model('appointments', 'Appointment')._meta.db_table
+    schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {EXCLUSION_CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_initial'),
+        ('salons', '0002_salon_slot_settings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Término'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Início'),
+        ),
+        migrations.RunPython(backfill_starts_ends, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, verbose_name='Término'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, verbose_name='Início'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['salon', 'employee', 'starts_at'], name='appointment_salon_i_3e75cc_idx'),
+        ),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_appointment_starts_ends'),
+        ('salons', '0002_salon_slot_settings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField(verbose_name='Início')),
+                ('ends_at', models.DateTimeField(verbose_name='Término')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira em')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='salons.employee', verbose_name='Funcionário')),
+                ('link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='appointments.linkagendamento', verbose_name='Link de agendamento')),
+                ('salon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='salons.salon', verbose_name='Salão')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='salons.service', verbose_name='Serviço')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Horário',
+                'verbose_name_plural': 'Reservas de Horário',
+                'ordering': ['starts_at'],
+                'indexes': [models.Index(fields=['salon', 'employee', 'starts_at'], name='appointment_salon_i_52b8e4_idx'), models.Index(fields=['expires_at'], name='appointment_expires_950d15_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_slothold'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('completed', 'Atendimento concluído')], max_length=20, verbose_name='Tipo de evento')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processado em')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último erro')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='appointment_events', to=settings.AUTH_USER_MODEL, verbose_name='Registrado por')),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='appointments.appointment', verbose_name='Agendamento')),
+            ],
+            options={
+                'verbose_name': 'Evento de Agendamento',
+                'verbose_name_plural': 'Eventos de Agendamento',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['processed_at', 'created_at'], name='appointment_process_42cb0d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('appointment', 'event_type'), name='unique_appointment_event')],
+            },
+        ),
+    ]
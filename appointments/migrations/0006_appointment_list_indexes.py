@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointment_event'),
+        ('salons', '0004_financial_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_salon_i_f2c0f8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_employe_30264f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['salon', 'appointment_date', 'appointment_time'], name='appointment_salon_i_7945f9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['salon', 'status', 'appointment_date', 'appointment_time'], name='appointment_salon_i_f2e3bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['employee', 'appointment_date', 'appointment_time'], name='appointment_employe_8e57db_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['employee', 'status', 'appointment_date', 'appointment_time'], name='appointment_employe_8b6bf0_idx'),
+        ),
+    ]
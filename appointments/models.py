@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
-from salons.models import Salon, Service
+from salons.models import Salon, Service, Employee
+from .utils.availability import BUSY_STATUSES, invalidate_busy_days, invalidate_salon_availability
+from .utils.booking import invalidate_booking_menus
 import uuid
 
 class Appointment(models.Model):
@@ -28,11 +32,60 @@ class Appointment(models.Model):
     rescheduled_date = models.DateField(blank=True, null=True, verbose_name="Nova Data (Reagendamento)")
     rescheduled_time = models.TimeField(blank=True, null=True, verbose_name="Novo Horário (Reagendamento)")
     rescheduled_reason = models.TextField(blank=True, null=True, verbose_name="Motivo do Reagendamento")
+
+    # Início e término desnormalizados (mantidos no save) para consultas por intervalo
+    starts_at = models.DateTimeField(editable=False, verbose_name="Início")
+    ends_at = models.DateTimeField(editable=False, verbose_name="Término")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.client.username} - {self.salon.name} - {self.appointment_date} {self.appointment_time}"
+
+    # Campos dos quais starts_at/ends_at são derivados
+    SCHEDULE_FIELDS = ('appointment_date', 'appointment_time', 'service_id')
+
+    def loaded_schedule(self):
+        """Data, horário e serviço em memória (sem carregar campos adiados)"""
+        return tuple(self.__dict__.get(name) for name in self.SCHEDULE_FIELDS)
+
+    def save(self, *args, **kwargs):
+        """
+        Recalcula starts_at/ends_at quando o agendamento é novo ou quando data,
+        horário ou serviço mudaram. Uma mudança de status não mexe no término
+        gravado, que guarda a duração com que o agendamento foi marcado.
+        """
+        from datetime import datetime, timedelta
+
+        update_fields = kwargs.get('update_fields')
+        schedule_saved = update_fields is None or bool(
+            {'appointment_date', 'appointment_time', 'service', 'service_id'} & set(update_fields)
+        )
+        changed = self._state.adding or getattr(self, '_loaded_schedule', None) != self.loaded_schedule()
+
+        if changed and schedule_saved:
+            self.starts_at = timezone.make_aware(datetime.combine(self.appointment_date, self.appointment_time))
+            self.ends_at = self.starts_at + timedelta(minutes=self.service.duration)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'starts_at', 'ends_at'}
+
+        super().save(*args, **kwargs)
+        if schedule_saved:
+            self._loaded_schedule = self.loaded_schedule()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Guarda a data carregada do banco para invalidar o cache do dia antigo ao
+        reagendar, e data/horário/serviço para saber se o término deve ser recalculado
+        """
+        instance = super().from_db(db, field_names, values)
+        if 'appointment_date' in field_names:
+            instance._loaded_appointment_date = instance.appointment_date
+        if set(cls.SCHEDULE_FIELDS) <= set(field_names):
+            instance._loaded_schedule = instance.loaded_schedule()
+        return instance
     
     def can_be_cancelled(self):
         """Verifica se o agendamento pode ser cancelado"""
@@ -54,6 +107,8 @@ class Appointment(models.Model):
     
     def get_end_time(self):
         """Calcula o horário de término baseado na duração do serviço"""
+        if self.ends_at:
+            return timezone.localtime(self.ends_at).time()
         from datetime import datetime, timedelta
         start_datetime = datetime.combine(self.appointment_date, self.appointment_time)
         end_datetime = start_datetime + timedelta(minutes=self.service.duration)
@@ -77,10 +132,14 @@ class Appointment(models.Model):
         verbose_name_plural = "Agendamentos"
         ordering = ['appointment_date', 'appointment_time']
         indexes = [
-            models.Index(fields=['salon', 'appointment_date']),
-            models.Index(fields=['employee', 'appointment_date']),
+            # Listagens paginadas por (data, horário, id), com e sem filtro de status
+            models.Index(fields=['salon', 'appointment_date', 'appointment_time']),
+            models.Index(fields=['salon', 'status', 'appointment_date', 'appointment_time']),
+            models.Index(fields=['employee', 'appointment_date', 'appointment_time']),
+            models.Index(fields=['employee', 'status', 'appointment_date', 'appointment_time']),
             models.Index(fields=['status']),
             models.Index(fields=['appointment_date', 'appointment_time']),
+            models.Index(fields=['salon', 'employee', 'starts_at']),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -195,3 +254,126 @@ class LinkAgendamento(models.Model):
         verbose_name = "Link de Agendamento"
         verbose_name_plural = "Links de Agendamento"
         ordering = ['-created_at']
+
+
+class SlotHold(models.Model):
+    """Reserva temporária de um horário enquanto o cliente conclui o agendamento"""
+    link = models.ForeignKey('LinkAgendamento', on_delete=models.CASCADE, related_name='slot_holds', verbose_name="Link de agendamento")
+    salon = models.ForeignKey(Salon, on_delete=models.CASCADE, related_name='slot_holds', verbose_name="Salão")
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='slot_holds', verbose_name="Serviço")
+    employee = models.ForeignKey('salons.Employee', on_delete=models.CASCADE, related_name='slot_holds', verbose_name="Funcionário")
+    starts_at = models.DateTimeField(verbose_name="Início")
+    ends_at = models.DateTimeField(verbose_name="Término")
+    expires_at = models.DateTimeField(verbose_name="Expira em")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Reserva {self.salon.name} - {timezone.localtime(self.starts_at):%d/%m/%Y %H:%M} (até {timezone.localtime(self.expires_at):%H:%M:%S})"
+
+    def is_expired(self):
+        """Verifica se a reserva já expirou"""
+        return self.expires_at <= timezone.now()
+
+    class Meta:
+        verbose_name = "Reserva de Horário"
+        verbose_name_plural = "Reservas de Horário"
+        ordering = ['starts_at']
+        indexes = [
+            models.Index(fields=['salon', 'employee', 'starts_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+
+class AppointmentEvent(models.Model):
+    """
+    Outbox de eventos de agendamento: gravado na mesma transação da mudança de
+    status e processado depois (process_outbox) para aplicar os efeitos colaterais.
+    """
+    EVENT_TYPE_CHOICES = (
+        ('completed', 'Atendimento concluído'),
+    )
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='events', verbose_name="Agendamento")
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES, verbose_name="Tipo de evento")
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='appointment_events', verbose_name="Registrado por")
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Processado em")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    last_error = models.TextField(blank=True, verbose_name="Último erro")
+
+    def __str__(self):
+        return f"{self.get_event_type_display()} - Agendamento {self.appointment_id}"
+
+    class Meta:
+        verbose_name = "Evento de Agendamento"
+        verbose_name_plural = "Eventos de Agendamento"
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'event_type'], name='unique_appointment_event'),
+        ]
+        indexes = [
+            models.Index(fields=['processed_at', 'created_at']),
+        ]
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_availability(sender, instance, **kwargs):
+    """Descarta o cache de disponibilidade e de análises dos dias afetados pelo agendamento"""
+    from salons.utils.analytics import invalidate_analytics_days
+
+    salon_id = instance.salon_id
+    dates = instance.appointment_date, getattr(instance, '_loaded_appointment_date', None)
+
+    def invalidate():
+        invalidate_busy_days(salon_id, *dates)
+        invalidate_analytics_days(salon_id, *dates)
+
+    # Só depois do commit: antes disso uma leitura concorrente ainda veria as
+    # linhas antigas e as guardaria no cache por horas
+    transaction.on_commit(invalidate)
+    instance._loaded_appointment_date = instance.appointment_date
+
+
+@receiver(post_save, sender=Service)
+def sync_appointment_end_times(sender, instance, created, **kwargs):
+    """
+    Mantém ends_at coerente quando a duração do serviço muda. Só os
+    agendamentos futuros que ainda ocupam a agenda são ajustados: o histórico
+    guarda a duração com que foi atendido.
+    """
+    from datetime import timedelta
+
+    loaded_duration = getattr(instance, '_loaded_duration', None)
+    instance._loaded_duration = instance.duration
+    if created or loaded_duration == instance.duration:
+        return
+
+    duration = timedelta(minutes=instance.duration)
+    Appointment.objects.filter(
+        service=instance,
+        status__in=BUSY_STATUSES,
+        starts_at__gte=timezone.now()
+    ).exclude(
+        ends_at=models.F('starts_at') + duration
+    ).update(ends_at=models.F('starts_at') + duration)
+
+
+@receiver(post_save, sender=Salon)
+@receiver(post_save, sender=Service)
+def invalidate_salon_schedule(sender, instance, **kwargs):
+    """Horários do salão, fechamento temporário ou duração dos serviços mudaram"""
+    # Só a disponibilidade depende disso: as análises usam os horários gravados
+    # nos agendamentos e a receita lançada, e os menus têm o próprio sinal
+    salon_id = instance.id if sender is Salon else instance.salon_id
+    transaction.on_commit(lambda: invalidate_salon_availability(salon_id))
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_salon_booking_menus(sender, instance, **kwargs):
+    """Serviços ou funcionários mudaram: descarta os menus da página de agendamento"""
+    salon_id = instance.salon_id
+    transaction.on_commit(lambda: invalidate_booking_menus(salon_id))
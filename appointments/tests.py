@@ -1,3 +1,356 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from salons.models import Salon, Service, Employee
+from appointments.models import Appointment, CancellationFee, LinkAgendamento, SlotHold
+from appointments.utils.holds import book_slot_hold, create_slot_hold, purge_expired_holds
+from appointments.utils.scheduling import get_available_time_slots, get_available_time_slots_range
+
+
+class ClientBookingQueryBudgetTests(TestCase):
+    """A página do cliente faz o mesmo número de consultas qualquer que seja o histórico"""
+
+    # link (com salão e cliente), multas pendentes, histórico
+    EXPECTED_QUERIES = 3
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('dono', 'dono@example.com', 'senha')
+        self.salon = Salon.objects.create(
+            name='Salão', address='Rua 1', city='São Paulo', state='SP', zip_code='01000-000',
+            phone='11999999999', email='salao@example.com', owner=owner
+        )
+        self.services = [
+            Service.objects.create(salon=self.salon, name='Corte', duration=30, price=Decimal('50.00')),
+            Service.objects.create(salon=self.salon, name='Barba', duration=30, price=Decimal('30.00')),
+        ]
+        self.employees = []
+        for i in range(2):
+            user = User.objects.create_user(f'func{i}', f'func{i}@example.com', 'senha', first_name=f'Func{i}')
+            self.employees.append(Employee.objects.create(user=user, salon=self.salon))
+        self.client_user = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        self.link = LinkAgendamento.objects.create(salon=self.salon, client=self.client_user)
+        self.url = reverse('appointments:client_booking', kwargs={'token': self.link.token})
+        self.created = 0
+
+    def add_history(self, count):
+        """Cria agendamentos variados (com e sem funcionário, cancelados com multa)"""
+        base = timezone.localdate() - timedelta(days=1)
+        for _ in range(count):
+            i = self.created
+            self.created += 1
+            appointment = Appointment.objects.create(
+                client=self.client_user,
+                salon=self.salon,
+                service=self.services[i % 2],
+                employee=self.employees[i % 2] if i % 3 else None,
+                appointment_date=base - timedelta(days=i),
+                appointment_time=time(9 + i % 8),
+                status='cancelled' if i % 4 == 0 else 'completed'
+            )
+            if appointment.status == 'cancelled':
+                CancellationFee.objects.create(
+                    appointment=appointment,
+                    fee_percentage=Decimal('50.00'),
+                    service_price=appointment.service.price,
+                    amount=appointment.service.price / 2,
+                    cancelled_by_employee=self.employees[0],
+                    hours_before_appointment=Decimal('2.0'),
+                    cancelled_at=timezone.now(),
+                    is_paid=bool(i % 8)
+                )
+
+    def test_query_count_does_not_grow_with_history(self):
+        # Primeira visita aquece o cache dos menus de serviços e funcionários
+        self.add_history(1)
+        self.client.get(self.url)
+
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['appointments']), 1)
+
+        self.add_history(20)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['appointments']), 21)
+        self.assertContains(response, 'Func1')
+
+    def test_pending_fees_are_summed_in_the_database(self):
+        self.add_history(9)
+        response = self.client.get(self.url)
+        expected = sum(
+            fee.amount for fee in CancellationFee.objects.filter(appointment__client=self.client_user, is_paid=False)
+        )
+        self.assertEqual(response.context['pending_fees_total'], expected)
+
+    def test_menus_follow_service_changes(self):
+        self.client.get(self.url)
+        # A invalidação dos menus roda após o commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(salon=self.salon, name='Escova', duration=40, price=Decimal('70.00'))
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['services']), 3)
+
+
+class AppointmentEndTimeTests(TestCase):
+    """starts_at/ends_at só mudam com data, horário ou serviço"""
+
+    def setUp(self):
+        owner = User.objects.create_user('dono', 'dono@example.com', 'senha')
+        self.salon = Salon.objects.create(
+            name='Salão', address='Rua 1', city='São Paulo', state='SP', zip_code='01000-000',
+            phone='11999999999', email='salao@example.com', owner=owner
+        )
+        self.service = Service.objects.create(salon=self.salon, name='Corte', duration=30, price=Decimal('50.00'))
+        self.client_user = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        self.appointment = Appointment.objects.create(
+            client=self.client_user, salon=self.salon, service=self.service,
+            appointment_date=timezone.localdate() - timedelta(days=1), appointment_time=time(10), status='confirmed'
+        )
+
+    def duration(self):
+        self.appointment.refresh_from_db()
+        return self.appointment.ends_at - self.appointment.starts_at
+
+    def test_status_change_keeps_historical_end_time(self):
+        service = Service.objects.get(pk=self.service.pk)
+        service.duration = 90
+        service.save()
+
+        appointment = Appointment.objects.get(pk=self.appointment.pk)
+        appointment.status = 'completed'
+        appointment.save(update_fields=['status', 'updated_at'])
+        self.assertEqual(self.duration(), timedelta(minutes=30))
+
+        appointment.notes = 'Cliente chegou atrasado'
+        appointment.save()
+        self.assertEqual(self.duration(), timedelta(minutes=30))
+
+    def test_reschedule_recomputes_times(self):
+        appointment = Appointment.objects.get(pk=self.appointment.pk)
+        appointment.appointment_time = time(14)
+        appointment.save()
+        self.appointment.refresh_from_db()
+        self.assertEqual(timezone.localtime(self.appointment.starts_at).time(), time(14))
+        self.assertEqual(self.duration(), timedelta(minutes=30))
+
+        longer = Service.objects.create(salon=self.salon, name='Escova', duration=60, price=Decimal('70.00'))
+        appointment.service = longer
+        appointment.save(update_fields=['service'])
+        self.assertEqual(self.duration(), timedelta(minutes=60))
+
+
+def reference_time_slots(salon, service, date, employee=None):
+    """
+    Algoritmo anterior ao motor de disponibilidade: para cada horário de 30 em
+    30 minutos, percorre os agendamentos do dia de cada funcionário qualificado.
+    """
+    open_time, close_time = salon.get_working_hours(date.weekday())
+    appointments = list(Appointment.objects.filter(
+        salon=salon, appointment_date=date, status__in=['scheduled', 'confirmed']
+    ).select_related('service'))
+    if employee:
+        candidates = [employee] if employee.is_active and employee.services.filter(id=service.id).exists() else []
+    else:
+        candidates = list(Employee.objects.filter(salon=salon, is_active=True, services=service).distinct())
+
+    now = timezone.localtime(timezone.now())
+    close = timezone.make_aware(datetime.combine(date, close_time))
+    current = datetime.combine(date, open_time)
+    slots = []
+    while current <= datetime.combine(date, close_time):
+        start = timezone.make_aware(current)
+        end = start + timedelta(minutes=service.duration)
+        if end <= close and start > now:
+            for candidate in candidates:
+                busy = False
+                for appointment in appointments:
+                    if appointment.employee_id != candidate.id:
+                        continue
+                    existing_start = timezone.make_aware(
+                        datetime.combine(appointment.appointment_date, appointment.appointment_time)
+                    )
+                    existing_end = existing_start + timedelta(minutes=appointment.service.duration)
+                    if start < existing_end and existing_start < end:
+                        busy = True
+                        break
+                if not busy:
+                    slots.append(current.strftime('%H:%M'))
+                    break
+        current += timedelta(minutes=30)
+    return slots
+
+
+class AvailabilityEngineTests(TestCase):
+    """O motor de disponibilidade devolve os mesmos horários que o algoritmo anterior"""
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('dono', 'dono@example.com', 'senha')
+        self.salon = Salon.objects.create(
+            name='Salão', address='Rua 1', city='São Paulo', state='SP', zip_code='01000-000',
+            phone='11999999999', email='salao@example.com', owner=owner,
+            weekdays_open=time(8), weekdays_close=time(18), slot_interval=30, pack_slots_after_appointments=False
+        )
+        self.services = [
+            Service.objects.create(salon=self.salon, name=f'Serviço {duration}', duration=duration, price=Decimal('50.00'))
+            for duration in (30, 45, 60, 90)
+        ]
+        self.employees = []
+        for i in range(5):
+            user = User.objects.create_user(f'func{i}', f'func{i}@example.com', 'senha')
+            employee = Employee.objects.create(user=user, salon=self.salon, is_active=i != 4)
+            # Nem todos atendem todos os serviços
+            employee.services.set(self.services[:2 + i % 3])
+            self.employees.append(employee)
+
+        # Uma segunda-feira no futuro, para nenhum horário ficar no passado
+        today = timezone.localdate()
+        self.date = today + timedelta(days=7 - today.weekday() + 7)
+
+        rng = random.Random(20250101)
+        client = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        taken = set()
+        for _ in range(40):
+            employee = rng.choice(self.employees + [None])
+            start = time(rng.randrange(8, 17), rng.choice((0, 15, 30, 45)))
+            if (employee, start) in taken:
+                continue
+            taken.add((employee, start))
+            Appointment.objects.create(
+                client=client, salon=self.salon, service=rng.choice(self.services), employee=employee,
+                appointment_date=self.date, appointment_time=start,
+                status=rng.choice(('scheduled', 'confirmed', 'cancelled', 'completed'))
+            )
+
+    def test_slots_match_reference(self):
+        for service in self.services:
+            for employee in self.employees + [None]:
+                with self.subTest(service=service.duration, employee=employee and employee.id):
+                    self.assertEqual(
+                        get_available_time_slots(self.salon, service, self.date, employee),
+                        reference_time_slots(self.salon, service, self.date, employee)
+                    )
+
+    def test_range_bitmap_matches_reference(self):
+        for service in self.services:
+            with self.subTest(service=service.duration):
+                day = get_available_time_slots_range(self.salon, service, self.date, self.date)[self.date.isoformat()]
+                start = datetime.combine(self.date, time(8))
+                slots = [
+                    (start + timedelta(minutes=30 * i)).strftime('%H:%M')
+                    for i, bit in enumerate(day['bitmap']) if bit == '1'
+                ]
+                self.assertEqual((day['start'], day['extra']), ('08:00', []))
+                self.assertEqual(slots, reference_time_slots(self.salon, service, self.date))
+
+    def test_packed_slots_only_add_starts_after_appointments(self):
+        self.salon.pack_slots_after_appointments = True
+        self.salon.save()
+        for service in self.services:
+            with self.subTest(service=service.duration):
+                packed = get_available_time_slots(self.salon, service, self.date)
+                reference = reference_time_slots(self.salon, service, self.date)
+                self.assertLessEqual(set(reference), set(packed))
+                self.assertEqual(packed, sorted(packed))
+
+    def test_closed_day_has_no_slots(self):
+        sunday = self.date + timedelta(days=6)
+        self.assertEqual(get_available_time_slots(self.salon, self.services[0], sunday), [])
+
+
+class SlotHoldTests(TestCase):
+    """Uma reserva tira o horário dos outros clientes até converter ou expirar"""
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('dono', 'dono@example.com', 'senha')
+        self.salon = Salon.objects.create(
+            name='Salão', address='Rua 1', city='São Paulo', state='SP', zip_code='01000-000',
+            phone='11999999999', email='salao@example.com', owner=owner,
+            weekdays_open=time(9), weekdays_close=time(12), pack_slots_after_appointments=False
+        )
+        self.service = Service.objects.create(salon=self.salon, name='Corte', duration=60, price=Decimal('50.00'))
+        user = User.objects.create_user('func', 'func@example.com', 'senha')
+        self.employee = Employee.objects.create(user=user, salon=self.salon)
+        self.employee.services.add(self.service)
+        self.links = [
+            LinkAgendamento.objects.create(
+                salon=self.salon, client=User.objects.create_user(f'cliente{i}', f'cliente{i}@example.com', 'senha')
+            )
+            for i in range(2)
+        ]
+        today = timezone.localdate()
+        self.date = today + timedelta(days=7 - today.weekday() + 7)
+        self.start = timezone.make_aware(datetime.combine(self.date, time(10)))
+        self.end = self.start + timedelta(minutes=60)
+
+    def slots(self, link):
+        return get_available_time_slots(self.salon, self.service, self.date, link=link)
+
+    def hold(self, link):
+        return self.client.post(reverse('appointments:hold_slot', kwargs={'token': link.token}), {
+            'service_id': self.service.id,
+            'appointment_date': self.date.isoformat(),
+            'appointment_time': '10:00',
+        })
+
+    def expire_holds(self):
+        SlotHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_hold_blocks_other_clients_only(self):
+        first, second = self.links
+        response = self.hold(first)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['employee_id'], self.employee.id)
+
+        self.assertIn('10:00', self.slots(first))
+        self.assertEqual(self.slots(second), ['09:00', '11:00'])
+        self.assertEqual(self.hold(second).status_code, 409)
+        self.assertEqual(SlotHold.objects.get().link, first)
+
+    def test_new_choice_replaces_previous_hold(self):
+        first, second = self.links
+        self.hold(first)
+        later = self.start + timedelta(hours=1)
+        hold, error = create_slot_hold(first, self.service, later, later + timedelta(minutes=60))
+        self.assertEqual(error, '')
+
+        self.assertEqual(SlotHold.objects.get(), hold)
+        self.assertEqual(self.slots(second), ['09:00', '09:30', '10:00'])
+
+    def test_expired_hold_frees_the_slot(self):
+        first, second = self.links
+        self.hold(first)
+        self.expire_holds()
+
+        self.assertEqual(self.slots(second), ['09:00', '09:30', '10:00', '10:30', '11:00'])
+        self.assertEqual(self.hold(second).status_code, 200)
+        self.assertEqual(SlotHold.objects.get(expires_at__gt=timezone.now()).link, second)
+
+    def test_booking_converts_a_live_hold(self):
+        first = self.links[0]
+        hold, _ = create_slot_hold(first, self.service, self.start, self.end)
+
+        appointment, error = book_slot_hold(first, hold.id, first.client, self.service, self.start)
+        self.assertEqual(error, '')
+        self.assertEqual((appointment.employee, appointment.appointment_time), (self.employee, time(10)))
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_booking_an_expired_hold_fails(self):
+        first = self.links[0]
+        hold, _ = create_slot_hold(first, self.service, self.start, self.end)
+        self.expire_holds()
 
-# Create your tests here.
+        appointment, error = book_slot_hold(first, hold.id, first.client, self.service, self.start)
+        self.assertIsNone(appointment)
+        self.assertIn('expirou', error)
+        self.assertEqual(purge_expired_holds(), 1)
+        self.assertFalse(Appointment.objects.exists())
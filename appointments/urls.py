@@ -11,4 +11,6 @@ urlpatterns = [
     path('link/<uuid:token>/reject-reschedule/<int:appointment_id>/', views.reject_reschedule, name='reject_reschedule'),
     path('link/<uuid:token>/cancel/<int:appointment_id>/', views.cancel_appointment, name='cancel_appointment'),
     path('link/<uuid:token>/available-slots/', views.get_available_slots, name='get_available_slots'),
+    path('link/<uuid:token>/available-slots/range/', views.get_available_slots_range, name='get_available_slots_range'),
+    path('link/<uuid:token>/hold/', views.hold_slot, name='hold_slot'),
 ]
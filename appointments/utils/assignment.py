@@ -0,0 +1,158 @@
+"""
+Distribuição automática de funcionários.
+Avalia todos os funcionários qualificados de uma vez sobre as máscaras de
+ocupação do dia e escolhe segundo a política configurada no salão.
+"""
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .availability import (
+    DayAvailability,
+    get_busy_intervals_range,
+    invalidate_busy_days,
+    load_hold_intervals_range,
+    overlay_intervals,
+    time_to_minutes,
+)
+from .instrumentation import instrumented
+from salons.utils.analytics import invalidate_analytics_days
+
+
+def local_minutes(start_dt, end_dt):
+    """Converte um intervalo de datetimes em (início, fim) em minutos do dia local"""
+    start = time_to_minutes(timezone.localtime(start_dt))
+    return start, start + int((end_dt - start_dt).total_seconds() // 60)
+
+
+def assignment_rotation(salon, employee_ids):
+    """
+    Ordem do rodízio: quem nunca recebeu atendimento vem primeiro, depois quem
+    recebeu há mais tempo. Uma única consulta agregada.
+    """
+    from appointments.models import Appointment
+
+    last_assigned = dict(
+        Appointment.objects.filter(salon=salon, employee_id__in=employee_ids)
+        .values('employee_id')
+        .annotate(last=Max('created_at'))
+        .order_by()
+        .values_list('employee_id', 'last')
+    )
+    return sorted(
+        employee_ids,
+        key=lambda employee_id: (1, last_assigned[employee_id], employee_id)
+        if employee_id in last_assigned else (0, 0, employee_id)
+    )
+
+
+def choose_employee(availability, employee_ids, start, end, policy, rotation=None):
+    """
+    Escolhe entre os funcionários livres no intervalo (em minutos) do dia.
+
+    Políticas:
+        least_booked: menos minutos ocupados no dia
+        round_robin: primeiro livre na ordem do rodízio
+        earliest_free: livre há mais tempo antes do início pedido
+
+    Empates ficam com o menor id, para que a escolha seja estável.
+    """
+    free = [employee_id for employee_id in sorted(employee_ids) if availability.is_employee_free(employee_id, start, end)]
+    if not free:
+        return None
+
+    if policy == 'round_robin' and rotation is not None:
+        free_ids = set(free)
+        return next((employee_id for employee_id in rotation if employee_id in free_ids), free[0])
+
+    if policy == 'earliest_free':
+        return min(free, key=lambda employee_id: (availability.free_since(employee_id, start), employee_id))
+
+    return min(free, key=lambda employee_id: (availability.busy_minutes(employee_id), employee_id))
+
+
+@instrumented('assign_employees')
+def assign_employees(appointments, policy=None):
+    """
+    Atribui funcionários a vários agendamentos sem responsável de uma vez.
+
+    Por salão, a ocupação do período e as qualificações são carregadas em poucas
+    consultas; cada atribuição ocupa a agenda em memória antes da próxima, e no
+    final tudo é gravado com um único bulk_update.
+
+    Args:
+        appointments: Agendamentos (com salon carregado) a distribuir
+        policy: Força uma política; por padrão usa a de cada salão
+
+    Returns:
+        Tuple[list, list]: (agendamentos atribuídos, agendamentos sem funcionário livre)
+    """
+    from appointments.models import Appointment
+    from salons.models import Employee
+
+    pending = sorted(
+        (appointment for appointment in appointments if appointment.employee_id is None),
+        key=lambda appointment: (appointment.salon_id, appointment.starts_at, appointment.id)
+    )
+    assigned, unassigned = [], []
+    touched_dates = {}
+
+    with transaction.atomic():
+        for salon_id, group in groupby(pending, key=lambda appointment: appointment.salon_id):
+            group = list(group)
+            salon = group[0].salon
+            salon_policy = policy or salon.assignment_policy
+
+            # Bloqueia os funcionários do salão, como na criação de reservas
+            employee_ids = list(
+                Employee.objects.select_for_update().filter(salon=salon, is_active=True).values_list('id', flat=True)
+            )
+
+            qualified = {}
+            for service_id, employee_id in Employee.services.through.objects.filter(
+                employee_id__in=employee_ids
+            ).values_list('service_id', 'employee_id'):
+                qualified.setdefault(service_id, []).append(employee_id)
+
+            dates = sorted({appointment.appointment_date for appointment in group})
+            busy_by_date = get_busy_intervals_range(salon, dates)
+            holds_by_date = load_hold_intervals_range(salon, dates[0], dates[-1])
+            days = {
+                date: DayAvailability(salon, date, overlay_intervals(busy_by_date.get(date, {}), holds_by_date.get(date, {})))
+                for date in dates
+            }
+            rotation = assignment_rotation(salon, employee_ids) if salon_policy == 'round_robin' else None
+
+            for appointment in group:
+                day = days[appointment.appointment_date]
+                start, end = local_minutes(appointment.starts_at, appointment.ends_at)
+                employee_id = choose_employee(day, qualified.get(appointment.service_id, []), start, end, salon_policy, rotation)
+                if employee_id is None:
+                    unassigned.append(appointment)
+                    continue
+
+                day.reserve(employee_id, start, end)
+                if rotation is not None:
+                    # Quem acabou de receber vai para o fim da fila
+                    rotation.remove(employee_id)
+                    rotation.append(employee_id)
+
+                appointment.employee_id = employee_id
+                assigned.append(appointment)
+                touched_dates.setdefault(salon_id, set()).add(appointment.appointment_date)
+
+        if assigned:
+            Appointment.objects.bulk_update(assigned, ['employee'], batch_size=500)
+
+    # bulk_update não dispara sinais: invalidar o cache dos dias alterados
+    # (após o commit, se quem chamou estiver em uma transação)
+    def invalidate():
+        for salon_id, dates in touched_dates.items():
+            invalidate_busy_days(salon_id, *dates)
+            invalidate_analytics_days(salon_id, *dates)
+
+    transaction.on_commit(invalidate)
+
+    return assigned, unassigned
@@ -0,0 +1,304 @@
+"""
+Motor de disponibilidade de horários.
+Carrega os agendamentos de um dia do salão uma única vez e responde consultas de
+horários livres a partir dos intervalos ocupados de cada funcionário.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.utils.cache import cached_get, cached_get_many, invalidate_salon, salon_key, salon_key_prefix
+
+from .bitmask import count_minutes, fit_mask, grid_mask, intervals_to_mask, span_mask
+from .instrumentation import record
+
+
+# Status que ocupam a agenda do funcionário
+BUSY_STATUSES = ('scheduled', 'confirmed')
+
+# Tempo máximo que um mapa de ocupação fica em cache (a invalidação é por sinais)
+BUSY_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def time_to_minutes(value):
+    """Converte um objeto time em minutos desde a meia-noite"""
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_label(minutes):
+    """Formata minutos desde a meia-noite como "HH:MM" """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def merge_intervals(intervals):
+    """Ordena e une intervalos sobrepostos ou adjacentes"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _group_busy_rows(rows):
+    """Agrupa linhas (data, funcionário, starts_at, ends_at) em {data: {funcionário: intervalos}}"""
+    grouped = {}
+    for date, employee_id, starts_at, ends_at in rows:
+        start = time_to_minutes(timezone.localtime(starts_at))
+        end = start + int((ends_at - starts_at).total_seconds() // 60)
+        grouped.setdefault(date, {}).setdefault(employee_id, []).append((start, end))
+
+    return {
+        date: {employee_id: merge_intervals(items) for employee_id, items in by_employee.items()}
+        for date, by_employee in grouped.items()
+    }
+
+
+def _busy_rows(salon, **date_filter):
+    from appointments.models import Appointment
+
+    return Appointment.objects.filter(
+        salon=salon,
+        status__in=BUSY_STATUSES,
+        employee__isnull=False,
+        **date_filter
+    ).values_list('appointment_date', 'employee_id', 'starts_at', 'ends_at')
+
+
+def load_busy_intervals(salon, date):
+    """
+    Busca em uma única consulta os agendamentos ativos do dia e monta o mapa
+    {employee_id: [(inicio, fim), ...]} em minutos, ordenado e sem sobreposições.
+    Agendamentos sem funcionário não bloqueiam a agenda de ninguém.
+    """
+    return _group_busy_rows(_busy_rows(salon, appointment_date=date)).get(date, {})
+
+
+def load_busy_intervals_range(salon, date_from, date_to):
+    """Mesmo mapa de load_busy_intervals para um período inteiro, em uma única consulta"""
+    return _group_busy_rows(_busy_rows(salon, appointment_date__range=(date_from, date_to)))
+
+
+def load_hold_intervals_range(salon, date_from, date_to, exclude_link=None):
+    """
+    Reservas temporárias ainda válidas no período, no mesmo formato de
+    load_busy_intervals_range. Não passam pelo cache: expiram em minutos.
+    Reservas do próprio link (exclude_link) não bloqueiam o cliente que as fez.
+    """
+    from appointments.models import SlotHold
+
+    # Limites do período no fuso local, comparando direto com o índice de starts_at
+    period_start = timezone.make_aware(datetime.combine(date_from, time.min))
+    period_end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+
+    holds = SlotHold.objects.filter(
+        salon=salon,
+        expires_at__gt=timezone.now(),
+        starts_at__gte=period_start,
+        starts_at__lt=period_end
+    ).order_by()
+    if exclude_link is not None:
+        holds = holds.exclude(link=exclude_link)
+
+    return _group_busy_rows(
+        (timezone.localtime(starts_at).date(), employee_id, starts_at, ends_at)
+        for employee_id, starts_at, ends_at in holds.values_list('employee_id', 'starts_at', 'ends_at')
+    )
+
+
+def overlay_intervals(busy_by_employee, extra_by_employee):
+    """Soma dois mapas {funcionário: intervalos} sem alterar os originais"""
+    if not extra_by_employee:
+        return busy_by_employee
+
+    combined = dict(busy_by_employee)
+    for employee_id, intervals in extra_by_employee.items():
+        combined[employee_id] = merge_intervals(list(combined.get(employee_id, [])) + list(intervals))
+    return combined
+
+
+def busy_cache_key(salon_id, date):
+    """Chave do mapa de ocupação de um dia, prefixada pelas versões do salão"""
+    return salon_key(salon_id, 'availability', date.isoformat())
+
+
+def get_busy_intervals(salon, date):
+    """Mapa de ocupação do dia, lido do cache quando disponível"""
+    key = busy_cache_key(salon.id, date)
+    busy = cached_get('availability', key)
+    if busy is None:
+        record('cache_misses')
+        busy = load_busy_intervals(salon, date)
+        cache.set(key, busy, BUSY_CACHE_TIMEOUT)
+    else:
+        record('cache_hits')
+    return busy
+
+
+def get_busy_intervals_range(salon, dates):
+    """
+    Mapa de ocupação de várias datas: lê do cache o que existir e busca o
+    restante com uma única consulta cobrindo o período faltante.
+    """
+    prefix = salon_key_prefix(salon.id, 'availability')
+    keys = {date: f"{prefix}:{date.isoformat()}" for date in dates}
+    cached = cached_get_many('availability', list(keys.values()))
+    result = {date: cached[key] for date, key in keys.items() if key in cached}
+
+    missing = [date for date in dates if date not in result]
+    record('cache_hits', len(result))
+    record('cache_misses', len(missing))
+    if missing:
+        loaded = load_busy_intervals_range(salon, min(missing), max(missing))
+        fresh = {date: loaded.get(date, {}) for date in missing}
+        cache.set_many({keys[date]: busy for date, busy in fresh.items()}, BUSY_CACHE_TIMEOUT)
+        result.update(fresh)
+
+    return result
+
+
+def invalidate_busy_days(salon_id, *dates):
+    """Descarta o cache de ocupação das datas informadas"""
+    prefix = salon_key_prefix(salon_id, 'availability')
+    keys = {f"{prefix}:{date.isoformat()}" for date in dates if date}
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def invalidate_salon_availability(salon_id):
+    """Descarta todo o cache de ocupação do salão trocando a versão das chaves"""
+    invalidate_salon(salon_id, 'availability')
+
+
+class DayAvailability:
+    """
+    Disponibilidade de um salão em uma data.
+
+    Os intervalos ocupados de cada funcionário (em minutos desde a meia-noite)
+    são convertidos em máscaras de bits de um minuto. A partir delas:
+      - conflito é um AND entre a máscara ocupada e o intervalo pedido;
+      - inícios possíveis para um serviço de D minutos saem de shifts sobre a
+        máscara livre, e vários funcionários são combinados com OR;
+      - ocupação é a contagem de bits ocupados dentro do horário de funcionamento.
+    """
+
+    def __init__(self, salon, date, busy_by_employee):
+        self.salon = salon
+        self.date = date
+        self.busy = busy_by_employee
+        self._busy_masks = {}
+
+        open_time, close_time = salon.get_working_hours(date.weekday())
+        self.open_minute = time_to_minutes(open_time) if open_time else None
+        self.close_minute = time_to_minutes(close_time) if close_time else None
+        self.open_mask = span_mask(self.open_minute, self.close_minute) if self.works_this_day else 0
+
+    @classmethod
+    def load(cls, salon, date, use_cache=True, holds=False, exclude_link=None):
+        """
+        Monta a disponibilidade do dia a partir do cache ou do banco (uma consulta).
+        Com `holds`, as reservas temporárias de outros links também ocupam a agenda.
+        """
+        busy = get_busy_intervals(salon, date) if use_cache else load_busy_intervals(salon, date)
+        if holds:
+            held = load_hold_intervals_range(salon, date, date, exclude_link).get(date, {})
+            busy = overlay_intervals(busy, held)
+        return cls(salon, date, busy)
+
+    @property
+    def works_this_day(self):
+        """Indica se o salão tem horário de funcionamento nesta data"""
+        return self.open_minute is not None and self.close_minute is not None
+
+    def busy_mask(self, employee_id):
+        """Máscara dos minutos ocupados do funcionário"""
+        if employee_id not in self._busy_masks:
+            self._busy_masks[employee_id] = intervals_to_mask(self.busy.get(employee_id, []))
+        return self._busy_masks[employee_id]
+
+    def is_employee_free(self, employee_id, start, end):
+        """Verifica se o funcionário não tem nada marcado entre start e end (minutos)"""
+        return not self.busy_mask(employee_id) & span_mask(start, end)
+
+    def busy_minutes(self, employee_id):
+        """Minutos ocupados do funcionário dentro do horário de funcionamento"""
+        return count_minutes(self.busy_mask(employee_id) & self.open_mask)
+
+    def free_since(self, employee_id, minute):
+        """Minuto em que terminou o último atendimento do funcionário antes de `minute` (ou a abertura)"""
+        last_end = self.open_minute or 0
+        for busy_start, busy_end in self.busy.get(employee_id, []):
+            if busy_start >= minute:
+                break
+            last_end = max(last_end, busy_end)
+        return last_end
+
+    def reserve(self, employee_id, start, end):
+        """Marca o intervalo como ocupado apenas nesta instância (atribuições em lote)"""
+        self.busy = dict(self.busy)
+        self.busy[employee_id] = merge_intervals(list(self.busy.get(employee_id, [])) + [(start, end)])
+        self._busy_masks.pop(employee_id, None)
+
+    def start_mask(self, employee_id, duration):
+        """Minutos de início em que o serviço cabe no horário livre do funcionário"""
+        return fit_mask(self.open_mask & ~self.busy_mask(employee_id), duration)
+
+    def end_mask(self, employee_id):
+        """Minutos em que algum atendimento do funcionário termina dentro do expediente"""
+        mask = 0
+        for _, busy_end in self.busy.get(employee_id, []):
+            if self.open_minute <= busy_end < self.close_minute:
+                mask |= 1 << busy_end
+        return mask
+
+    def available_mask(self, duration, employee_ids, step=30, earliest=None, pack_gaps=False):
+        """
+        Máscara dos inícios em que pelo menos um dos funcionários comporta o serviço.
+
+        Os inícios candidatos são a grade a cada `step` minutos a partir da abertura
+        e, com `pack_gaps`, também o término de cada atendimento do funcionário, para
+        que o próximo serviço possa começar logo em seguida sem deixar buraco.
+
+        Args:
+            duration: Duração do serviço em minutos
+            employee_ids: Funcionários candidatos
+            step: Intervalo entre slots em minutos
+            earliest: Só considerar inícios estritamente posteriores a este minuto
+            pack_gaps: Incluir inícios alinhados ao término dos atendimentos
+        """
+        if not self.works_this_day or not employee_ids:
+            return 0
+
+        grid = grid_mask(self.open_minute, self.close_minute, step)
+        mask = 0
+        for employee_id in employee_ids:
+            candidates = grid | self.end_mask(employee_id) if pack_gaps else grid
+            mask |= self.start_mask(employee_id, duration) & candidates
+
+        if earliest is not None:
+            mask &= ~span_mask(0, earliest + 1)
+
+        record('slots_evaluated', count_minutes(grid) * len(employee_ids))
+        record('slots_available', count_minutes(mask))
+        return mask
+
+    def occupancy(self, employee_ids):
+        """
+        Ocupação de cada funcionário dentro do horário de funcionamento.
+
+        Returns:
+            Dict[int, dict]: {employee_id: {"busy_minutes", "open_minutes", "rate"}}
+        """
+        open_minutes = count_minutes(self.open_mask)
+        report = {}
+        for employee_id in employee_ids:
+            busy_minutes = self.busy_minutes(employee_id)
+            report[employee_id] = {
+                'busy_minutes': busy_minutes,
+                'open_minutes': open_minutes,
+                'rate': busy_minutes / open_minutes if open_minutes else 0,
+            }
+        return report
@@ -0,0 +1,65 @@
+"""
+Representação da agenda de um dia como máscara de bits.
+Cada bit corresponde a um minuto do dia (bit 0 = 00:00), de modo que perguntas
+como "um serviço de D minutos pode começar aqui?" viram operações AND/shift em
+um único inteiro, e combinar vários funcionários é um OR.
+"""
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def span_mask(start, end):
+    """Máscara com os minutos [start, end) ligados, limitada ao dia"""
+    start = max(start, 0)
+    end = min(end, MINUTES_PER_DAY)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def intervals_to_mask(intervals):
+    """Converte uma lista de intervalos (início, fim) em minutos para máscara"""
+    mask = 0
+    for start, end in intervals:
+        mask |= span_mask(start, end)
+    return mask
+
+
+def grid_mask(start, end, step):
+    """Máscara com um bit a cada `step` minutos entre start e end (inclusive)"""
+    mask = 0
+    for minute in range(max(start, 0), min(end, MINUTES_PER_DAY - 1) + 1, step):
+        mask |= 1 << minute
+    return mask
+
+
+def fit_mask(free_mask, duration):
+    """
+    Minutos em que um bloco de `duration` minutos livres pode começar.
+
+    O bit s do resultado fica ligado se os bits s..s+duration-1 de free_mask
+    estiverem todos ligados. Usa duplicação: O(log duration) operações.
+    """
+    if duration <= 0:
+        return free_mask
+
+    result = free_mask
+    covered = 1
+    while covered < duration:
+        shift = min(covered, duration - covered)
+        result &= result >> shift
+        covered += shift
+    return result
+
+
+def iter_minutes(mask):
+    """Percorre os minutos ligados da máscara em ordem crescente"""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def count_minutes(mask):
+    """Quantidade de minutos ligados na máscara"""
+    return bin(mask).count('1')
@@ -0,0 +1,70 @@
+"""
+Dados da página de agendamento do cliente (client_booking).
+A página tem um número fixo de consultas: o link vem com salão e cliente, o
+histórico vem com serviço, funcionário e multa em uma só consulta, as multas
+pendentes são somadas no banco e os menus de serviços e funcionários ficam em
+cache por salão.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Sum
+
+from core.utils.cache import cached_get, invalidate_salon, salon_key
+
+
+# Os sinais de Service e Employee descartam os menus; o prazo cobre mudanças
+# de nome feitas direto no usuário do funcionário
+BOOKING_MENUS_TIMEOUT = 60 * 10
+
+
+def booking_menus_cache_key(salon_id):
+    return salon_key(salon_id, 'booking_menus')
+
+
+def get_booking_menus(salon):
+    """
+    Serviços e funcionários ativos do salão para os menus do formulário.
+
+    Returns:
+        Tuple[list, list]: (serviços, funcionários com o usuário carregado)
+    """
+    key = booking_menus_cache_key(salon.id)
+    menus = cached_get('booking_menus', key)
+    if menus is None:
+        menus = (
+            list(salon.services.filter(is_active=True)),
+            list(salon.employees.filter(is_active=True).select_related('user')),
+        )
+        cache.set(key, menus, BOOKING_MENUS_TIMEOUT)
+    return menus
+
+
+def invalidate_booking_menus(salon_id):
+    """Descarta os menus do salão"""
+    invalidate_salon(salon_id, 'booking_menus')
+
+
+def pending_fees_total(client, salon):
+    """Soma das multas de cancelamento em aberto do cliente no salão (uma consulta)"""
+    from appointments.models import CancellationFee
+
+    if client is None:
+        return Decimal('0.00')
+
+    total = CancellationFee.objects.filter(
+        appointment__client=client,
+        appointment__salon=salon,
+        is_paid=False
+    ).aggregate(total=Sum('amount'))['total']
+    return total or Decimal('0.00')
+
+
+def client_history(link):
+    """
+    Agendamentos do cliente no salão com serviço, funcionário e multa já
+    carregados, para o template não consultar o banco por linha.
+    """
+    return list(link.get_client_appointments().select_related(
+        'service', 'employee__user', 'cancellation_fee__cancelled_by_employee__user'
+    ))
@@ -0,0 +1,139 @@
+"""
+Conclusão de atendimentos.
+complete_appointment marca o agendamento como concluído e grava o evento no
+outbox (AppointmentEvent) e o job que o processa na mesma transação; o worker
+(manage.py run_worker) aplica depois os lançamentos financeiros, de forma
+idempotente. process_outbox também pode ser rodado em lote como varredura.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.utils.jobs import enqueue
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 500
+
+
+def complete_appointment(appointment, actor):
+    """
+    Conclui o atendimento e registra o evento de conclusão.
+
+    Repetir a chamada (clique duplo, reenvio do formulário) não gera um novo
+    evento: o agendamento é bloqueado e o evento é único por agendamento.
+
+    Returns:
+        bool: True se o atendimento foi concluído agora, False se já estava concluído
+    """
+    from appointments.models import Appointment, AppointmentEvent
+
+    with transaction.atomic():
+        locked = Appointment.objects.select_for_update().get(pk=appointment.pk)
+        if locked.status == 'completed':
+            appointment.status = locked.status
+            return False
+
+        appointment.status = 'completed'
+        appointment.save(update_fields=['status', 'updated_at'])
+
+        event, created = AppointmentEvent.objects.get_or_create(
+            appointment=appointment,
+            event_type='completed',
+            defaults={'actor': actor}
+        )
+
+        if created:
+            enqueue(process_completion_event, {'event_id': event.id})
+
+    return True
+
+
+def _completion_records(event):
+    """Lançamentos financeiros de um evento de conclusão"""
+    from salons.utils.ledger import commission_record, service_income_record
+
+    appointment = event.appointment
+    created_by = event.actor or appointment.salon.owner
+    return [service_income_record(appointment, created_by), commission_record(appointment, created_by)]
+
+
+def process_completion_event(event_id):
+    """Tarefa da fila de jobs: aplica os lançamentos de um evento de conclusão"""
+    from appointments.models import AppointmentEvent
+
+    process_outbox(event_ids=[event_id])
+    last_error = AppointmentEvent.objects.filter(id=event_id, processed_at__isnull=True).values_list(
+        'last_error', flat=True
+    ).first()
+    if last_error is not None:
+        # Falhou: a fila tenta de novo com espera crescente
+        raise RuntimeError(last_error or f'Evento {event_id} não processado')
+
+
+def process_outbox(batch_size=OUTBOX_BATCH_SIZE, event_ids=None):
+    """
+    Processa eventos pendentes do outbox em lotes.
+
+    Cada lote é lido com bloqueio (pulando linhas já bloqueadas por outro
+    worker, quando o banco permite) e gravado em uma transação. Os lançamentos
+    são idempotentes por (agendamento, categoria), então reprocessar um evento
+    não duplica valores. Eventos com erro ficam pendentes com a mensagem.
+
+    Returns:
+        int: Quantidade de eventos processados
+    """
+    from appointments.models import AppointmentEvent
+    from django.db import connection
+    from salons.utils.ledger import LedgerWriter
+
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    processed = 0
+    failed_ids = set()
+
+    while True:
+        with transaction.atomic():
+            events = AppointmentEvent.objects.select_for_update(skip_locked=skip_locked, of=('self',)).filter(
+                processed_at__isnull=True
+            )
+            if event_ids is not None:
+                events = events.filter(id__in=event_ids)
+            if failed_ids:
+                # Não tentar de novo na mesma execução
+                events = events.exclude(id__in=failed_ids)
+            events = list(
+                events.select_related(
+                    'actor', 'appointment__service', 'appointment__client',
+                    'appointment__employee__user', 'appointment__salon__owner'
+                ).order_by('created_at', 'id')[:batch_size]
+            )
+            if not events:
+                break
+
+            done, failed = [], []
+            with LedgerWriter(batch_size=batch_size) as writer:
+                for event in events:
+                    event.attempts += 1
+                    try:
+                        records = _completion_records(event)
+                    except Exception as exc:
+                        logger.exception('Falha ao processar evento %s', event.id)
+                        event.last_error = str(exc)
+                        failed.append(event)
+                        continue
+                    for record in records:
+                        writer.add(record)
+                    event.processed_at = timezone.now()
+                    event.last_error = ''
+                    done.append(event)
+
+            AppointmentEvent.objects.bulk_update(done + failed, ['attempts', 'processed_at', 'last_error'])
+            processed += len(done)
+            failed_ids.update(event.id for event in failed)
+
+        if len(events) < batch_size:
+            break
+
+    return processed
@@ -0,0 +1,137 @@
+"""
+Reservas temporárias de horários.
+Quando o cliente escolhe um horário, ele fica reservado por alguns minutos e sai
+da disponibilidade dos demais clientes; o agendamento final apenas converte a
+reserva, sem disputar locks com outros pedidos do mesmo salão.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .instrumentation import instrumented
+from .scheduling import is_employee_available, validate_appointment_request
+
+
+# Validade padrão de uma reserva em segundos
+DEFAULT_SLOT_HOLD_TTL_SECONDS = 300
+
+
+def get_hold_ttl():
+    """Validade das reservas, configurável por SLOT_HOLD_TTL_SECONDS"""
+    return timedelta(seconds=getattr(settings, 'SLOT_HOLD_TTL_SECONDS', DEFAULT_SLOT_HOLD_TTL_SECONDS))
+
+
+@instrumented('create_slot_hold')
+def create_slot_hold(link, service, start_dt, end_dt, employee=None):
+    """
+    Reserva o horário para o link, substituindo a reserva anterior do mesmo link.
+
+    Apenas a linha do funcionário escolhido é bloqueada, pelo tempo de gravar a
+    reserva, o que serializa pedidos concorrentes para a mesma pessoa sem travar
+    o salão inteiro.
+
+    Returns:
+        Tuple[Optional[SlotHold], str]: (reserva, mensagem_erro)
+    """
+    from appointments.models import SlotHold
+    from salons.models import Employee
+
+    salon = link.salon
+
+    with transaction.atomic():
+        # Escolher outro horário libera o anterior
+        SlotHold.objects.filter(link=link).delete()
+
+        is_valid, error_msg, assigned_employee = validate_appointment_request(
+            salon=salon,
+            service=service,
+            client=link.client,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            employee=employee,
+            link=link
+        )
+        if not is_valid:
+            return None, error_msg
+
+        # Re-verificar com o funcionário bloqueado, pois outro pedido pode ter reservado antes
+        Employee.objects.select_for_update().filter(id=assigned_employee.id).exists()
+        is_available, error_msg = is_employee_available(assigned_employee, start_dt, end_dt, link=link)
+        if not is_available:
+            return None, error_msg
+
+        hold = SlotHold.objects.create(
+            link=link,
+            salon=salon,
+            service=service,
+            employee=assigned_employee,
+            starts_at=start_dt,
+            ends_at=end_dt,
+            expires_at=timezone.now() + get_hold_ttl()
+        )
+
+    return hold, ""
+
+
+@instrumented('book_slot_hold')
+def book_slot_hold(link, hold_id, client, service, start_dt, notes=''):
+    """
+    Converte a reserva do link em agendamento.
+    A reserva precisa corresponder ao serviço e ao horário enviados no formulário.
+
+    As regras são validadas novamente sem locks: a reserva já tirou o horário da
+    disponibilidade dos outros clientes, e as restrições únicas do banco cobrem o
+    caso raro de um agendamento feito por outro caminho.
+
+    Returns:
+        Tuple[Optional[Appointment], str]: (agendamento, mensagem_erro)
+    """
+    from appointments.models import Appointment, SlotHold
+
+    hold = SlotHold.objects.select_related('service', 'employee').filter(
+        id=hold_id,
+        link=link,
+        service=service,
+        starts_at=start_dt,
+        expires_at__gt=timezone.now()
+    ).first()
+    if not hold:
+        return None, "Sua reserva de horário expirou. Por favor, escolha o horário novamente."
+
+    # O banco devolve os instantes em UTC; as regras de horário do salão usam o fuso local
+    local_start = timezone.localtime(hold.starts_at)
+    is_valid, error_msg, assigned_employee = validate_appointment_request(
+        salon=link.salon,
+        service=hold.service,
+        client=client,
+        start_dt=local_start,
+        end_dt=timezone.localtime(hold.ends_at),
+        employee=hold.employee,
+        link=link
+    )
+    if not is_valid:
+        return None, error_msg
+
+    appointment = Appointment.objects.create(
+        client=client,
+        salon=link.salon,
+        service=hold.service,
+        employee=assigned_employee,
+        appointment_date=local_start.date(),
+        appointment_time=local_start.time(),
+        notes=notes,
+        status='scheduled'
+    )
+    hold.delete()
+
+    return appointment, ""
+
+
+def purge_expired_holds(before=None):
+    """Remove reservas expiradas e retorna quantas foram apagadas"""
+    from appointments.models import SlotHold
+
+    deleted, _ = SlotHold.objects.filter(expires_at__lte=before or timezone.now()).delete()
+    return deleted
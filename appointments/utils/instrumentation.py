@@ -0,0 +1,73 @@
+"""
+Instrumentação amostrada do módulo de agendamentos.
+Uma fração das chamadas (SCHEDULING_INSTRUMENTATION_SAMPLE_RATE, de 0 a 1) é
+medida: tempo, consultas ao banco, slots avaliados e acertos de cache. As
+métricas saem em uma única linha de log por chamada, no logger
+"appointments.scheduling". Chamadas fora da amostra custam apenas um sorteio.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger('appointments.scheduling')
+
+# Métricas da chamada instrumentada em andamento (None quando fora da amostra)
+_current_metrics = ContextVar('scheduling_metrics', default=None)
+
+
+def get_sample_rate():
+    """Fração das chamadas que é instrumentada"""
+    return getattr(settings, 'SCHEDULING_INSTRUMENTATION_SAMPLE_RATE', 0.0)
+
+
+def record(metric, amount=1):
+    """Soma `amount` à métrica da chamada instrumentada atual, se houver"""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics[metric] = metrics.get(metric, 0) + amount
+
+
+def _count_queries(execute, sql, params, many, context):
+    record('queries')
+    return execute(sql, params, many, context)
+
+
+def instrumented(name):
+    """
+    Decorador que mede uma função do agendamento quando a chamada cai na amostra.
+    Chamadas aninhadas somam suas métricas às da chamada externa.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_metrics.get() is not None:
+                return func(*args, **kwargs)
+
+            sample_rate = get_sample_rate()
+            if sample_rate <= 0 or random.random() >= sample_rate:
+                return func(*args, **kwargs)
+
+            metrics = {'queries': 0}
+            token = _current_metrics.set(metrics)
+            started = time.perf_counter()
+            try:
+                with connection.execute_wrapper(_count_queries):
+                    return func(*args, **kwargs)
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                _current_metrics.reset(token)
+                logger.info(
+                    '%s duration_ms=%.1f %s',
+                    name,
+                    duration_ms,
+                    ' '.join(f'{key}={value}' for key, value in sorted(metrics.items())),
+                    extra={'scheduling': {'call': name, 'duration_ms': round(duration_ms, 1), **metrics}}
+                )
+        return wrapper
+    return decorator
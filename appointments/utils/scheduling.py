@@ -7,6 +7,17 @@ from django.utils import timezone
 from django.db import models
 from typing import Tuple, Optional
 
+from .availability import (
+    DayAvailability,
+    get_busy_intervals_range,
+    load_hold_intervals_range,
+    minutes_to_label,
+    overlay_intervals,
+)
+from .assignment import assignment_rotation, choose_employee, local_minutes
+from .bitmask import iter_minutes
+from .instrumentation import instrumented
+
 
 def compute_end_time(start_date, start_time, service):
     """Calcula o horário de término baseado na duração do serviço"""
@@ -83,36 +94,70 @@ def employee_can_perform_service(employee, service):
     return True, ""
 
 
-def is_employee_available(employee, start_dt, end_dt, use_locking=False):
-    """Verifica se o funcionário está disponível no horário solicitado"""
+def overlapping_appointments(queryset, start_dt, end_dt):
+    """
+    Restringe o queryset aos agendamentos ativos que se sobrepõem ao intervalo
+    [start_dt, end_dt).
+
+    Usa os campos persistidos starts_at/ends_at, então o teste de sobreposição é
+    uma comparação de intervalos atendida pelo índice (salão, funcionário, início).
+    """
+    return queryset.filter(
+        status__in=['scheduled', 'confirmed'],
+        starts_at__lt=end_dt,
+        ends_at__gt=start_dt
+    ).order_by('starts_at')
+
+
+def _first_conflict_time(query, use_locking):
+    """Horário do primeiro agendamento conflitante (ou None), com lock opcional"""
+    # Usar select_for_update para prevenir race conditions se solicitado
+    if use_locking:
+        query = query.select_for_update(of=('self',))
+
+    return query.values_list('appointment_time', flat=True).first()
+
+
+def employee_has_active_hold(employee, start_dt, end_dt, link=None):
+    """Verifica se outro cliente reservou temporariamente o funcionário no intervalo"""
+    from appointments.models import SlotHold
+
+    holds = SlotHold.objects.filter(
+        salon_id=employee.salon_id,
+        employee=employee,
+        expires_at__gt=timezone.now(),
+        starts_at__lt=end_dt,
+        ends_at__gt=start_dt
+    )
+    if link is not None:
+        holds = holds.exclude(link=link)
+
+    return holds.exists()
+
+
+def is_employee_available(employee, start_dt, end_dt, use_locking=False, link=None):
+    """
+    Verifica se o funcionário está disponível no horário solicitado.
+    Reservas temporárias de outros links também ocupam o funcionário.
+    """
     if not employee:
         return True, ""
 
     from appointments.models import Appointment
 
     # Buscar agendamentos conflitantes do funcionário
-    query = Appointment.objects.filter(
-        employee=employee,
-        appointment_date=start_dt.date(),
-        status__in=['scheduled', 'confirmed']
+    query = overlapping_appointments(
+        Appointment.objects.filter(salon_id=employee.salon_id, employee=employee),
+        start_dt,
+        end_dt
     )
 
-    # Usar select_for_update para prevenir race conditions se solicitado
-    if use_locking:
-        query = query.select_for_update()
-
-    conflicting_appointments = query
+    conflict_time = _first_conflict_time(query, use_locking)
+    if conflict_time:
+        return False, f"Funcionário já tem agendamento às {conflict_time.strftime('%H:%M')}"
 
-    for appointment in conflicting_appointments:
-        # Criar datetime timezone-aware para comparação
-        existing_start = timezone.make_aware(
-            datetime.combine(appointment.appointment_date, appointment.appointment_time),
-            timezone=start_dt.tzinfo
-        )
-        existing_end = existing_start + timedelta(minutes=appointment.service.duration)
-
-        if overlaps(start_dt, end_dt, existing_start, existing_end):
-            return False, f"Funcionário já tem agendamento às {appointment.appointment_time.strftime('%H:%M')}"
+    if employee_has_active_hold(employee, start_dt, end_dt, link):
+        return False, "Este horário está reservado por outro cliente. Escolha outro horário."
 
     return True, ""
 
@@ -121,61 +166,62 @@ def client_has_conflict(client, salon, start_dt, end_dt, exclude_appointment=Non
     """Verifica se o cliente já tem agendamento conflitante"""
     from appointments.models import Appointment
 
-    query = Appointment.objects.filter(
-        client=client,
-        salon=salon,
-        appointment_date=start_dt.date(),
-        status__in=['scheduled', 'confirmed']
+    query = overlapping_appointments(
+        Appointment.objects.filter(client=client, salon=salon),
+        start_dt,
+        end_dt
     )
 
     if exclude_appointment:
         query = query.exclude(id=exclude_appointment.id)
 
-    # Usar select_for_update para prevenir race conditions se solicitado
-    if use_locking:
-        query = query.select_for_update()
-
-    for appointment in query:
-        # Criar datetime timezone-aware para comparação
-        existing_start = timezone.make_aware(
-            datetime.combine(appointment.appointment_date, appointment.appointment_time),
-            timezone=start_dt.tzinfo
-        )
-        existing_end = existing_start + timedelta(minutes=appointment.service.duration)
-
-        if overlaps(start_dt, end_dt, existing_start, existing_end):
-            return True, f"Cliente já tem agendamento às {appointment.appointment_time.strftime('%H:%M')}"
+    conflict_time = _first_conflict_time(query, use_locking)
+    if conflict_time:
+        return True, f"Cliente já tem agendamento às {conflict_time.strftime('%H:%M')}"
 
     return False, ""
 
 
-def find_available_employee(salon, service, start_dt, end_dt):
-    """Encontra um funcionário disponível para o serviço no horário especificado"""
+@instrumented('find_available_employee')
+def find_available_employee(salon, service, start_dt, end_dt, link=None):
+    """
+    Encontra um funcionário disponível para o serviço no horário especificado.
+
+    Todos os qualificados são avaliados de uma vez sobre a ocupação do dia (com as
+    reservas temporárias de outros links), e a escolha segue a política de
+    distribuição do salão em vez de sempre favorecer o primeiro da lista.
+    """
     from salons.models import Employee
 
     # Buscar funcionários qualificados
-    qualified_employees = Employee.objects.filter(
-        salon=salon,
-        is_active=True,
-        services=service
-    ).distinct()
-
-    for employee in qualified_employees:
-        can_perform, _ = employee_can_perform_service(employee, service)
-        if not can_perform:
-            continue
-
-        is_available, _ = is_employee_available(employee, start_dt, end_dt)
-        if is_available:
-            return employee
-
-    return None
-
-
-def validate_appointment_request(salon, service, client, start_dt, end_dt, employee=None, exclude_appointment=None, use_locking=False):
+    qualified_employees = {
+        employee.id: employee
+        for employee in Employee.objects.filter(
+            salon=salon,
+            is_active=True,
+            services=service
+        ).distinct()
+    }
+    if not qualified_employees:
+        return None
+
+    availability = DayAvailability.load(salon, timezone.localtime(start_dt).date(), holds=True, exclude_link=link)
+    start, end = local_minutes(start_dt, end_dt)
+
+    rotation = None
+    if salon.assignment_policy == 'round_robin':
+        rotation = assignment_rotation(salon, list(qualified_employees))
+
+    employee_id = choose_employee(availability, qualified_employees, start, end, salon.assignment_policy, rotation)
+    return qualified_employees.get(employee_id)
+
+
+@instrumented('validate_appointment_request')
+def validate_appointment_request(salon, service, client, start_dt, end_dt, employee=None, exclude_appointment=None, use_locking=False, link=None):
     """
     Valida um pedido de agendamento considerando todas as regras de negócio.
     Com proteção contra race conditions quando use_locking=True.
+    Reservas temporárias do próprio link (quando informado) não contam como conflito.
 
     Returns:
         Tuple[bool, str, Optional[Employee]]: (sucesso, mensagem_erro, funcionario_atribuido)
@@ -199,18 +245,18 @@ def validate_appointment_request(salon, service, client, start_dt, end_dt, emplo
         if not can_perform:
             return False, error_msg, None
 
-        is_available, error_msg = is_employee_available(employee, start_dt, end_dt, use_locking)
+        is_available, error_msg = is_employee_available(employee, start_dt, end_dt, use_locking, link)
         if not is_available:
             return False, error_msg, None
     else:
         # 5. Encontrar funcionário disponível
-        employee = find_available_employee(salon, service, start_dt, end_dt)
+        employee = find_available_employee(salon, service, start_dt, end_dt, link)
         if not employee:
             return False, "Nenhum funcionário disponível para este horário e serviço", None
 
         # Re-verificar disponibilidade com locking se solicitado
         if use_locking:
-            is_available, error_msg = is_employee_available(employee, start_dt, end_dt, use_locking)
+            is_available, error_msg = is_employee_available(employee, start_dt, end_dt, use_locking, link)
             if not is_available:
                 return False, error_msg, None
 
@@ -246,7 +292,56 @@ def validate_appointment_request(salon, service, client, start_dt, end_dt, emplo
     return True, "", employee
 
 
-def get_available_time_slots(salon, service, date, employee=None):
+def _salon_open_on(salon, date):
+    """Verifica se o salão funciona e não está temporariamente fechado na data"""
+    open_time, close_time = salon.get_working_hours(date.weekday())
+    if not open_time or not close_time:
+        return False
+
+    start_dt_check = timezone.make_aware(datetime.combine(date, open_time))
+    end_dt_check = timezone.make_aware(datetime.combine(date, close_time))
+    salon_open, _ = is_salon_open(salon, start_dt_check, end_dt_check)
+    return salon_open
+
+
+def _candidate_employee_ids(salon, service, employee=None):
+    """Funcionários que podem atender o serviço (o escolhido ou todos os qualificados)"""
+    from salons.models import Employee
+
+    if employee:
+        can_perform, _ = employee_can_perform_service(employee, service)
+        return [employee.id] if can_perform else []
+
+    return list(Employee.objects.filter(
+        salon=salon,
+        is_active=True,
+        services=service
+    ).distinct().values_list('id', flat=True))
+
+
+def _day_slot_mask(availability, service, employee_ids, now_in_tz):
+    """Máscara dos inícios livres de um dia já carregado, respeitando o horário atual"""
+    date = availability.date
+    if date < now_in_tz.date() or not _salon_open_on(availability.salon, date):
+        return 0
+
+    # Slots de hoje precisam começar depois do minuto atual
+    earliest = None
+    if date == now_in_tz.date():
+        earliest = now_in_tz.hour * 60 + now_in_tz.minute
+
+    salon = availability.salon
+    return availability.available_mask(
+        service.duration,
+        employee_ids,
+        step=salon.slot_interval,
+        earliest=earliest,
+        pack_gaps=salon.pack_slots_after_appointments
+    )
+
+
+@instrumented('get_available_time_slots')
+def get_available_time_slots(salon, service, date, employee=None, link=None):
     """
     Retorna horários disponíveis para agendamento em uma data específica.
 
@@ -255,143 +350,63 @@ def get_available_time_slots(salon, service, date, employee=None):
         service: Instância do serviço
         date: Data para verificar disponibilidade
         employee: Funcionário específico (opcional)
+        link: Link do cliente; suas próprias reservas temporárias não bloqueiam horários
 
     Returns:
         List[str]: Lista de horários disponíveis em formato "HH:MM"
     """
-    from appointments.models import Appointment
-
-    print(f"DEBUG: Iniciando get_available_time_slots")
-    print(f"DEBUG: Salão: {salon.name}")
-    print(f"DEBUG: Serviço: {service.name} (duração: {service.duration} min)")
-    print(f"DEBUG: Data: {date}")
-    print(f"DEBUG: Funcionário: {employee}")
+    # Obter hora atual no timezone configurado
+    now_in_tz = timezone.localtime(timezone.now())
+    if date < now_in_tz.date() or not _salon_open_on(salon, date):
+        return []
 
-    available_slots = []
+    employee_ids = _candidate_employee_ids(salon, service, employee)
+    if not employee_ids:
+        return []
 
-    # Verificar se o salão funciona neste dia
-    day_of_week = date.weekday()
-    open_time, close_time = salon.get_working_hours(day_of_week)
-    
-    print(f"DEBUG: Dia da semana: {day_of_week}")
-    print(f"DEBUG: Horário de funcionamento: {open_time} - {close_time}")
+    availability = DayAvailability.load(salon, date, holds=True, exclude_link=link)
+    slot_mask = _day_slot_mask(availability, service, employee_ids, now_in_tz)
+    return [minutes_to_label(start) for start in iter_minutes(slot_mask)]
 
-    if not open_time or not close_time:
-        print(f"DEBUG: Salão não funciona neste dia")
-        return available_slots
 
-    # Verificar se o salão está aberto (não temporariamente fechado)
-    start_dt_check = timezone.make_aware(datetime.combine(date, open_time))
-    end_dt_check = timezone.make_aware(datetime.combine(date, close_time))
-    salon_open, error_msg = is_salon_open(salon, start_dt_check, end_dt_check)
-    
-    print(f"DEBUG: Salão aberto: {salon_open}")
-    if not salon_open:
-        print(f"DEBUG: Motivo: {error_msg}")
-
-    if not salon_open:
-        return available_slots
-
-    # Buscar todos os agendamentos do dia para otimizar consultas
-    existing_appointments = Appointment.objects.filter(
-        salon=salon,
-        appointment_date=date,
-        status__in=['scheduled', 'confirmed']
-    ).select_related('service', 'employee')
+@instrumented('get_available_time_slots_range')
+def get_available_time_slots_range(salon, service, date_from, date_to, employee=None, link=None):
+    """
+    Retorna a disponibilidade de vários dias de uma vez, como bitmap de slots por dia.
 
-    # Gerar slots de 30 em 30 minutos
-    current_time = datetime.combine(date, open_time)
-    end_time = datetime.combine(date, close_time)
+    Cada dia traz o horário do primeiro slot, o passo em minutos do salão e uma
+    string de "0"/"1" com um caractere por slot da grade entre a abertura e o
+    fechamento. Horários livres fora da grade (logo após um atendimento) vêm em
+    "extra". Dias em que o salão não funciona retornam bitmap vazio.
 
-    # Obter hora atual no timezone configurado
+    Returns:
+        Dict[str, dict]: {"AAAA-MM-DD": {"start": "HH:MM", "step": 30, "bitmap": "0110...", "extra": []}}
+    """
     now_in_tz = timezone.localtime(timezone.now())
-    
-    print(f"DEBUG: Hora atual: {now_in_tz}")
-    print(f"DEBUG: Gerando slots de {current_time} até {end_time}")
-
-    while current_time <= end_time:
-        slot_start_dt = timezone.make_aware(current_time)
-        slot_end_dt = compute_end_time_aware(slot_start_dt, service)
-
-        print(f"DEBUG: Testando slot {current_time.strftime('%H:%M')} - {slot_end_dt.strftime('%H:%M')}")
-
-        # Verificar se o slot termina antes ou exatamente no fechamento
-        if slot_end_dt <= timezone.make_aware(end_time):
-            print(f"DEBUG: Slot termina antes do fechamento: OK")
-            # Verificar se está no futuro (comparar com hora local)
-            if slot_start_dt > now_in_tz:
-                print(f"DEBUG: Slot está no futuro: OK")
-                slot_available = False
-
-                if employee:
-                    # Verificar se o funcionário específico está disponível
-                    employee_free = True
-                    for appointment in existing_appointments:
-                        if appointment.employee == employee:
-                            existing_start = timezone.make_aware(
-                                datetime.combine(appointment.appointment_date, appointment.appointment_time)
-                            )
-                            existing_end = compute_end_time_aware(existing_start, appointment.service)
-
-                            if overlaps(slot_start_dt, slot_end_dt, existing_start, existing_end):
-                                employee_free = False
-                                break
-
-                    if employee_free:
-                        # Verificar se funcionário pode realizar o serviço
-                        can_perform, _ = employee_can_perform_service(employee, service)
-                        if can_perform:
-                            slot_available = True
-                else:
-                    # Buscar qualquer funcionário disponível para este serviço
-                    from salons.models import Employee
-
-                    qualified_employees = Employee.objects.filter(
-                        salon=salon,
-                        is_active=True,
-                        services=service
-                    ).distinct()
-                    
-                    print(f"DEBUG: Funcionários qualificados: {[f'{emp.user.first_name} {emp.user.last_name}' for emp in qualified_employees]}")
-
-                    for emp in qualified_employees:
-                        emp_available = True
-                        print(f"DEBUG: Verificando funcionário {emp.user.first_name} {emp.user.last_name}")
-                        
-                        for appointment in existing_appointments:
-                            if appointment.employee == emp:
-                                existing_start = timezone.make_aware(
-                                    datetime.combine(appointment.appointment_date, appointment.appointment_time)
-                                )
-                                existing_end = compute_end_time_aware(existing_start, appointment.service)
-                                
-                                print(f"DEBUG: Agendamento existente: {existing_start.strftime('%H:%M')} - {existing_end.strftime('%H:%M')}")
-
-                                if overlaps(slot_start_dt, slot_end_dt, existing_start, existing_end):
-                                    print(f"DEBUG: Conflito encontrado!")
-                                    emp_available = False
-                                    break
-
-                        if emp_available:
-                            print(f"DEBUG: Funcionário {emp.user.first_name} disponível!")
-                            slot_available = True
-                            break
-                        else:
-                            print(f"DEBUG: Funcionário {emp.user.first_name} ocupado")
-
-                if slot_available:
-                    print(f"DEBUG: Slot {current_time.strftime('%H:%M')} DISPONÍVEL")
-                    available_slots.append(current_time.strftime('%H:%M'))
-                else:
-                    print(f"DEBUG: Slot {current_time.strftime('%H:%M')} ocupado")
-            else:
-                print(f"DEBUG: Slot {current_time.strftime('%H:%M')} no passado")
-        else:
-            print(f"DEBUG: Slot {current_time.strftime('%H:%M')} termina depois do fechamento")
-
-        # Próximo slot (incrementar 30 minutos)
-        current_time += timedelta(minutes=30)
+    step = salon.slot_interval
+    dates = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    employee_ids = _candidate_employee_ids(salon, service, employee)
+    busy_by_date = get_busy_intervals_range(salon, dates) if employee_ids else {}
+    holds_by_date = load_hold_intervals_range(salon, date_from, date_to, link) if employee_ids else {}
+
+    days = {}
+    for date in dates:
+        busy = overlay_intervals(busy_by_date.get(date, {}), holds_by_date.get(date, {}))
+        availability = DayAvailability(salon, date, busy)
+        if not availability.works_this_day:
+            days[date.isoformat()] = {'start': None, 'step': step, 'bitmap': '', 'extra': []}
+            continue
 
-    print(f"DEBUG: Total de slots disponíveis: {len(available_slots)}")
-    print(f"DEBUG: Slots: {available_slots}")
-    return available_slots
\ No newline at end of file
+        slot_mask = _day_slot_mask(availability, service, employee_ids, now_in_tz) if employee_ids else 0
+        grid = range(availability.open_minute, availability.close_minute + 1, step)
+        days[date.isoformat()] = {
+            'start': minutes_to_label(availability.open_minute),
+            'step': step,
+            'bitmap': ''.join('1' if slot_mask >> minute & 1 else '0' for minute in grid),
+            'extra': [
+                minutes_to_label(minute) for minute in iter_minutes(slot_mask)
+                if (minute - availability.open_minute) % step
+            ],
+        }
+
+    return days
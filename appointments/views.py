@@ -9,39 +9,38 @@ from datetime import datetime, date
 from .models import LinkAgendamento, Appointment, CancellationFee
 from salons.models import Salon, Service, Employee
 from accounts.models import UserProfile
-from .utils.scheduling import validate_appointment_request, compute_end_time, get_available_time_slots
+from .utils.scheduling import validate_appointment_request, compute_end_time, get_available_time_slots, get_available_time_slots_range
+from .utils.booking import client_history, get_booking_menus, pending_fees_total
+from .utils.holds import create_slot_hold, book_slot_hold
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maior período aceito pela API de disponibilidade por intervalo
+MAX_SLOTS_RANGE_DAYS = 62
 
 def client_booking(request, token):
     """Página de agendamento do cliente via link único"""
     try:
-        link = get_object_or_404(LinkAgendamento, token=token, is_active=True)
+        link = get_object_or_404(
+            LinkAgendamento.objects.select_related('salon', 'client'), token=token, is_active=True
+        )
         salon = link.salon
 
         # Se o link já está vinculado a um cliente, mostrar histórico e formulário de novo agendamento
         if link.client:
             client = link.client
-            appointments = link.get_client_appointments()
-
-            # Verificar se há reagendamentos pendentes
-            pending_reschedules = appointments.filter(status='rescheduled')
-
-            # Verificar se há multas de cancelamento pendentes
-            pending_fees = CancellationFee.objects.filter(
-                appointment__client=client,
-                appointment__salon=salon,
-                is_paid=False
-            )
-            pending_fees_total = sum(fee.amount for fee in pending_fees)
 
+            # Verificar se há multas de cancelamento pendentes (somadas no banco)
+            fees_total = pending_fees_total(client, salon)
 
             if request.method == 'POST':
-                print(f"POST REQUEST RECEBIDO - Cliente existente")
-                print(f"POST data: {dict(request.POST)}")
+                logger.debug("Agendamento recebido - cliente existente (link %s)", link.id)
                 action = request.POST.get('action')
 
                 # Verifica se há multas pendentes antes de permitir novo agendamento
-                if pending_fees_total > 0:
-                    messages.error(request, f'Você possui multas pendentes no valor total de R$ {pending_fees_total:.2f}. Por favor, regularize para agendar novos serviços.')
+                if fees_total > 0:
+                    messages.error(request, f'Você possui multas pendentes no valor total de R$ {fees_total:.2f}. Por favor, regularize para agendar novos serviços.')
                     return redirect('appointments:client_booking', token=token)
 
                 if action == 'new_appointment':
@@ -76,6 +75,17 @@ def client_booking(request, token):
                             end_dt = compute_end_time(appointment_date_obj, appointment_time_obj, service)
                             end_dt = timezone.make_aware(end_dt)
 
+                            # Horário reservado ao escolher: basta converter a reserva
+                            hold_id = request.POST.get('hold_id')
+                            if hold_id:
+                                appointment, error_msg = book_slot_hold(link, hold_id, client, service, start_dt, notes)
+                                if not appointment:
+                                    messages.error(request, error_msg)
+                                    return redirect('appointments:client_booking', token=token)
+
+                                messages.success(request, 'Agendamento realizado com sucesso!')
+                                return redirect('appointments:client_booking', token=token)
+
                             # Verificar se já existe agendamento para este horário específico
                             existing_appointment = Appointment.objects.select_for_update().filter(
                                 salon=salon,
@@ -99,7 +109,8 @@ def client_booking(request, token):
                                 start_dt=start_dt,
                                 end_dt=end_dt,
                                 employee=employee,
-                                use_locking=True
+                                use_locking=True,
+                                link=link
                             )
 
                             if not is_valid:
@@ -123,13 +134,10 @@ def client_booking(request, token):
 
                     except Exception as e:
                         from django.db import IntegrityError
-                        print(f"ERRO AGENDAMENTO CLIENTE EXISTENTE: {str(e)}")
-                        print(f"Service ID: {service_id}")
-                        print(f"Employee ID: {employee_id}")
-                        print(f"Date: {appointment_date}")
-                        print(f"Time: {appointment_time}")
-                        import traceback
-                        traceback.print_exc()
+                        logger.exception(
+                            "Erro no agendamento de cliente existente (serviço=%s, funcionário=%s, data=%s, horário=%s)",
+                            service_id, employee_id, appointment_date, appointment_time
+                        )
 
                         if isinstance(e, IntegrityError) and 'UNIQUE constraint failed' in str(e):
                             messages.error(request, 'Este horário já está ocupado. Por favor, escolha outro horário.')
@@ -138,9 +146,10 @@ def client_booking(request, token):
                         return redirect('appointments:client_booking', token=token)
 
             # Mostrar histórico e formulário
-            services = salon.services.filter(is_active=True)
-            employees = salon.employees.filter(is_active=True)
-            
+            appointments = client_history(link)
+            pending_reschedules = [appointment for appointment in appointments if appointment.status == 'rescheduled']
+            services, employees = get_booking_menus(salon)
+
             # Verificar se é o primeiro agendamento (flag na query string)
             show_pwa_prompt = request.GET.get('first_booking') == '1'
 
@@ -154,7 +163,7 @@ def client_booking(request, token):
                 'employees': employees,
                 'is_existing_client': True,
                 'today': timezone.localtime(timezone.now()).date(),
-                'pending_fees_total': pending_fees_total,
+                'pending_fees_total': fees_total,
                 'show_pwa_prompt': show_pwa_prompt,
                 'booking_token': str(token)
             })
@@ -162,8 +171,7 @@ def client_booking(request, token):
         else:
             # Link não vinculado - formulário de primeiro agendamento
             if request.method == 'POST':
-                print(f"POST REQUEST RECEBIDO - Cliente novo")
-                print(f"POST data: {dict(request.POST)}")
+                logger.debug("Agendamento recebido - cliente novo (link %s)", link.id)
                 try:
                     with transaction.atomic():
                         # Dados do cliente
@@ -225,6 +233,19 @@ def client_booking(request, token):
                         end_dt = compute_end_time(appointment_date_obj, appointment_time_obj, service)
                         end_dt = timezone.make_aware(end_dt)
 
+                        # Horário reservado ao escolher: basta converter a reserva
+                        hold_id = request.POST.get('hold_id')
+                        if hold_id:
+                            appointment, error_msg = book_slot_hold(link, hold_id, client, service, start_dt, notes)
+                            if not appointment:
+                                # Desfaz o cadastro feito acima nesta transação
+                                transaction.set_rollback(True)
+                                messages.error(request, error_msg)
+                                return redirect('appointments:client_booking', token=token)
+
+                            messages.success(request, 'Cadastro e agendamento realizados com sucesso!')
+                            return redirect(f'/appointments/booking/{token}/?first_booking=1')
+
                         # Verificar se já existe agendamento para este horário específico
                         existing_appointment = Appointment.objects.select_for_update().filter(
                             salon=salon,
@@ -248,7 +269,8 @@ def client_booking(request, token):
                             start_dt=start_dt,
                             end_dt=end_dt,
                             employee=employee,
-                            use_locking=True
+                            use_locking=True,
+                            link=link
                         )
 
                         if not is_valid:
@@ -272,14 +294,12 @@ def client_booking(request, token):
 
                 except Exception as e:
                     from django.db import IntegrityError
-                    print(f"ERRO CLIENTE NOVO: {str(e)}")
-                    print(f"Client Name: {request.POST.get('client_name', '')}")
-                    print(f"Client Email: {request.POST.get('client_email', '')}")
-                    print(f"Service ID: {request.POST.get('service_id', '')}")
-                    print(f"Date: {request.POST.get('appointment_date', '')}")
-                    print(f"Time: {request.POST.get('appointment_time', '')}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception(
+                        "Erro no agendamento de cliente novo (serviço=%s, data=%s, horário=%s)",
+                        request.POST.get('service_id', ''),
+                        request.POST.get('appointment_date', ''),
+                        request.POST.get('appointment_time', '')
+                    )
 
                     if isinstance(e, IntegrityError) and 'UNIQUE constraint failed' in str(e):
                         messages.error(request, 'Este horário já está ocupado. Por favor, escolha outro horário.')
@@ -288,20 +308,14 @@ def client_booking(request, token):
                     return redirect('appointments:client_booking', token=token)
 
             # Formulário inicial para cliente não vinculado
-            services = salon.services.filter(is_active=True)
-            employees = salon.employees.filter(is_active=True)
+            services, employees = get_booking_menus(salon)
 
             # Verificar multas pendentes para cliente não vinculado (caso o link já tenha sido associado a um cliente mas ele ainda não agendou)
-            pending_fees = CancellationFee.objects.filter(
-                appointment__client=link.client,
-                appointment__salon=salon,
-                is_paid=False
-            )
-            pending_fees_total = sum(fee.amount for fee in pending_fees)
+            fees_total = pending_fees_total(link.client, salon)
 
             # Se houver multas pendentes, redirecionar para uma página de aviso ou mostrar mensagem
-            if pending_fees_total > 0:
-                messages.error(request, f'Você possui multas pendentes no valor total de R$ {pending_fees_total:.2f}. Por favor, regularize para agendar novos serviços.')
+            if fees_total > 0:
+                messages.error(request, f'Você possui multas pendentes no valor total de R$ {fees_total:.2f}. Por favor, regularize para agendar novos serviços.')
                 # Poderia redirecionar para uma página específica de pagamento de multas se existisse
                 # return redirect('appointments:pay_fees', token=token) 
                 # Por enquanto, apenas impede o agendamento e exibe a mensagem
@@ -312,7 +326,7 @@ def client_booking(request, token):
                     'employees': employees,
                     'is_existing_client': False,
                     'today': timezone.localtime(timezone.now()).date(),
-                    'pending_fees_total': pending_fees_total
+                    'pending_fees_total': fees_total
                 })
 
 
@@ -413,7 +427,7 @@ def get_available_slots(request, token):
                     return JsonResponse({'error': 'Funcionário não encontrado'}, status=400)
 
             # Buscar horários disponíveis
-            available_slots = get_available_time_slots(salon, service, appointment_date, employee)
+            available_slots = get_available_time_slots(salon, service, appointment_date, employee, link)
 
             return JsonResponse({'slots': available_slots})
 
@@ -428,6 +442,118 @@ def get_available_slots(request, token):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def get_available_slots_range(request, token):
+    """API para retornar a disponibilidade de vários dias em uma única requisição"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    try:
+        link = get_object_or_404(LinkAgendamento, token=token, is_active=True)
+        salon = link.salon
+
+        # Parâmetros da requisição
+        service_id = request.GET.get('service_id')
+        employee_id = request.GET.get('employee_id') or None
+        date_from_str = request.GET.get('date_from')
+        date_to_str = request.GET.get('date_to')
+
+        if not service_id or not date_from_str or not date_to_str:
+            return JsonResponse({'error': 'Parâmetros obrigatórios: service_id, date_from e date_to'}, status=400)
+
+        try:
+            service = Service.objects.get(id=service_id, salon=salon, is_active=True)
+            date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
+            date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
+
+            if date_to < date_from:
+                return JsonResponse({'error': 'date_to deve ser igual ou posterior a date_from'}, status=400)
+
+            if (date_to - date_from).days >= MAX_SLOTS_RANGE_DAYS:
+                return JsonResponse({'error': f'Período máximo de {MAX_SLOTS_RANGE_DAYS} dias'}, status=400)
+
+            # Dias no passado não têm horários
+            date_from = max(date_from, timezone.localtime(timezone.now()).date())
+            if date_to < date_from:
+                return JsonResponse({'days': {}})
+
+            # Buscar funcionário se especificado
+            employee = None
+            if employee_id:
+                try:
+                    employee = Employee.objects.get(id=employee_id, salon=salon, is_active=True)
+                except Employee.DoesNotExist:
+                    return JsonResponse({'error': 'Funcionário não encontrado'}, status=400)
+
+            days = get_available_time_slots_range(salon, service, date_from, date_to, employee, link)
+
+            return JsonResponse({'days': days})
+
+        except Service.DoesNotExist:
+            return JsonResponse({'error': 'Serviço não encontrado'}, status=400)
+        except ValueError:
+            return JsonResponse({'error': 'Formato de data inválido'}, status=400)
+
+    except LinkAgendamento.DoesNotExist:
+        return JsonResponse({'error': 'Link não encontrado'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def hold_slot(request, token):
+    """API para reservar temporariamente o horário escolhido pelo cliente"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    try:
+        link = get_object_or_404(LinkAgendamento, token=token, is_active=True)
+        salon = link.salon
+
+        # Parâmetros da requisição
+        service_id = request.POST.get('service_id')
+        employee_id = request.POST.get('employee_id') or None
+        date_str = request.POST.get('appointment_date')
+        time_str = request.POST.get('appointment_time')
+
+        if not all([service_id, date_str, time_str]):
+            return JsonResponse({'error': 'Parâmetros obrigatórios: service_id, appointment_date e appointment_time'}, status=400)
+
+        try:
+            service = Service.objects.get(id=service_id, salon=salon, is_active=True)
+            appointment_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            appointment_time = datetime.strptime(time_str, '%H:%M').time()
+
+            # Buscar funcionário se especificado
+            employee = None
+            if employee_id:
+                try:
+                    employee = Employee.objects.get(id=employee_id, salon=salon, is_active=True)
+                except Employee.DoesNotExist:
+                    return JsonResponse({'error': 'Funcionário não encontrado'}, status=400)
+
+            start_dt = timezone.make_aware(datetime.combine(appointment_date, appointment_time))
+            end_dt = timezone.make_aware(compute_end_time(appointment_date, appointment_time, service))
+
+            hold, error_msg = create_slot_hold(link, service, start_dt, end_dt, employee)
+            if not hold:
+                return JsonResponse({'error': error_msg}, status=409)
+
+            return JsonResponse({
+                'hold_id': hold.id,
+                'employee_id': hold.employee_id,
+                'expires_at': hold.expires_at.isoformat(),
+            })
+
+        except Service.DoesNotExist:
+            return JsonResponse({'error': 'Serviço não encontrado'}, status=400)
+        except ValueError:
+            return JsonResponse({'error': 'Formato de data inválido'}, status=400)
+
+    except LinkAgendamento.DoesNotExist:
+        return JsonResponse({'error': 'Link não encontrado'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 def cancel_appointment(request, token, appointment_id):
     """Cliente cancela um agendamento - pode haver multa se for tarde demais"""
     if request.method != 'POST':
@@ -508,9 +634,7 @@ def cancel_appointment(request, token, appointment_id):
     except Appointment.DoesNotExist:
         messages.error(request, 'Agendamento não encontrado.')
     except Exception as e:
-        print(f"ERRO NO CANCELAMENTO: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro no cancelamento do agendamento %s", appointment_id)
         messages.error(request, f'Erro ao cancelar agendamento: {str(e)}')
 
     return redirect('appointments:client_booking', token=token)
\ No newline at end of file
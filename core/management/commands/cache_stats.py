@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from core.utils.cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Mostra acertos e falhas do cache compartilhado por espaço (disponibilidade, análises, preços...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zera os contadores depois de mostrar',
+        )
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        if not stats:
+            self.stdout.write('Nenhum acesso ao cache registrado ainda.')
+        for namespace, counters in stats.items():
+            self.stdout.write(
+                f'{namespace}: {counters["hits"]} acertos, {counters["misses"]} falhas '
+                f'({counters["hit_rate"]}% de acertos)'
+            )
+
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Contadores zerados.'))
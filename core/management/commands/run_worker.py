@@ -0,0 +1,86 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from core.utils.jobs import claim_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Executa os jobs da fila em segundo plano (e-mails, lançamentos financeiros...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=2,
+            help='Quantidade de threads executando jobs em paralelo (padrão: 2)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Espera (segundos) quando a fila está vazia (padrão: 2)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Executa os jobs prontos e termina (para agendadores como o cron)',
+        )
+        parser.add_argument(
+            '--allow-local-cache',
+            action='store_true',
+            help='Aceita cache local (arquivos/memória); só quando site e worker rodam na mesma máquina',
+        )
+
+    def handle(self, *args, **options):
+        # Os jobs descartam caches (análises, disponibilidade) que o site lê:
+        # com cache local essas invalidações não chegariam a outro serviço
+        if settings.CACHE_BACKEND not in settings.SHARED_CACHE_BACKENDS and not options['allow_local_cache']:
+            raise CommandError(
+                f'Cache "{settings.CACHE_BACKEND}" não é compartilhado com o site. '
+                'Defina REDIS_URL (ou CACHE_BACKEND=db) ou use --allow-local-cache '
+                'se site e worker rodam na mesma máquina.'
+            )
+
+        stop = threading.Event()
+        counters = {'done': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def shutdown(signum, frame):
+            # Termina o job atual e para de pegar novos
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        def work():
+            name = worker_name()
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    jobs = claim_jobs(limit=1, worker=name)
+                    if not jobs:
+                        if options['once']:
+                            break
+                        stop.wait(options['sleep'])
+                        continue
+                    for job in jobs:
+                        result = 'done' if run_job(job) else 'failed'
+                        with lock:
+                            counters[result] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(max(options['concurrency'], 1))]
+        self.stdout.write(f'Worker iniciado com {len(threads)} thread(s).')
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Worker finalizado: {counters["done"]} job(s) concluído(s), {counters["failed"]} com erro.')
+        )
@@ -1,3 +1,38 @@
 from django.db import models
 
-# Create your models here.
+
+class Job(models.Model):
+    """
+    Tarefa em segundo plano gravada no banco (fila de jobs).
+    Enfileirada com core.utils.jobs.enqueue e executada por "manage.py run_worker".
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pendente'),
+        ('running', 'Executando'),
+        ('done', 'Concluído'),
+        ('failed', 'Falhou'),
+    )
+
+    task = models.CharField(max_length=200, verbose_name="Tarefa")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Parâmetros")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Status")
+    run_at = models.DateTimeField(verbose_name="Executar a partir de")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Máximo de tentativas")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Reservado até")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    last_error = models.TextField(blank=True, verbose_name="Último erro")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finalizado em")
+
+    def __str__(self):
+        return f"{self.task} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
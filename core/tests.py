@@ -1,3 +1,107 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Job
+from core.utils.jobs import claim_jobs, enqueue, retry_delay, run_job, run_pending, task_path
+
+
+CALLS = []
+
+
+def record_call(value, fail=False):
+    """Tarefa usada nos testes: registra a chamada e falha se pedido"""
+    CALLS.append(value)
+    if fail:
+        raise RuntimeError(f'falhou com {value}')
+
+
+@override_settings(JOB_QUEUE_EAGER=False, JOB_VISIBILITY_TIMEOUT_SECONDS=300)
+class JobQueueTests(TestCase):
+    """Reserva, repetição com espera crescente e reserva vencida da fila de jobs"""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def make_ready(self, job):
+        """Antecipa a próxima tentativa agendada"""
+        Job.objects.filter(id=job.id).update(run_at=timezone.now() - timedelta(seconds=1))
+
+    def test_enqueue_and_run(self):
+        job = enqueue(record_call, {'value': 1})
+        self.assertEqual((job.task, job.status), (task_path(record_call), 'pending'))
+
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_until), ('done', 1, None))
+        self.assertEqual(CALLS, [1])
+
+    def test_enqueue_rejects_unknown_task(self):
+        with self.assertRaises(ImportError):
+            enqueue('core.tests.does_not_exist')
+        self.assertFalse(Job.objects.exists())
+
+    def test_a_job_is_claimed_once(self):
+        job = enqueue(record_call, {'value': 1})
+        enqueue(record_call, {'value': 2}, run_at=timezone.now() + timedelta(hours=1))
+
+        first = claim_jobs(limit=5, worker='a')
+        self.assertEqual([claimed.id for claimed in first], [job.id])
+        self.assertEqual((first[0].status, first[0].locked_by), ('running', 'a'))
+        self.assertEqual(claim_jobs(limit=5, worker='b'), [])
+
+    def test_failure_is_retried_with_backoff_then_fails(self):
+        self.assertEqual([retry_delay(attempts) for attempts in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(retry_delay(20), 3600)
+
+        job = enqueue(record_call, {'value': 1, 'fail': True}, max_attempts=3)
+        for attempt in (1, 2):
+            before = timezone.now()
+            with self.assertLogs('core.utils.jobs', 'ERROR'):
+                self.assertEqual(run_pending(), 0)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('pending', attempt))
+            self.assertEqual(job.last_error, 'falhou com 1')
+            self.assertGreaterEqual(job.run_at, before + timedelta(seconds=retry_delay(attempt)))
+            # Ainda não é hora da próxima tentativa
+            self.assertEqual(claim_jobs(), [])
+            self.make_ready(job)
+
+        with self.assertLogs('core.utils.jobs', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(CALLS, [1, 1, 1])
+
+    def test_expired_lock_is_reclaimed(self):
+        job = enqueue(record_call, {'value': 1})
+        claim_jobs(worker='morto')
+        self.assertEqual(claim_jobs(worker='outro'), [])
+
+        # O worker morreu: a reserva vence e outro worker retoma o job
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_jobs(worker='outro')
+        self.assertEqual((reclaimed[0].locked_by, reclaimed[0].attempts), ('outro', 2))
+
+        self.assertTrue(run_job(reclaimed[0]))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+
+    def test_expired_lock_on_last_attempt_fails_without_running(self):
+        job = enqueue(record_call, {'value': 1}, max_attempts=1)
+        claim_jobs(worker='morto')
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertFalse(run_job(claim_jobs(worker='outro')[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ('failed', 'Reserva vencida sem conclusão'))
+        self.assertEqual(CALLS, [])
+
+    @override_settings(CACHE_BACKEND='file')
+    def test_worker_refuses_local_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('run_worker', '--once')
@@ -0,0 +1,177 @@
+"""
+Camada de cache compartilhado entre os processos (CACHES em settings).
+
+- Chaves por salão: salon:<id>:v<versão do salão>.<versão do espaço>:<espaço>:...
+  Trocar a versão do salão descarta tudo o que é dele (disponibilidade,
+  análises, menus); trocar a versão de um espaço descarta só aquele espaço.
+- As versões ficam no cache sem prazo (timeout=None) e, se uma delas sumir
+  (cache reiniciado ou descarte por MAX_ENTRIES), é recriada a partir do
+  relógio, nunca de 1: um valor maior que qualquer versão anterior, então
+  chaves gravadas antes de uma invalidação não voltam a valer.
+- Contadores de acertos e falhas por espaço: somados em memória e enviados ao
+  cache compartilhado em lotes, para não dobrar o número de acessos.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+
+# Acessos acumulados no processo antes de enviar os contadores ao cache
+CACHE_STATS_FLUSH_EVERY = 100
+
+CACHE_STATS_NAMESPACES_KEY = 'cache_stats:namespaces'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def version_seed():
+    """Versão inicial de uma chave ausente: o relógio em microssegundos"""
+    return time.time_ns() // 1000
+
+
+def get_versions(keys):
+    """
+    Versões atuais das chaves (uma leitura do cache); as ausentes são criadas
+    a partir do relógio.
+
+    Returns:
+        dict: chave -> versão
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            seed = version_seed()
+            if not cache.add(key, seed, None):
+                # Outro processo criou a versão entre a leitura e o add
+                seed = cache.get(key, seed)
+            versions[key] = seed
+    return versions
+
+
+def get_version(key):
+    """Versão atual de uma chave (criada a partir do relógio se ausente)"""
+    return get_versions([key])[key]
+
+
+def bump_version(key):
+    """Incrementa um contador de versão; se ele não existir, cria a partir do relógio"""
+    if cache.add(key, version_seed(), None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # A chave sumiu entre o add e o incr
+        cache.set(key, version_seed(), None)
+
+
+def _salon_version_key(salon_id, namespace=None):
+    if namespace:
+        return f"salon:{salon_id}:{namespace}:version"
+    return f"salon:{salon_id}:version"
+
+
+def salon_key_prefix(salon_id, namespace):
+    """
+    Prefixo das chaves de um espaço do salão com as versões atuais
+    (uma leitura do cache para as duas versões).
+    """
+    tenant_key = _salon_version_key(salon_id)
+    namespace_key = _salon_version_key(salon_id, namespace)
+    versions = get_versions([tenant_key, namespace_key])
+    return f"salon:{salon_id}:v{versions[tenant_key]}.{versions[namespace_key]}:{namespace}"
+
+
+def salon_key(salon_id, namespace, *parts):
+    """Chave de um item do salão, ex.: salon_key(3, 'availability', '2025-01-31')"""
+    return ':'.join([salon_key_prefix(salon_id, namespace), *map(str, parts)])
+
+
+def invalidate_salon(salon_id, namespace=None):
+    """Descarta as chaves de um espaço do salão ou, sem espaço, todas as do salão"""
+    bump_version(_salon_version_key(salon_id, namespace))
+
+
+def record_cache_access(namespace, hits=0, misses=0):
+    """Soma acertos e falhas do espaço; envia ao cache compartilhado a cada lote"""
+    with _stats_lock:
+        _stats[(namespace, 'hits')] += hits
+        _stats[(namespace, 'misses')] += misses
+        pending = sum(_stats.values())
+    if pending >= CACHE_STATS_FLUSH_EVERY:
+        flush_cache_stats()
+
+
+def flush_cache_stats():
+    """Envia os contadores acumulados no processo para o cache compartilhado"""
+    with _stats_lock:
+        pending = {key: count for key, count in _stats.items() if count}
+        _stats.clear()
+    if not pending:
+        return
+
+    namespaces = set(cache.get(CACHE_STATS_NAMESPACES_KEY, []))
+    for (namespace, kind), count in pending.items():
+        key = f"cache_stats:{namespace}:{kind}"
+        if not cache.add(key, count, None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, None)
+        namespaces.add(namespace)
+    cache.set(CACHE_STATS_NAMESPACES_KEY, sorted(namespaces), None)
+
+
+def cache_stats():
+    """
+    Acertos e falhas por espaço somando todos os processos.
+
+    Returns:
+        dict: espaço -> {'hits', 'misses', 'hit_rate' (%)}
+    """
+    flush_cache_stats()
+    namespaces = cache.get(CACHE_STATS_NAMESPACES_KEY, [])
+    counters = cache.get_many([
+        f"cache_stats:{namespace}:{kind}" for namespace in namespaces for kind in ('hits', 'misses')
+    ])
+
+    stats = {}
+    for namespace in namespaces:
+        hits = counters.get(f"cache_stats:{namespace}:hits", 0)
+        misses = counters.get(f"cache_stats:{namespace}:misses", 0)
+        total = hits + misses
+        stats[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(100 * hits / total, 1) if total else 0,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    """Zera os contadores de todos os espaços"""
+    with _stats_lock:
+        _stats.clear()
+    namespaces = cache.get(CACHE_STATS_NAMESPACES_KEY, [])
+    cache.delete_many([
+        f"cache_stats:{namespace}:{kind}" for namespace in namespaces for kind in ('hits', 'misses')
+    ] + [CACHE_STATS_NAMESPACES_KEY])
+
+
+def cached_get(namespace, key):
+    """cache.get contando acerto/falha no espaço"""
+    value = cache.get(key)
+    if value is None:
+        record_cache_access(namespace, misses=1)
+    else:
+        record_cache_access(namespace, hits=1)
+    return value
+
+
+def cached_get_many(namespace, keys):
+    """cache.get_many contando acertos/falhas no espaço"""
+    found = cache.get_many(keys)
+    record_cache_access(namespace, hits=len(found), misses=len(keys) - len(found))
+    return found
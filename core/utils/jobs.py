@@ -0,0 +1,181 @@
+"""
+Fila de jobs no banco de dados.
+enqueue grava a tarefa (na transação de quem chama, então ela só existe se a
+mudança que a originou for gravada) e o worker (manage.py run_worker) a
+executa fora da requisição.
+
+- Tarefas são funções referenciadas pelo caminho (ex.: "payments.jobs.send_payment_confirmation")
+  e recebem o payload como argumentos nomeados; o payload precisa ser JSON.
+- Cada execução reserva o job por JOB_VISIBILITY_TIMEOUT_SECONDS: se o worker
+  morrer no meio, o job volta para a fila quando a reserva vence.
+- Falhas são repetidas com espera exponencial até max_attempts.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+JOB_MAX_ATTEMPTS = 5
+
+# Espera antes da nova tentativa: base * 2^(tentativas - 1), limitada ao teto
+JOB_RETRY_BASE_SECONDS = 30
+JOB_RETRY_MAX_SECONDS = 60 * 60
+
+
+def get_visibility_timeout():
+    """Tempo (segundos) que um job fica reservado para o worker que o pegou"""
+    return getattr(settings, 'JOB_VISIBILITY_TIMEOUT_SECONDS', 300)
+
+
+def task_path(task):
+    """Caminho da tarefa, aceitando a função ou o caminho em texto"""
+    if isinstance(task, str):
+        return task
+    return f"{task.__module__}.{task.__qualname__}"
+
+
+def enqueue(task, payload=None, run_at=None, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Enfileira uma tarefa.
+
+    Com JOB_QUEUE_EAGER=True (desenvolvimento sem worker) o job também é
+    executado no próprio processo logo após o commit.
+
+    Args:
+        task: Função ou caminho da função
+        payload: Argumentos nomeados (JSON)
+        run_at: Executar a partir de (padrão: agora)
+        max_attempts: Tentativas antes de marcar como falho
+
+    Returns:
+        Job
+    """
+    from core.models import Job
+
+    path = task_path(task)
+    # Falha já ao enfileirar se o caminho estiver errado
+    import_string(path)
+
+    job = Job.objects.create(
+        task=path,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts
+    )
+
+    if getattr(settings, 'JOB_QUEUE_EAGER', False):
+        transaction.on_commit(lambda: run_pending(job_ids=[job.id]), robust=True)
+
+    return job
+
+
+def worker_name():
+    """Identificação do worker gravada nos jobs reservados"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def claim_jobs(limit=1, worker=None, job_ids=None):
+    """
+    Reserva até `limit` jobs prontos: pendentes com run_at vencido ou em
+    execução com a reserva vencida (worker que morreu).
+
+    A reserva é um UPDATE condicional por job, então dois workers nunca pegam
+    o mesmo job, em qualquer banco.
+
+    Returns:
+        list: Jobs reservados (tentativa já contada)
+    """
+    from core.models import Job
+
+    now = timezone.now()
+    ready = Q(status='pending', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+    candidates = Job.objects.filter(ready)
+    if job_ids is not None:
+        candidates = candidates.filter(id__in=job_ids)
+
+    worker = worker or worker_name()
+    locked_until = now + timedelta(seconds=get_visibility_timeout())
+    claimed = []
+    for job_id, status, previous_lock in candidates.order_by('run_at', 'id').values_list(
+        'id', 'status', 'locked_until'
+    )[:limit * 2]:
+        won = Job.objects.filter(id=job_id, status=status, locked_until=previous_lock).update(
+            status='running',
+            locked_until=locked_until,
+            locked_by=worker,
+            attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+
+    return list(Job.objects.filter(id__in=claimed).order_by('run_at', 'id'))
+
+
+def retry_delay(attempts):
+    """Espera (segundos) antes da próxima tentativa"""
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+
+
+def run_job(job):
+    """
+    Executa um job já reservado e grava o resultado.
+
+    Returns:
+        bool: True se a tarefa terminou sem erro
+    """
+    from core.models import Job
+
+    if job.attempts > job.max_attempts:
+        # Reservado de novo depois de a reserva vencer na última tentativa
+        Job.objects.filter(id=job.id).update(
+            status='failed',
+            locked_until=None,
+            last_error=job.last_error or 'Reserva vencida sem conclusão',
+            finished_at=timezone.now()
+        )
+        return False
+
+    try:
+        import_string(job.task)(**job.payload)
+    except Exception as exc:
+        logger.exception('Falha no job %s (%s), tentativa %s de %s', job.id, job.task, job.attempts, job.max_attempts)
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            updates = {'status': 'failed', 'finished_at': now}
+        else:
+            updates = {'status': 'pending', 'run_at': now + timedelta(seconds=retry_delay(job.attempts))}
+        Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+            locked_until=None, last_error=str(exc), **updates
+        )
+        return False
+
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        status='done', locked_until=None, last_error='', finished_at=timezone.now()
+    )
+    return True
+
+
+def run_pending(limit=100, worker=None, job_ids=None):
+    """
+    Reserva e executa jobs prontos, um por vez, no processo atual.
+
+    Returns:
+        int: Quantidade de jobs executados com sucesso
+    """
+    done = 0
+    for job in claim_jobs(limit=limit, worker=worker, job_ids=job_ids):
+        if run_job(job):
+            done += 1
+    return done
@@ -0,0 +1,55 @@
+"""
+Tarefas de pagamentos executadas pela fila de jobs (core.utils.jobs).
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+
+logger = logging.getLogger(__name__)
+
+
+def enviar_email_confirmacao_pagamento(user_email, user_name, amount, plan_name, end_date, payment_id):
+    """
+    Envia email de confirmação de pagamento (executado pelo worker da fila de jobs).
+    Erros são registrados e repassados para a fila tentar de novo.
+    """
+    try:
+        # Obter URL do site de forma segura
+        site_url = settings.WEBHOOK_BASE_URL or 'https://agenda-django-0dr6.onrender.com'
+        
+        logger.info(f"📧 [BACKGROUND] Tentando enviar email para {user_email}...")
+        send_mail(
+            subject='✅ Pagamento Aprovado - Agende sua Beleza',
+            message=f'''
+Olá {user_name}!
+
+🎉 Seu pagamento foi aprovado com sucesso!
+
+📋 Detalhes da Assinatura:
+━━━━━━━━━━━━━━━━━━━━━━━━━
+💰 Valor Pago: R$ {amount}
+📦 Plano: {plan_name}
+📅 Válido até: {end_date}
+🆔 ID do Pagamento: {payment_id}
+
+✨ Agora você tem acesso completo a todos os recursos do sistema!
+
+Acesse: {site_url}
+
+Obrigado por escolher Agende sua Beleza! 💖
+
+Atenciosamente,
+Equipe Agende sua Beleza
+            ''',
+            from_email=settings.DEFAULT_FROM_EMAIL or 'noreply@salonbooking.com',
+            recipient_list=[user_email],
+            fail_silently=False,
+        )
+        logger.info(f"✅ [BACKGROUND] Email de confirmação ENVIADO com sucesso para {user_email}")
+    except Exception as e:
+        logger.error(f"❌ [BACKGROUND] ERRO ao enviar email: {e}", exc_info=True)
+        logger.error(f"❌ [BACKGROUND] Tipo do erro: {type(e).__name__}")
+        logger.error(f"❌ [BACKGROUND] Mensagem: {str(e)}")
+        raise
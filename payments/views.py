@@ -1,70 +1,30 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse, HttpResponse
-from django.core.mail import send_mail
+from django.http import Http404, JsonResponse, HttpResponse
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import mercadopago
 import json
 import logging
-import threading
 
+from .jobs import enviar_email_confirmacao_pagamento
 from .models import Payment
-from admin_panel.models import PlanPricing
+from admin_panel.utils.pricing import get_plan_for_payment
+from core.utils.jobs import enqueue
 from subscriptions.models import Subscription
 
 logger = logging.getLogger(__name__)
 
-def enviar_email_confirmacao_pagamento(user_email, user_name, amount, plan_name, end_date, payment_id):
-    """
-    Envia email de confirmação de pagamento em background (thread separada)
-    """
-    try:
-        # Obter URL do site de forma segura
-        site_url = settings.WEBHOOK_BASE_URL or 'https://agenda-django-0dr6.onrender.com'
-        
-        logger.info(f"📧 [BACKGROUND] Tentando enviar email para {user_email}...")
-        send_mail(
-            subject='✅ Pagamento Aprovado - Agende sua Beleza',
-            message=f'''
-Olá {user_name}!
-
-🎉 Seu pagamento foi aprovado com sucesso!
-
-📋 Detalhes da Assinatura:
-━━━━━━━━━━━━━━━━━━━━━━━━━
-💰 Valor Pago: R$ {amount}
-📦 Plano: {plan_name}
-📅 Válido até: {end_date}
-🆔 ID do Pagamento: {payment_id}
-
-✨ Agora você tem acesso completo a todos os recursos do sistema!
-
-Acesse: {site_url}
-
-Obrigado por escolher Agende sua Beleza! 💖
-
-Atenciosamente,
-Equipe Agende sua Beleza
-            ''',
-            from_email=settings.DEFAULT_FROM_EMAIL or 'noreply@salonbooking.com',
-            recipient_list=[user_email],
-            fail_silently=False,
-        )
-        logger.info(f"✅ [BACKGROUND] Email de confirmação ENVIADO com sucesso para {user_email}")
-    except Exception as e:
-        logger.error(f"❌ [BACKGROUND] ERRO ao enviar email: {e}", exc_info=True)
-        logger.error(f"❌ [BACKGROUND] Tipo do erro: {type(e).__name__}")
-        logger.error(f"❌ [BACKGROUND] Mensagem: {str(e)}")
-
 @login_required
 def gerar_pix(request, plan_id):
     """Gera pagamento PIX usando Mercado Pago"""
-    plan = get_object_or_404(PlanPricing, id=plan_id, is_active=True)
+    plan = get_plan_for_payment(plan_id)
+    if plan is None:
+        raise Http404('Plano não encontrado.')
     
     if not settings.MERCADOPAGO_ACCESS_TOKEN:
         messages.error(request, 'Configuração de pagamento não disponível. Contate o administrador.')
@@ -292,7 +252,9 @@ def aprovar_pagamento_manual(request, payment_id):
 @login_required
 def checkout(request, plan_id):
     """Cria uma preferência de pagamento no Mercado Pago"""
-    plan = get_object_or_404(PlanPricing, id=plan_id, is_active=True)
+    plan = get_plan_for_payment(plan_id)
+    if plan is None:
+        raise Http404('Plano não encontrado.')
     
     logger.info(f"🔵 INICIANDO CHECKOUT")
     logger.info(f"👤 Usuário: {request.user.email}")
@@ -564,21 +526,16 @@ def webhook(request):
                     
                     # A configuração de email agora é via SMTP do Gmail, não há necessidade de verificar SENDGRID_API_KEY
                     if settings.DEFAULT_FROM_EMAIL: # Verifica apenas se o email remetente está configurado
-                        # Criar thread para enviar email em background
-                        email_thread = threading.Thread(
-                            target=enviar_email_confirmacao_pagamento,
-                            args=(
-                                payment.user.email,
-                                payment.user.get_full_name() or payment.user.username,
-                                payment.amount,
-                                subscription.get_plan_type_display(),
-                                subscription.end_date.strftime('%d/%m/%Y às %H:%M'),
-                                payment_id
-                            ),
-                            daemon=True
-                        )
-                        email_thread.start()
-                        logger.info(f"✅ Thread de email iniciada em BACKGROUND (não vai bloquear a resposta do webhook)")
+                        # Enfileirar o envio: o worker envia e tenta de novo em caso de falha
+                        enqueue(enviar_email_confirmacao_pagamento, {
+                            'user_email': payment.user.email,
+                            'user_name': payment.user.get_full_name() or payment.user.username,
+                            'amount': str(payment.amount),
+                            'plan_name': subscription.get_plan_type_display(),
+                            'end_date': timezone.localtime(subscription.end_date).strftime('%d/%m/%Y às %H:%M'),
+                            'payment_id': str(payment_id),
+                        })
+                        logger.info(f"✅ Email enfileirado para envio em BACKGROUND (não vai bloquear a resposta do webhook)")
                     else:
                         logger.warning("⚠️ Configuração de email não disponível")
                     
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -116,6 +117,51 @@ else:
     }
 
 
+# Cache compartilhado: Redis quando REDIS_URL estiver definido (requer o pacote
+# redis); CACHE_BACKEND=db usa a tabela do banco (python manage.py createcachetable).
+# Sem eles, o cache fica em arquivos no disco local: serve aos workers do
+# gunicorn da mesma máquina, mas não a um worker da fila em outro serviço, cujas
+# invalidações não chegariam ao site (run_worker recusa iniciar nesse caso).
+# CACHE_BACKEND=locmem usa a memória de cada processo
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis' if REDIS_URL else 'file')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_BACKEND == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'django_cache'),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'salon_booking_cache')),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+CACHES['default']['KEY_PREFIX'] = os.environ.get('CACHE_KEY_PREFIX', 'salon_booking')
+
+# Backends vistos por todos os serviços (site e worker da fila)
+SHARED_CACHE_BACKENDS = ('redis', 'db')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -197,7 +243,10 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Authentication backends - usar email como username
+# UserContextBackend carrega o usuário da sessão com perfil e salão em uma consulta;
+# o ModelBackend continua na lista para as sessões abertas antes dele
 AUTHENTICATION_BACKENDS = [
+    'accounts.backends.UserContextBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
 
@@ -220,6 +269,40 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 CSRF_USE_SESSIONS = False
 
 
+# Validade (em segundos) da reserva temporária de um horário durante o agendamento
+SLOT_HOLD_TTL_SECONDS = int(os.environ.get('SLOT_HOLD_TTL_SECONDS', '300'))
+
+# Fração (0 a 1) das chamadas do módulo de agendamentos que registra tempo,
+# consultas, slots avaliados e acertos de cache no logger appointments.scheduling
+SCHEDULING_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('SCHEDULING_INSTRUMENTATION_SAMPLE_RATE', '0.01'))
+
+# Fila de jobs (python manage.py run_worker): tempo que um job fica reservado
+# para o worker antes de voltar para a fila
+JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get('JOB_VISIBILITY_TIMEOUT_SECONDS', '300'))
+
+# Executa os jobs no próprio processo logo após o commit; ligado por padrão com
+# DEBUG, para o desenvolvimento funcionar sem worker
+JOB_QUEUE_EAGER = os.environ.get('JOB_QUEUE_EAGER', str(DEBUG)) == 'True'
+
+# Idade máxima (em segundos) dos indicadores pré-calculados do painel do administrador
+PLATFORM_METRICS_MAX_AGE_SECONDS = int(os.environ.get('PLATFORM_METRICS_MAX_AGE_SECONDS', '300'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'appointments': {
+            'handlers': ['console'],
+            'level': os.environ.get('APPOINTMENTS_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # URL do site para uso em e-mails e outras referências
 SITE_URL = os.getenv("WEBHOOK_BASE_URL", "http://localhost:8000")
 
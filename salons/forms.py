@@ -32,6 +32,9 @@ class SalonForm(forms.ModelForm):
             'saturday_close': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
             'sunday_open': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
             'sunday_close': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
+            'slot_interval': forms.Select(attrs={'class': 'form-select'}),
+            'pack_slots_after_appointments': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'assignment_policy': forms.Select(attrs={'class': 'form-select'}),
             
             # Status de funcionamento
             'is_temporarily_closed': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
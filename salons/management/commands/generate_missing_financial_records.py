@@ -1,9 +1,6 @@
-
 from django.core.management.base import BaseCommand
-from django.db.models import Q
-from appointments.models import Appointment
-from salons.models import FinancialRecord
 from django.contrib.auth.models import User
+from salons.utils.ledger import LedgerWriter, commission_record, completed_appointments_without_records, service_income_record
 
 class Command(BaseCommand):
     help = 'Gera registros financeiros para agendamentos concluídos que ainda não possuem registro'
@@ -14,26 +11,16 @@ class Command(BaseCommand):
             type=int,
             help='ID específico do salão para processar (opcional)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Quantidade de registros gravados por lote (padrão: 500)',
+        )
 
     def handle(self, *args, **options):
         salon_id = options.get('salon_id')
         
-        # Filtrar agendamentos concluídos
-        completed_appointments = Appointment.objects.filter(status='completed')
-        
-        if salon_id:
-            completed_appointments = completed_appointments.filter(salon_id=salon_id)
-        
-        # Buscar agendamentos que não possuem registros financeiros
-        appointments_without_records = completed_appointments.exclude(
-            id__in=FinancialRecord.objects.filter(
-                related_appointment__isnull=False
-            ).values_list('related_appointment_id', flat=True)
-        ).select_related('salon', 'service', 'employee', 'client')
-        
-        count = 0
-        commission_count = 0
-        
         # Pegar o primeiro usuário admin como criador dos registros
         admin_user = User.objects.filter(is_superuser=True).first()
         if not admin_user:
@@ -45,43 +32,27 @@ class Command(BaseCommand):
             )
             return
         
-        for appointment in appointments_without_records:
-            current_month = appointment.appointment_date.month
-            current_year = appointment.appointment_date.year
-            
-            # Criar receita do serviço
-            FinancialRecord.objects.create(
-                salon=appointment.salon,
-                transaction_type='income',
-                category='service',
-                amount=appointment.service.price,
-                description=f'Serviço: {appointment.service.name} - Cliente: {appointment.client.get_full_name() or appointment.client.username}',
-                reference_month=current_month,
-                reference_year=current_year,
-                related_appointment=appointment,
-                created_by=admin_user
-            )
-            count += 1
-            
-            # Se o funcionário recebe por comissão, criar registro da comissão
-            if appointment.employee and appointment.employee.payment_type == 'percentage':
-                commission_amount = appointment.service.price * (appointment.employee.commission_percentage / 100)
-                FinancialRecord.objects.create(
-                    salon=appointment.salon,
-                    transaction_type='expense',
-                    category='employee_commission',
-                    amount=commission_amount,
-                    description=f'Comissão: {appointment.employee.user.get_full_name()} - {appointment.service.name}',
-                    reference_month=current_month,
-                    reference_year=current_year,
-                    related_employee=appointment.employee,
-                    related_appointment=appointment,
-                    created_by=admin_user
-                )
-                commission_count += 1
-        
+        count = 0
+        commission_count = 0
+
+        # Agendamentos concluídos sem registros, lidos em blocos e gravados em lote
+        with LedgerWriter(batch_size=options['batch_size']) as writer:
+            for appointment in completed_appointments_without_records(salon_id):
+                # Criar receita do serviço
+                writer.add(service_income_record(appointment, admin_user))
+                count += 1
+
+                # Se o funcionário recebe por comissão, criar registro da comissão
+                commission = commission_record(appointment, admin_user)
+                if commission is not None:
+                    writer.add(commission)
+                    commission_count += 1
+        
+        # Só o que o writer gravou de fato: lançamentos já existentes (gravados
+        # por outra execução ou pelo worker no meio do caminho) são descartados
         self.stdout.write(
             self.style.SUCCESS(
-                f'Processados {count} registros de receita e {commission_count} registros de comissão.'
+                f'Processados {count} agendamentos ({count} receitas e {commission_count} comissões): '
+                f'{writer.created} registros criados, {writer.skipped} já existentes.'
             )
         )
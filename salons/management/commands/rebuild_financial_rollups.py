@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from salons.models import Salon
+from salons.utils.finance import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os consolidados financeiros mensais a partir dos registros financeiros'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--salon-id',
+            type=int,
+            help='ID específico do salão para processar (opcional)',
+        )
+
+    def handle(self, *args, **options):
+        salon = None
+        if options.get('salon_id'):
+            salon = Salon.objects.filter(id=options['salon_id']).first()
+            if not salon:
+                self.stdout.write(self.style.ERROR(f'Salão {options["salon_id"]} não encontrado'))
+                return
+
+        count = rebuild_rollups(salon)
+        self.stdout.write(
+            self.style.SUCCESS(f'{count} linha(s) de consolidado recalculada(s)')
+        )
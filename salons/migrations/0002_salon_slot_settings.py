@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salons', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salon',
+            name='pack_slots_after_appointments',
+            field=models.BooleanField(default=True, help_text='Sugere também horários que começam quando um atendimento termina, evitando buracos na agenda', verbose_name='Oferecer horário logo após cada atendimento'),
+        ),
+        migrations.AddField(
+            model_name='salon',
+            name='slot_interval',
+            field=models.PositiveSmallIntegerField(choices=[(10, '10 minutos'), (15, '15 minutos'), (20, '20 minutos'), (30, '30 minutos'), (45, '45 minutos'), (60, '1 hora')], default=30, help_text='De quanto em quanto tempo os horários são oferecidos aos clientes', verbose_name='Intervalo entre horários'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salons', '0002_salon_slot_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salon',
+            name='assignment_policy',
+            field=models.CharField(choices=[('least_booked', 'Quem tem menos atendimentos no dia'), ('round_robin', 'Rodízio entre os funcionários'), ('earliest_free', 'Quem está livre há mais tempo')], default='least_booked', help_text='Como escolher o funcionário quando o cliente não indica preferência', max_length=20, verbose_name='Distribuição automática de atendimentos'),
+        ),
+    ]
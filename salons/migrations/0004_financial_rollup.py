@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_financial_rollups(apps, schema_editor):
+    """Carga inicial dos consolidados a partir dos registros existentes"""
+    FinancialRecord = apps.get_model('salons', 'FinancialRecord')
+    FinancialRollup = apps.get_model('salons', 'FinancialRollup')
+
+    totals = FinancialRecord.objects.values(
+        'salon_id', 'reference_year', 'reference_month', 'transaction_type', 'category'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+    FinancialRollup.objects.bulk_create([
+        FinancialRollup(
+            salon_id=row['salon_id'],
+            year=row['reference_year'],
+            month=row['reference_month'],
+            transaction_type=row['transaction_type'],
+            category=row['category'],
+            total=row['total'] or 0,
+            count=row['count']
+        )
+        for row in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salons', '0003_salon_assignment_policy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField(verbose_name='Ano')),
+                ('month', models.PositiveIntegerField(verbose_name='Mês (1-12)')),
+                ('transaction_type', models.CharField(choices=[('income', 'Receita'), ('expense', 'Despesa')], max_length=7, verbose_name='Tipo de Transação')),
+                ('category', models.CharField(max_length=20, verbose_name='Categoria')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+                ('count', models.IntegerField(default=0, verbose_name='Quantidade de registros')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('salon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='financial_rollups', to='salons.salon', verbose_name='Salão')),
+            ],
+            options={
+                'verbose_name': 'Consolidado Financeiro',
+                'verbose_name_plural': 'Consolidados Financeiros',
+                'ordering': ['-year', '-month', 'transaction_type', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('salon', 'year', 'month', 'transaction_type', 'category'), name='unique_financial_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_financial_rollups, migrations.RunPython.noop),
+    ]
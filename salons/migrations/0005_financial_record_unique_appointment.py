@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:23
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def remove_duplicate_appointment_records(apps, schema_editor):
+    """Mantém o primeiro lançamento de cada (agendamento, categoria) e recalcula os consolidados afetados"""
+    FinancialRecord = apps.get_model('salons', 'FinancialRecord')
+    FinancialRollup = apps.get_model('salons', 'FinancialRollup')
+
+    duplicated = FinancialRecord.objects.filter(related_appointment__isnull=False).values(
+        'related_appointment_id', 'category'
+    ).annotate(first_id=Min('id'), count=Count('id')).filter(count__gt=1).order_by()
+
+    buckets = set()
+    for row in duplicated:
+        extra = FinancialRecord.objects.filter(
+            related_appointment_id=row['related_appointment_id'], category=row['category']
+        ).exclude(id=row['first_id'])
+        buckets.update(extra.values_list('salon_id', 'reference_year', 'reference_month', 'transaction_type', 'category'))
+        extra.delete()
+
+    for salon_id, year, month, transaction_type, category in buckets:
+        totals = FinancialRecord.objects.filter(
+            salon_id=salon_id, reference_year=year, reference_month=month,
+            transaction_type=transaction_type, category=category
+        ).aggregate(total=Sum('amount'), count=Count('id'))
+        FinancialRollup.objects.filter(
+            salon_id=salon_id, year=year, month=month, transaction_type=transaction_type, category=category
+        ).update(total=totals['total'] or 0, count=totals['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_appointment_list_indexes'),
+        ('salons', '0004_financial_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_appointment_records, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='financialrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('related_appointment__isnull', False)), fields=('related_appointment', 'category'), name='unique_appointment_financial_record'),
+        ),
+    ]
@@ -1,7 +1,24 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
 
 class Salon(models.Model):
+    SLOT_INTERVAL_CHOICES = [
+        (10, '10 minutos'),
+        (15, '15 minutos'),
+        (20, '20 minutos'),
+        (30, '30 minutos'),
+        (45, '45 minutos'),
+        (60, '1 hora'),
+    ]
+
+    ASSIGNMENT_POLICY_CHOICES = [
+        ('least_booked', 'Quem tem menos atendimentos no dia'),
+        ('round_robin', 'Rodízio entre os funcionários'),
+        ('earliest_free', 'Quem está livre há mais tempo'),
+    ]
+
     name = models.CharField(max_length=100, verbose_name="Nome do Salão")
     description = models.TextField(blank=True, null=True, verbose_name="Descrição")
     photo = models.ImageField(upload_to='salon_photos/', blank=True, null=True, verbose_name="Foto do Salão")
@@ -21,6 +38,26 @@ class Salon(models.Model):
     sunday_open = models.TimeField(blank=True, null=True, verbose_name="Domingo - Abertura")
     sunday_close = models.TimeField(blank=True, null=True, verbose_name="Domingo - Fechamento")
 
+    # Geração de horários da agenda
+    slot_interval = models.PositiveSmallIntegerField(
+        choices=SLOT_INTERVAL_CHOICES,
+        default=30,
+        verbose_name="Intervalo entre horários",
+        help_text="De quanto em quanto tempo os horários são oferecidos aos clientes"
+    )
+    pack_slots_after_appointments = models.BooleanField(
+        default=True,
+        verbose_name="Oferecer horário logo após cada atendimento",
+        help_text="Sugere também horários que começam quando um atendimento termina, evitando buracos na agenda"
+    )
+    assignment_policy = models.CharField(
+        max_length=20,
+        choices=ASSIGNMENT_POLICY_CHOICES,
+        default='least_booked',
+        verbose_name="Distribuição automática de atendimentos",
+        help_text="Como escolher o funcionário quando o cliente não indica preferência"
+    )
+
     # Status de funcionamento
     is_temporarily_closed = models.BooleanField(default=False, verbose_name="Temporariamente Fechado")
     closed_until = models.DateTimeField(blank=True, null=True, verbose_name="Fechado até")
@@ -110,6 +147,13 @@ class Service(models.Model):
     def __str__(self):
         return f"{self.salon.name} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Guarda a duração carregada para saber se ela mudou ao salvar"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_duration = instance.__dict__.get('duration')
+        return instance
+
     class Meta:
         verbose_name = "Serviço"
         verbose_name_plural = "Serviços"
@@ -231,6 +275,70 @@ class FinancialRecord(models.Model):
         tipo = "Receita" if self.transaction_type == 'income' else "Despesa"
         return f"{self.salon.name} - {tipo}: R$ {self.amount:.2f} ({self.reference_month}/{self.reference_year})"
     
+    # Campos que definem o consolidado do registro (chave e valor)
+    ROLLUP_FIELDS = ('salon_id', 'reference_year', 'reference_month', 'transaction_type', 'category', 'amount')
+
+    # Campos que dizem se o registro é receita de um atendimento (análises)
+    REVENUE_FIELDS = ('salon_id', 'transaction_type', 'category', 'related_appointment_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Guarda a chave e o valor carregados para corrigir o consolidado se o
+        registro for alterado. Com only()/defer() sem esses campos nada é
+        guardado (ler um campo adiado aqui voltaria a chamar from_db).
+        """
+        instance = super().from_db(db, field_names, values)
+        if set(cls.ROLLUP_FIELDS) <= set(field_names):
+            instance._loaded_rollup = instance.loaded_rollup()
+        return instance
+
+    def rollup_key(self):
+        """Chave do consolidado mensal ao qual o registro pertence"""
+        return self.salon_id, self.reference_year, self.reference_month, self.transaction_type, self.category
+
+    def loaded_rollup(self):
+        """(chave do consolidado, valor) com os campos em memória, ou None se algum foi adiado"""
+        if not all(name in self.__dict__ for name in self.ROLLUP_FIELDS):
+            return None
+        return self.rollup_key(), self.amount
+
+    def loaded_revenue_day(self):
+        """
+        (salão, data do agendamento) se o registro é receita de um atendimento,
+        com os campos em memória.
+
+        Returns:
+            Tuple: ((salão, data) ou None, se os campos estavam carregados)
+        """
+        if not all(name in self.__dict__ for name in self.REVENUE_FIELDS):
+            return None, False
+        if self.related_appointment_id and self.transaction_type == 'income' and self.category == 'service':
+            try:
+                return (self.salon_id, self.related_appointment.appointment_date), True
+            except models.ObjectDoesNotExist:
+                # Agendamento apagado junto (exclusão em cascata do salão)
+                return None, True
+        return None, True
+
+    def stored_state(self):
+        """
+        Consolidado e dia de receita gravados no banco, em uma consulta.
+
+        Returns:
+            Tuple: ((chave, valor) ou None, (salão, data) ou None)
+        """
+        row = FinancialRecord.objects.filter(pk=self.pk).values_list(
+            *self.ROLLUP_FIELDS, 'related_appointment_id', 'related_appointment__appointment_date'
+        ).first()
+        if row is None:
+            return None, None
+        salon_id, year, month, transaction_type, category, amount, appointment_id, appointment_date = row
+        revenue_day = None
+        if appointment_id and transaction_type == 'income' and category == 'service':
+            revenue_day = salon_id, appointment_date
+        return ((salon_id, year, month, transaction_type, category), amount), revenue_day
+
     def get_category_display_friendly(self):
         """Retorna a descrição amigável da categoria"""
         if self.transaction_type == 'expense':
@@ -246,4 +354,100 @@ class FinancialRecord(models.Model):
         indexes = [
             models.Index(fields=['salon', 'reference_year', 'reference_month']),
             models.Index(fields=['transaction_type', 'category']),
-        ]
\ No newline at end of file
+        ]
+        constraints = [
+            # Um lançamento por (agendamento, categoria): receita e comissão não duplicam
+            models.UniqueConstraint(
+                fields=['related_appointment', 'category'],
+                condition=models.Q(related_appointment__isnull=False),
+                name='unique_appointment_financial_record'
+            ),
+        ]
+
+class FinancialRollup(models.Model):
+    """Totais mensais consolidados por tipo e categoria, mantidos junto com os registros financeiros"""
+    salon = models.ForeignKey(Salon, on_delete=models.CASCADE, related_name='financial_rollups', verbose_name="Salão")
+    year = models.PositiveIntegerField(verbose_name="Ano")
+    month = models.PositiveIntegerField(verbose_name="Mês (1-12)")
+    transaction_type = models.CharField(max_length=7, choices=FinancialRecord.TRANSACTION_TYPES, verbose_name="Tipo de Transação")
+    category = models.CharField(max_length=20, verbose_name="Categoria")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total")
+    count = models.IntegerField(default=0, verbose_name="Quantidade de registros")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.salon.name} - {self.transaction_type}/{self.category} ({self.month}/{self.year}): R$ {self.total:.2f}"
+
+    class Meta:
+        verbose_name = "Consolidado Financeiro"
+        verbose_name_plural = "Consolidados Financeiros"
+        ordering = ['-year', '-month', 'transaction_type', 'category']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['salon', 'year', 'month', 'transaction_type', 'category'],
+                name='unique_financial_rollup_bucket'
+            )
+        ]
+
+
+@receiver(pre_save, sender=FinancialRecord)
+@receiver(pre_delete, sender=FinancialRecord)
+def snapshot_financial_record(sender, instance, **kwargs):
+    """
+    Registro carregado sem os campos do consolidado (only/defer): lê do banco,
+    antes da alteração, o estado que os sinais seguintes vão descontar.
+    """
+    if instance._state.adding or getattr(instance, '_loaded_rollup', None) is not None:
+        return
+    instance._loaded_rollup, instance._loaded_revenue_day = instance.stored_state()
+
+
+def _revenue_days(*days):
+    """Agrupa (salão, data) por salão, ignorando os vazios"""
+    grouped = {}
+    for day in days:
+        if day:
+            grouped.setdefault(day[0], set()).add(day[1])
+    return grouped
+
+
+@receiver(post_save, sender=FinancialRecord)
+def update_financial_rollup_on_save(sender, instance, created, **kwargs):
+    """Soma o registro ao consolidado (e retira o valor antigo quando é uma alteração)"""
+    from .utils.analytics import invalidate_revenue_dates
+    from .utils.finance import apply_rollup_delta
+
+    # Estado novo sem ler campos adiados: da memória ou, se faltar algo, do banco
+    current = instance.loaded_rollup()
+    revenue_day, revenue_known = instance.loaded_revenue_day()
+    if current is None or not revenue_known:
+        current, revenue_day = instance.stored_state()
+
+    loaded = getattr(instance, '_loaded_rollup', None)
+    if loaded and not created:
+        old_key, old_amount = loaded
+        apply_rollup_delta(old_key, -old_amount, -1)
+
+    if current:
+        apply_rollup_delta(current[0], current[1], 1)
+    old_revenue_day = getattr(instance, '_loaded_revenue_day', None)
+    instance._loaded_rollup = current
+    instance._loaded_revenue_day = revenue_day
+    invalidate_revenue_dates(_revenue_days(revenue_day, old_revenue_day))
+
+
+@receiver(post_delete, sender=FinancialRecord)
+def update_financial_rollup_on_delete(sender, instance, **kwargs):
+    """Retira o registro apagado do consolidado"""
+    from .utils.analytics import invalidate_revenue_dates
+    from .utils.finance import apply_rollup_delta
+
+    loaded = getattr(instance, '_loaded_rollup', None)
+    if loaded:
+        key, amount = loaded
+        apply_rollup_delta(key, -amount, -1)
+
+    revenue_day = getattr(instance, '_loaded_revenue_day', None)
+    if revenue_day is None:
+        revenue_day, _ = instance.loaded_revenue_day()
+    invalidate_revenue_dates(_revenue_days(revenue_day))
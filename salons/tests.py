@@ -1,3 +1,275 @@
-from django.test import TestCase
+from datetime import date, time
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.contrib.messages import get_messages
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from appointments.models import Appointment
+from salons.models import Salon, Service, Employee, FinancialRecord, FinancialRollup
+from subscriptions.models import Subscription
+from salons.utils.exports import filter_appointments, filter_financial_records, int_param, safe_cell
+from salons.utils.ledger import LedgerWriter, commission_record, service_income_record
+from salons.utils.pagination import keyset_paginate, page_querystring
+
+
+def create_salon(username='dono'):
+    owner = User.objects.create_user(username, f'{username}@example.com', 'senha')
+    return Salon.objects.create(
+        name='Salão', address='Rua 1', city='São Paulo', state='SP', zip_code='01000-000',
+        phone='11999999999', email=f'{username}@salao.example.com', owner=owner
+    )
+
+
+def login_owner(test_case, salon):
+    """Loga o dono do salão com assinatura ativa (páginas com subscription_required)"""
+    owner = salon.owner
+    owner.profile.user_type = 'owner'
+    owner.profile.save()
+    Subscription.objects.create(user=owner)
+    test_case.client.force_login(owner)
+
+
+class FinancialRollupSignalTests(TestCase):
+    """Os consolidados mensais acompanham os registros, inclusive carregados com only()/defer()"""
+
+    def setUp(self):
+        self.salon = create_salon()
+        self.record = FinancialRecord.objects.create(
+            salon=self.salon, transaction_type='expense', category='rent', amount=Decimal('100.00'),
+            description='Aluguel', reference_month=1, reference_year=2025, created_by=self.salon.owner
+        )
+
+    def rollup(self, category='rent', month=1):
+        return FinancialRollup.objects.get(salon=self.salon, year=2025, month=month, category=category)
+
+    def test_deferred_fields_do_not_recurse(self):
+        record = FinancialRecord.objects.only('amount').get(pk=self.record.pk)
+        self.assertEqual(record.amount, Decimal('100.00'))
+        record = FinancialRecord.objects.defer('amount', 'category').get(pk=self.record.pk)
+        self.assertEqual(record.category, 'rent')
+
+    def test_saving_a_deferred_record_moves_the_rollup(self):
+        record = FinancialRecord.objects.only('id', 'reference_month').get(pk=self.record.pk)
+        record.reference_month = 2
+        record.save()
+
+        self.assertEqual((self.rollup().total, self.rollup().count), (Decimal('0.00'), 0))
+        self.assertEqual((self.rollup(month=2).total, self.rollup(month=2).count), (Decimal('100.00'), 1))
+
+    def test_deleting_a_deferred_record_updates_the_rollup(self):
+        FinancialRecord.objects.only('id').get(pk=self.record.pk).delete()
+        self.assertEqual((self.rollup().total, self.rollup().count), (Decimal('0.00'), 0))
+
+    def test_edit_replaces_the_old_amount(self):
+        record = FinancialRecord.objects.get(pk=self.record.pk)
+        record.amount = Decimal('150.00')
+        record.category = 'utilities'
+        record.save()
+
+        self.assertEqual(self.rollup().total, Decimal('0.00'))
+        self.assertEqual(self.rollup('utilities').total, Decimal('150.00'))
+
+
+class LedgerWriterTests(TestCase):
+    """Lançamentos de agendamento são gravados uma única vez por (agendamento, categoria)"""
+
+    def setUp(self):
+        self.salon = create_salon()
+        service = Service.objects.create(salon=self.salon, name='Corte', duration=30, price=Decimal('50.00'))
+        employee_user = User.objects.create_user('func', 'func@example.com', 'senha')
+        employee = Employee.objects.create(
+            user=employee_user, salon=self.salon, payment_type='percentage', commission_percentage=Decimal('10.00')
+        )
+        client = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        self.appointment = Appointment.objects.create(
+            client=client, salon=self.salon, service=service, employee=employee,
+            appointment_date=date(2025, 1, 10), appointment_time=time(10), status='completed'
+        )
+
+    def rollup(self, category):
+        rollup = FinancialRollup.objects.get(salon=self.salon, year=2025, month=1, category=category)
+        return rollup.total, rollup.count
+
+    def write(self):
+        with LedgerWriter() as writer:
+            writer.add(service_income_record(self.appointment, self.salon.owner))
+            writer.add(commission_record(self.appointment, self.salon.owner))
+        return writer
+
+    def test_writing_twice_creates_each_record_once(self):
+        first = self.write()
+        second = self.write()
+
+        self.assertEqual((first.created, first.skipped), (2, 0))
+        self.assertEqual((second.created, second.skipped), (0, 2))
+        self.assertEqual(FinancialRecord.objects.filter(related_appointment=self.appointment).count(), 2)
+        self.assertEqual(self.rollup('service'), (Decimal('50.00'), 1))
+        self.assertEqual(self.rollup('employee_commission'), (Decimal('5.00'), 1))
+
+    def test_duplicates_in_the_same_batch_are_dropped(self):
+        with LedgerWriter() as writer:
+            writer.add(service_income_record(self.appointment, self.salon.owner))
+            writer.add(service_income_record(self.appointment, self.salon.owner))
+
+        self.assertEqual((writer.created, writer.skipped), (1, 1))
+        self.assertEqual(self.rollup('service'), (Decimal('50.00'), 1))
+
+    def test_constraint_rejects_a_second_record(self):
+        self.write()
+
+        FinancialRecord.objects.bulk_create(
+            [service_income_record(self.appointment, self.salon.owner)], ignore_conflicts=True
+        )
+        self.assertEqual(FinancialRecord.objects.filter(related_appointment=self.appointment).count(), 2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            service_income_record(self.appointment, self.salon.owner).save()
+
+    def test_command_reports_records_actually_created(self):
+        self.salon.owner.is_superuser = True
+        self.salon.owner.save()
+
+        out = StringIO()
+        call_command('generate_missing_financial_records', stdout=out)
+        self.assertIn('2 registros criados, 0 já existentes', out.getvalue())
+        self.assertEqual(self.rollup('service'), (Decimal('50.00'), 1))
+
+
+class CompleteAppointmentViewTests(TestCase):
+    """Concluir de novo um agendamento já concluído avisa em vez de repetir o sucesso"""
+
+    def setUp(self):
+        self.salon = create_salon()
+        login_owner(self, self.salon)
+        service = Service.objects.create(salon=self.salon, name='Corte', duration=30, price=Decimal('50.00'))
+        client = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        self.appointment = Appointment.objects.create(
+            client=client, salon=self.salon, service=service,
+            appointment_date=date(2025, 1, 10), appointment_time=time(10), status='confirmed'
+        )
+        self.url = reverse('salons:manage_appointment_status', args=[self.appointment.pk])
+
+    def complete(self):
+        """Última mensagem exibida após concluir"""
+        response = self.client.post(self.url, {'action': 'complete'})
+        message = list(get_messages(response.wsgi_request))[-1]
+        return message.level_tag, message.message
+
+    def test_second_completion_shows_info_message(self):
+        self.assertEqual(self.complete()[0], 'success')
+        self.assertEqual(self.complete(), ('info', 'Este agendamento já estava concluído.'))
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'completed')
+
+
+class ExportTests(TestCase):
+    """Exportações escapam fórmulas e ignoram mês/ano inválidos"""
+
+    def setUp(self):
+        self.salon = create_salon()
+        login_owner(self, self.salon)
+        for month, description in ((1, '=HYPERLINK("http://example.com")'), (2, 'Aluguel')):
+            FinancialRecord.objects.create(
+                salon=self.salon, transaction_type='expense', category='rent', amount=Decimal('-10.00'),
+                description=description, reference_month=month, reference_year=2025, created_by=self.salon.owner
+            )
+        service = Service.objects.create(salon=self.salon, name='Corte', duration=30, price=Decimal('50.00'))
+        client = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        for month in (1, 2):
+            Appointment.objects.create(
+                client=client, salon=self.salon, service=service,
+                appointment_date=date(2025, month, 10), appointment_time=time(10), notes='@SUM(A1)'
+            )
+
+    def test_safe_cell(self):
+        for value in ('=1+1', '+1', '-1', '@SUM(A1)', '\tx', '\rx'):
+            self.assertEqual(safe_cell(value), "'" + value)
+        self.assertEqual(safe_cell('Aluguel'), 'Aluguel')
+        self.assertEqual(safe_cell(Decimal('-10.00')), Decimal('-10.00'))
+        self.assertEqual(safe_cell(None), None)
+
+    def test_int_param(self):
+        self.assertEqual(int_param('12', 1, 12), 12)
+        for value in ('13', '0', 'abc', '', None, '1.5'):
+            self.assertIsNone(int_param(value, 1, 12))
+
+    def test_filters_ignore_invalid_month_and_year(self):
+        records, filters = filter_financial_records(self.salon, {'month': '13', 'year': 'abc'})
+        self.assertEqual(records.count(), 2)
+        self.assertEqual((filters['month'], filters['year']), ('', ''))
+        self.assertEqual(filter_financial_records(self.salon, {'month': '2', 'year': '2025'})[0].count(), 1)
+
+        self.assertEqual(filter_appointments(self.salon, {'month': '99', 'year': '2025'})[0].count(), 2)
+        self.assertEqual(filter_appointments(self.salon, {'month': '1', 'year': '99999'})[0].count(), 2)
+        self.assertEqual(filter_appointments(self.salon, {'month': '1', 'year': '2025'})[0].count(), 1)
+
+    def export(self, name, params):
+        response = self.client.get(reverse(f'salons:{name}'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_exports_escape_formulas_and_accept_bad_params(self):
+        content = self.export('export_financial_records', {'month': 'x', 'year': '0'})
+        self.assertIn('"\'=HYPERLINK(""http://example.com"")"', content)
+        self.assertIn('-10.00', content)
+        self.assertNotIn("'-10.00", content)
+
+        content = self.export('export_appointments', {'month': '13', 'year': 'abc'})
+        self.assertEqual(content.count("'@SUM(A1)"), 2)
+
+
+class KeysetPaginationTests(TestCase):
+    """Avançar e voltar pelas páginas percorre todas as linhas, sem pular nem repetir"""
+
+    PAGE_SIZE = 3
+
+    def setUp(self):
+        salon = create_salon()
+        service = Service.objects.create(salon=salon, name='Corte', duration=30, price=Decimal('50.00'))
+        client = User.objects.create_user('cliente', 'cliente@example.com', 'senha')
+        # Datas e horários repetidos: o id desempata
+        for day, hour in ((1, 9), (1, 9), (1, 10), (2, 9), (2, 9), (2, 9), (3, 8), (3, 11)):
+            Appointment.objects.create(
+                client=client, salon=salon, service=service,
+                appointment_date=date(2025, 1, day), appointment_time=time(hour)
+            )
+        self.queryset = Appointment.objects.filter(salon=salon)
+
+    def expected(self, descending):
+        rows = self.queryset.order_by('appointment_date', 'appointment_time', 'id').values_list('id', flat=True)
+        return list(rows)[::-1] if descending else list(rows)
+
+    def paginate(self, descending, **cursor):
+        page = keyset_paginate(self.queryset, descending=descending, page_size=self.PAGE_SIZE, **cursor)
+        return page, [appointment.id for appointment in page]
+
+    def test_forward_then_back_covers_every_row_once(self):
+        for descending in (False, True):
+            with self.subTest(descending=descending):
+                page, ids = self.paginate(descending)
+                self.assertFalse(page.has_previous)
+                pages = [ids]
+                while page.has_next:
+                    page, ids = self.paginate(descending, after=page.next_cursor)
+                    pages.append(ids)
+                self.assertEqual(sum(pages, []), self.expected(descending))
+                self.assertEqual([len(ids) for ids in pages], [3, 3, 2])
+
+                back = [ids]
+                while page.has_previous:
+                    page, ids = self.paginate(descending, before=page.previous_cursor)
+                    back.append(ids)
+                self.assertEqual(back[::-1], pages)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page, ids = self.paginate(False, after='not-a-cursor')
+        self.assertEqual(ids, self.expected(False)[:self.PAGE_SIZE])
+        self.assertTrue(page.has_next)
+
+    def test_page_querystring_drops_cursors(self):
+        request = RequestFactory().get('/', {'status': 'pending', 'after': 'abc', 'before': 'def'})
+        self.assertEqual(page_querystring(request), 'status=pending')
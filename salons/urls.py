@@ -7,6 +7,7 @@ urlpatterns = [
     # Dashboard e gestão do salão
     path('create/', views.create_salon, name='create_salon'),
     path('dashboard/', views.owner_dashboard, name='owner_dashboard'),
+    path('dashboard/analytics/', views.salon_analytics_data, name='salon_analytics'),
     path('edit/', views.edit_salon, name='edit_salon'),
     path('status/', views.manage_salon_status, name='manage_salon_status'),
     path('toggle-status/', views.toggle_salon_status, name='toggle_salon_status'),
@@ -19,6 +20,7 @@ urlpatterns = [
     
     # Agendamentos
     path('appointments/', views.appointments_list, name='appointments_list'),
+    path('appointments/export/', views.export_appointments, name='export_appointments'),
     path('appointments/delete/<int:appointment_id>/', views.delete_appointment_cascade, name='delete_appointment_cascade'),
     
     # Funcionários - Gerenciamento pelo proprietário
@@ -42,6 +44,7 @@ urlpatterns = [
     path('finances/', views.financial_dashboard, name='financial_dashboard'),
     path('finances/add/', views.add_financial_record, name='add_financial_record'),
     path('finances/records/', views.financial_records_list, name='financial_records_list'),
+    path('finances/records/export/', views.export_financial_records, name='export_financial_records'),
     path('finances/generate-employee-expenses/', views.generate_employee_expenses, name='generate_employee_expenses'),
     
     # Loja de Produtos
@@ -0,0 +1 @@
+# Utils package for salons
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Séries temporais do salão para os gráficos (static/js/charts.js).
+Os agendamentos são agrupados no banco por período (Trunc*) e funcionário em
+uma consulta, e a receita vem dos lançamentos de receita de serviço
+(FinancialRecord), que guardam o valor cobrado, em outra. A utilização usa o
+início e o término gravados em cada agendamento. Cada período fica em cache
+separadamente: períodos já encerrados não mudam e ficam guardados por muito
+tempo, o período atual expira rápido, e alterações de agendamentos e
+lançamentos descartam os períodos afetados. Mudanças no catálogo de serviços
+não alteram o histórico.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from appointments.utils.availability import time_to_minutes
+from core.utils.cache import cached_get_many, invalidate_salon, salon_key_prefix
+
+
+BUCKETS = {
+    'daily': TruncDay,
+    'weekly': TruncWeek,
+    'monthly': TruncMonth,
+}
+
+# Período padrão quando a requisição não informa o início
+DEFAULT_SPAN = {
+    'daily': 30,
+    'weekly': 12,
+    'monthly': 12,
+}
+
+MAX_BUCKETS = 400
+
+# Períodos encerrados ficam em cache por 30 dias; o período em andamento, 5 minutos
+CLOSED_BUCKET_TIMEOUT = 60 * 60 * 24 * 30
+OPEN_BUCKET_TIMEOUT = 60 * 5
+
+# Status que ocupam a agenda do funcionário para o cálculo de utilização
+OCCUPYING_STATUSES = ('scheduled', 'confirmed', 'completed')
+
+
+def bucket_start(value, bucket):
+    """Início do período que contém a data"""
+    if bucket == 'weekly':
+        return value - timedelta(days=value.weekday())
+    if bucket == 'monthly':
+        return value.replace(day=1)
+    return value
+
+
+def next_bucket(value, bucket):
+    """Início do período seguinte"""
+    if bucket == 'weekly':
+        return value + timedelta(days=7)
+    if bucket == 'monthly':
+        return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def bucket_starts(date_from, date_to, bucket):
+    """Inícios dos períodos que cobrem o intervalo"""
+    starts = []
+    current = bucket_start(date_from, bucket)
+    while current <= date_to:
+        starts.append(current)
+        current = next_bucket(current, bucket)
+    return starts
+
+
+def default_range(bucket, today=None):
+    """Intervalo padrão (início, fim) para o tipo de período"""
+    today = today or timezone.localdate()
+    if bucket == 'monthly':
+        start = today.replace(day=1)
+        for _ in range(DEFAULT_SPAN[bucket] - 1):
+            start = (start - timedelta(days=1)).replace(day=1)
+        return start, today
+    if bucket == 'weekly':
+        return bucket_start(today, bucket) - timedelta(weeks=DEFAULT_SPAN[bucket] - 1), today
+    return today - timedelta(days=DEFAULT_SPAN[bucket] - 1), today
+
+
+def bucket_cache_key(prefix, bucket, start):
+    """Chave de um período a partir do prefixo do salão (salon_key_prefix)"""
+    return f"{prefix}:{bucket}:{start.isoformat()}"
+
+
+def invalidate_analytics_days(salon_id, *dates):
+    """Descarta os períodos (diário, semanal e mensal) que contêm as datas"""
+    prefix = salon_key_prefix(salon_id, 'analytics')
+    keys = {
+        bucket_cache_key(prefix, bucket, bucket_start(value, bucket))
+        for value in dates if value
+        for bucket in BUCKETS
+    }
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def invalidate_revenue_dates(days):
+    """Descarta (após o commit) os períodos das datas, dadas como {salon_id: datas}"""
+    def invalidate():
+        for salon_id, dates in days.items():
+            invalidate_analytics_days(salon_id, *dates)
+
+    if days:
+        transaction.on_commit(invalidate)
+
+
+def invalidate_revenue_days(records):
+    """Descarta (após o commit) os períodos dos lançamentos de receita de serviço"""
+    days = {}
+    for record in records:
+        if record.related_appointment_id and record.transaction_type == 'income' and record.category == 'service':
+            days.setdefault(record.salon_id, set()).add(record.related_appointment.appointment_date)
+    invalidate_revenue_dates(days)
+
+
+def invalidate_salon_analytics(salon_id):
+    """Descarta todos os períodos do salão trocando a versão das chaves"""
+    invalidate_salon(salon_id, 'analytics')
+
+
+def _empty_bucket():
+    return {'bookings': 0, 'cancellations': 0, 'completed': 0, 'revenue': Decimal('0.00'), 'busy_minutes': {}}
+
+
+def load_buckets(salon, bucket, date_from, date_to):
+    """
+    Totais por período direto do banco: uma consulta de agendamentos agrupada
+    por (período, funcionário) e uma da receita lançada por período.
+
+    Returns:
+        dict: início do período -> {bookings, cancellations, completed, revenue, busy_minutes}
+    """
+    from appointments.models import Appointment
+    from salons.models import FinancialRecord
+
+    truncate = BUCKETS[bucket]
+    rows = Appointment.objects.filter(
+        salon=salon,
+        appointment_date__range=(date_from, date_to)
+    ).annotate(
+        bucket=truncate('appointment_date')
+    ).values('bucket', 'employee_id').annotate(
+        bookings=Count('id'),
+        cancellations=Count('id', filter=Q(status='cancelled')),
+        completed=Count('id', filter=Q(status='completed')),
+        busy_time=Sum(
+            ExpressionWrapper(F('ends_at') - F('starts_at'), output_field=DurationField()),
+            filter=Q(status__in=OCCUPYING_STATUSES)
+        ),
+    ).order_by()
+
+    revenue_rows = FinancialRecord.objects.filter(
+        salon=salon,
+        transaction_type='income',
+        category='service',
+        related_appointment__appointment_date__range=(date_from, date_to)
+    ).annotate(
+        bucket=truncate('related_appointment__appointment_date')
+    ).values('bucket').annotate(revenue=Sum('amount')).order_by()
+
+    def as_date(value):
+        return value.date() if hasattr(value, 'date') else value
+
+    buckets = {}
+    for row in rows:
+        data = buckets.setdefault(as_date(row['bucket']), _empty_bucket())
+        data['bookings'] += row['bookings']
+        data['cancellations'] += row['cancellations']
+        data['completed'] += row['completed']
+        if row['employee_id'] and row['busy_time']:
+            data['busy_minutes'][row['employee_id']] = int(row['busy_time'].total_seconds() // 60)
+
+    for row in revenue_rows:
+        data = buckets.setdefault(as_date(row['bucket']), _empty_bucket())
+        data['revenue'] += row['revenue'] or Decimal('0.00')
+    return buckets
+
+
+def get_buckets(salon, bucket, starts, today=None):
+    """
+    Totais dos períodos pedidos: lê do cache o que existir e busca o restante
+    de uma vez, cobrindo o intervalo faltante.
+    """
+    today = today or timezone.localdate()
+    prefix = salon_key_prefix(salon.id, 'analytics')
+    keys = {start: bucket_cache_key(prefix, bucket, start) for start in starts}
+    cached = cached_get_many('analytics', list(keys.values()))
+    result = {start: cached[key] for start, key in keys.items() if key in cached}
+
+    missing = [start for start in starts if start not in result]
+    if missing:
+        loaded = load_buckets(salon, bucket, min(missing), next_bucket(max(missing), bucket) - timedelta(days=1))
+        closed, current = {}, {}
+        for start in missing:
+            data = loaded.get(start, _empty_bucket())
+            result[start] = data
+            # Encerrado: o período termina antes de hoje
+            target = closed if next_bucket(start, bucket) <= today else current
+            target[keys[start]] = data
+        if closed:
+            cache.set_many(closed, CLOSED_BUCKET_TIMEOUT)
+        if current:
+            cache.set_many(current, OPEN_BUCKET_TIMEOUT)
+
+    return result
+
+
+def open_minutes(salon, date_from, date_to):
+    """Minutos de funcionamento do salão entre as datas (inclusivas)"""
+    minutes_by_weekday = {}
+    for weekday in range(7):
+        open_time, close_time = salon.get_working_hours(weekday)
+        if open_time and close_time:
+            minutes_by_weekday[weekday] = max(time_to_minutes(close_time) - time_to_minutes(open_time), 0)
+
+    total = 0
+    current = date_from
+    while current <= date_to:
+        total += minutes_by_weekday.get(current.weekday(), 0)
+        current += timedelta(days=1)
+    return total
+
+
+def salon_analytics(salon, bucket='daily', date_from=None, date_to=None):
+    """
+    Séries por período de agendamentos, cancelamentos, concluídos, receita dos
+    atendimentos concluídos e utilização (%) de cada funcionário ativo.
+
+    Returns:
+        dict: pronto para JSON, com labels e séries alinhadas
+    """
+    from salons.models import Employee
+
+    if bucket not in BUCKETS:
+        raise ValueError(f'Período inválido: {bucket}')
+
+    today = timezone.localdate()
+    default_from, default_to = default_range(bucket, today)
+    date_from = date_from or default_from
+    date_to = date_to or default_to
+    if date_from > date_to:
+        raise ValueError('A data inicial deve ser anterior à final')
+
+    starts = bucket_starts(date_from, date_to, bucket)
+    if len(starts) > MAX_BUCKETS:
+        raise ValueError(f'Intervalo muito longo: no máximo {MAX_BUCKETS} períodos')
+
+    data = get_buckets(salon, bucket, starts, today)
+    employees = list(
+        Employee.objects.filter(salon=salon, is_active=True).select_related('user').order_by('user__first_name', 'id')
+    )
+
+    # Os totais cobrem o período inteiro, então a capacidade também
+    capacity = [open_minutes(salon, start, next_bucket(start, bucket) - timedelta(days=1)) for start in starts]
+
+    return {
+        'bucket': bucket,
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'labels': [start.isoformat() for start in starts],
+        'series': {
+            'bookings': [data[start]['bookings'] for start in starts],
+            'cancellations': [data[start]['cancellations'] for start in starts],
+            'completed': [data[start]['completed'] for start in starts],
+            'revenue': [str(data[start]['revenue']) for start in starts],
+        },
+        'utilization': [
+            {
+                'employee_id': employee.id,
+                'name': employee.user.get_full_name() or employee.user.username,
+                'data': [
+                    round(100 * data[start]['busy_minutes'].get(employee.id, 0) / minutes, 1) if minutes else 0
+                    for start, minutes in zip(starts, capacity)
+                ],
+            }
+            for employee in employees
+        ],
+        'generated_at': timezone.now().isoformat(),
+    }
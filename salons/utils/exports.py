@@ -0,0 +1,240 @@
+"""
+Exportação de registros financeiros e agendamentos.
+As linhas são lidas do banco em blocos (.iterator) e enviadas aos poucos em um
+StreamingHttpResponse, então o uso de memória não cresce com o período exportado.
+O XLSX usa o openpyxl (requirements.txt); sem ele, só o CSV fica disponível.
+Textos que começam com =, +, - ou @ recebem um apóstrofo na frente para não
+serem executados como fórmula pelo Excel/LibreOffice.
+"""
+import calendar
+import csv
+import tempfile
+from datetime import MAXYEAR, MINYEAR, date, datetime
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # dependência opcional
+    Workbook = None
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+FINANCIAL_RECORD_HEADER = [
+    'Ano', 'Mês', 'Tipo', 'Categoria', 'Descrição', 'Valor',
+    'Funcionário', 'Agendamento', 'Criado em',
+]
+
+# Inícios de texto que as planilhas interpretam como fórmula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+APPOINTMENT_HEADER = [
+    'Data', 'Horário', 'Status', 'Cliente', 'E-mail do cliente', 'Serviço',
+    'Preço', 'Funcionário', 'Observações', 'Criado em',
+]
+
+
+def int_param(value, minimum, maximum):
+    """Inteiro do parâmetro dentro do intervalo, ou None se vazio ou inválido"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if minimum <= number <= maximum else None
+
+
+def filter_financial_records(salon, params):
+    """
+    Registros financeiros do salão com os filtros da listagem
+    (month, year, type, category). Mês ou ano inválidos são ignorados.
+
+    Returns:
+        Tuple[QuerySet, dict]: (registros ordenados, filtros aplicados)
+    """
+    from salons.models import FinancialRecord
+
+    filters = {
+        'month': params.get('month'),
+        'year': params.get('year'),
+        'type': params.get('type'),
+        'category': params.get('category'),
+    }
+
+    month = int_param(filters['month'], 1, 12)
+    year = int_param(filters['year'], MINYEAR, MAXYEAR)
+    if month is None:
+        filters['month'] = ''
+    if year is None:
+        filters['year'] = ''
+
+    records = FinancialRecord.objects.filter(salon=salon)
+
+    if month:
+        records = records.filter(reference_month=month)
+    if year:
+        records = records.filter(reference_year=year)
+    if filters['type']:
+        records = records.filter(transaction_type=filters['type'])
+    if filters['category']:
+        records = records.filter(category=filters['category'])
+
+    return records.order_by('-reference_year', '-reference_month', '-created_at'), filters
+
+
+def filter_appointments(salon, params):
+    """
+    Agendamentos do salão com os filtros da listagem (status, date) e, para
+    exportação, também por mês/ano (month, year) da data do agendamento.
+    Mês ou ano inválidos são ignorados.
+
+    Returns:
+        Tuple[QuerySet, str, str]: (agendamentos, status_filter, date_filter)
+    """
+    from appointments.models import Appointment
+
+    status_filter = params.get('status', '')
+    date_filter = params.get('date', '')
+
+    appointments = Appointment.objects.filter(salon=salon)
+
+    if status_filter:
+        appointments = appointments.filter(status=status_filter)
+
+    if date_filter:
+        try:
+            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
+            appointments = appointments.filter(appointment_date=filter_date)
+        except ValueError:
+            pass
+
+    year = int_param(params.get('year'), MINYEAR, MAXYEAR)
+    if year:
+        month = int_param(params.get('month'), 1, 12)
+        if month:
+            appointments = appointments.filter(appointment_date__range=(
+                date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+            ))
+        else:
+            appointments = appointments.filter(appointment_date__range=(date(year, 1, 1), date(year, 12, 31)))
+
+    return appointments, status_filter, date_filter
+
+
+def financial_record_rows(records):
+    """Cabeçalho e linhas dos registros financeiros, lidos do banco em blocos"""
+    from salons.models import FinancialRecord
+
+    categories = dict(FinancialRecord.EXPENSE_CATEGORIES + FinancialRecord.INCOME_CATEGORIES)
+    types = dict(FinancialRecord.TRANSACTION_TYPES)
+
+    yield FINANCIAL_RECORD_HEADER
+    for row in records.values_list(
+        'reference_year', 'reference_month', 'transaction_type', 'category', 'description', 'amount',
+        'related_employee__user__first_name', 'related_employee__user__last_name',
+        'related_appointment_id', 'created_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        year, month, transaction_type, category, description, amount, first_name, last_name, appointment_id, created_at = row
+        yield [
+            year,
+            month,
+            types.get(transaction_type, transaction_type),
+            categories.get(category, category),
+            description,
+            amount,
+            f'{first_name or ""} {last_name or ""}'.strip(),
+            appointment_id or '',
+            _local(created_at),
+        ]
+
+
+def appointment_rows(appointments):
+    """Cabeçalho e linhas dos agendamentos, lidos do banco em blocos"""
+    from appointments.models import Appointment
+
+    statuses = dict(Appointment.STATUS_CHOICES)
+
+    yield APPOINTMENT_HEADER
+    for row in appointments.order_by('-appointment_date', '-appointment_time', '-id').values_list(
+        'appointment_date', 'appointment_time', 'status',
+        'client__first_name', 'client__last_name', 'client__username', 'client__email',
+        'service__name', 'service__price',
+        'employee__user__first_name', 'employee__user__last_name',
+        'notes', 'created_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        (appointment_date, appointment_time, status, client_first, client_last, client_username, client_email,
+         service_name, price, employee_first, employee_last, notes, created_at) = row
+        yield [
+            appointment_date,
+            appointment_time.strftime('%H:%M'),
+            statuses.get(status, status),
+            f'{client_first} {client_last}'.strip() or client_username,
+            client_email,
+            service_name,
+            price,
+            f'{employee_first or ""} {employee_last or ""}'.strip(),
+            notes or '',
+            _local(created_at),
+        ]
+
+
+def _local(value):
+    """Data/hora no fuso local, sem informação de fuso (Excel não aceita tz)"""
+    return timezone.localtime(value).replace(tzinfo=None, microsecond=0) if value else ''
+
+
+def safe_cell(value):
+    """Texto com apóstrofo na frente se a planilha fosse lê-lo como fórmula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """Buffer que devolve o que recebe, para o csv.writer gerar linhas sob demanda"""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(rows, filename):
+    """Envia as linhas como CSV aos poucos"""
+    writer = csv.writer(_Echo())
+
+    def stream():
+        # BOM para o Excel reconhecer UTF-8 (acentos)
+        yield '\ufeff'
+        for row in rows:
+            yield writer.writerow([safe_cell(value) for value in row])
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_available():
+    """Indica se o openpyxl está instalado"""
+    return Workbook is not None
+
+
+def xlsx_response(rows, filename):
+    """
+    Gera a planilha no modo write_only do openpyxl (linha a linha, direto para
+    um arquivo temporário) e envia o arquivo em partes.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in rows:
+        sheet.append([safe_cell(value) for value in row])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
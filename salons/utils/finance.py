@@ -0,0 +1,203 @@
+"""
+Consolidados financeiros do salão.
+Os painéis leem totais mensais pré-somados em FinancialRollup em vez de agregar
+todos os FinancialRecord a cada acesso; os consolidados são atualizados de forma
+incremental pelos sinais dos registros.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Min, Sum, Value, When
+
+
+# Categorias de despesa que representam custos com funcionários
+EMPLOYEE_EXPENSE_CATEGORIES = ('employee_salary', 'employee_commission')
+
+
+def apply_rollup_delta(key, amount, count):
+    """
+    Soma `amount` e `count` ao consolidado identificado por
+    (salon_id, ano, mês, tipo, categoria), criando a linha se necessário.
+    Usa UPDATE com F() para não perder atualizações concorrentes.
+    """
+    from salons.models import FinancialRollup
+
+    salon_id, year, month, transaction_type, category = key
+    amount = Decimal(str(amount))
+    bucket = FinancialRollup.objects.filter(
+        salon_id=salon_id,
+        year=year,
+        month=month,
+        transaction_type=transaction_type,
+        category=category
+    )
+
+    if bucket.update(total=F('total') + amount, count=F('count') + count):
+        return
+
+    # Sem linha para descontar: nada a fazer (ex.: salão sendo apagado em cascata)
+    if count <= 0:
+        return
+
+    try:
+        with transaction.atomic():
+            FinancialRollup.objects.create(
+                salon_id=salon_id,
+                year=year,
+                month=month,
+                transaction_type=transaction_type,
+                category=category,
+                total=amount,
+                count=count
+            )
+    except IntegrityError:
+        # Outra transação criou a linha no meio tempo
+        bucket.update(total=F('total') + amount, count=F('count') + count)
+
+
+def rebuild_rollups(salon=None):
+    """
+    Recalcula os consolidados a partir dos registros financeiros.
+    Usado na carga inicial e para reconciliar após gravações em lote.
+
+    Returns:
+        int: Quantidade de linhas de consolidado gravadas
+    """
+    from salons.models import FinancialRecord, FinancialRollup
+
+    records = FinancialRecord.objects.all()
+    rollups = FinancialRollup.objects.all()
+    if salon is not None:
+        records = records.filter(salon=salon)
+        rollups = rollups.filter(salon=salon)
+
+    totals = records.values(
+        'salon_id', 'reference_year', 'reference_month', 'transaction_type', 'category'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+    with transaction.atomic():
+        rollups.delete()
+        created = FinancialRollup.objects.bulk_create([
+            FinancialRollup(
+                salon_id=row['salon_id'],
+                year=row['reference_year'],
+                month=row['reference_month'],
+                transaction_type=row['transaction_type'],
+                category=row['category'],
+                total=row['total'] or 0,
+                count=row['count']
+            )
+            for row in totals
+        ], batch_size=500)
+
+    return len(created)
+
+
+def monthly_summary(salon, year, month):
+    """
+    Resumo financeiro de um mês a partir dos consolidados (uma consulta).
+
+    Returns:
+        dict: income, employee_expenses, other_expenses e expense_categories
+              (lista de {"category", "total"} em ordem decrescente de total)
+    """
+    from salons.models import FinancialRollup
+
+    income = Decimal('0.00')
+    employee_expenses = Decimal('0.00')
+    other_expenses = Decimal('0.00')
+    expense_categories = []
+
+    for row in FinancialRollup.objects.filter(salon=salon, year=year, month=month, count__gt=0):
+        if row.transaction_type == 'income':
+            income += row.total
+        elif row.category in EMPLOYEE_EXPENSE_CATEGORIES:
+            employee_expenses += row.total
+            expense_categories.append({'category': row.category, 'total': row.total})
+        else:
+            other_expenses += row.total
+            expense_categories.append({'category': row.category, 'total': row.total})
+
+    expense_categories.sort(key=lambda item: item['total'], reverse=True)
+
+    return {
+        'income': income,
+        'employee_expenses': employee_expenses,
+        'other_expenses': other_expenses,
+        'expense_categories': expense_categories,
+    }
+
+
+def estimated_fixed_employee_costs(salon):
+    """
+    Custo mensal estimado dos funcionários com salário fixo, somado no banco com
+    as mesmas regras de Employee.calculate_monthly_cost.
+    """
+    amount_field = DecimalField(max_digits=14, decimal_places=2)
+    total = salon.employees.filter(is_active=True).exclude(payment_type='percentage').aggregate(
+        total=Sum(Case(
+            When(payment_type='monthly', then=F('salary_amount')),
+            When(payment_type='weekly', then=F('salary_amount') * 4),
+            When(payment_type='daily', then=F('salary_amount') * 22),
+            default=Value(0),
+            output_field=amount_field
+        ))
+    )['total']
+    return Decimal(str(total or 0)).quantize(Decimal('0.01'))
+
+
+def commission_earnings(salon=None, employee=None, date_from=None, date_to=None):
+    """
+    Ganhos por comissão dos funcionários pagos por porcentagem, agrupados por
+    (funcionário, serviço) no banco em uma consulta. Pode ser filtrado por salão,
+    por funcionário e por período (datas inclusivas).
+
+    Returns:
+        list: um dict por grupo com employee_id, service, count, price, revenue,
+              commission_rate, earning_per_service e total_earned, na ordem do
+              primeiro atendimento de cada grupo
+    """
+    from appointments.models import Appointment
+    from salons.models import Service
+
+    appointments = Appointment.objects.filter(
+        status='completed',
+        employee__payment_type='percentage'
+    )
+    if salon is not None:
+        appointments = appointments.filter(salon=salon)
+    if employee is not None:
+        appointments = appointments.filter(employee=employee)
+    if date_from is not None:
+        appointments = appointments.filter(appointment_date__gte=date_from)
+    if date_to is not None:
+        appointments = appointments.filter(appointment_date__lte=date_to)
+
+    rows = list(
+        appointments.values(
+            'employee_id', 'employee__commission_percentage', 'service_id', 'service__price'
+        ).annotate(
+            count=Count('id'),
+            revenue=Sum('service__price'),
+            first_start=Min('starts_at')
+        ).order_by('first_start', 'employee_id', 'service_id')
+    )
+    services = Service.objects.in_bulk({row['service_id'] for row in rows})
+
+    earnings = []
+    for row in rows:
+        price = row['service__price']
+        commission_rate = row['employee__commission_percentage']
+        # Mesma conta de antes por atendimento, feita uma vez por grupo
+        earning = price * (commission_rate / 100)
+        earnings.append({
+            'employee_id': row['employee_id'],
+            'service': services[row['service_id']],
+            'count': row['count'],
+            'price': price,
+            'revenue': row['revenue'],
+            'commission_rate': commission_rate,
+            'earning_per_service': earning,
+            'total_earned': earning * row['count'],
+        })
+    return earnings
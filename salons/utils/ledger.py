@@ -0,0 +1,187 @@
+"""
+Gravação em lote de registros financeiros.
+O LedgerWriter acumula FinancialRecord e grava com bulk_create em lotes,
+ignorando lançamentos já existentes para o mesmo (agendamento, categoria); a
+restrição unique_appointment_financial_record garante isso no banco.
+Como bulk_create não dispara sinais, os consolidados mensais são ajustados
+por lote.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .analytics import invalidate_revenue_days
+from .finance import apply_rollup_delta
+
+
+LEDGER_BATCH_SIZE = 500
+
+
+def service_income_record(appointment, created_by):
+    """Receita de um atendimento concluído (não salva)"""
+    from salons.models import FinancialRecord
+
+    return FinancialRecord(
+        salon_id=appointment.salon_id,
+        transaction_type='income',
+        category='service',
+        amount=appointment.service.price,
+        description=f'Serviço: {appointment.service.name} - Cliente: {appointment.client.get_full_name() or appointment.client.username}',
+        reference_month=appointment.appointment_date.month,
+        reference_year=appointment.appointment_date.year,
+        related_appointment=appointment,
+        created_by=created_by
+    )
+
+
+def commission_record(appointment, created_by):
+    """
+    Comissão do funcionário por um atendimento concluído (não salva).
+    Retorna None se o funcionário não recebe por porcentagem.
+    """
+    from salons.models import FinancialRecord
+
+    employee = appointment.employee
+    if not employee or employee.payment_type != 'percentage':
+        return None
+
+    return FinancialRecord(
+        salon_id=appointment.salon_id,
+        transaction_type='expense',
+        category='employee_commission',
+        amount=appointment.service.price * (employee.commission_percentage / 100),
+        description=f'Comissão: {employee.user.get_full_name()} - {appointment.service.name}',
+        reference_month=appointment.appointment_date.month,
+        reference_year=appointment.appointment_date.year,
+        related_employee=employee,
+        related_appointment=appointment,
+        created_by=created_by
+    )
+
+
+def completed_appointments_without_records(salon_id=None, chunk_size=2000):
+    """
+    Itera, sem carregar tudo em memória, os agendamentos concluídos que ainda
+    não têm nenhum registro financeiro.
+    """
+    from appointments.models import Appointment
+    from salons.models import FinancialRecord
+
+    appointments = Appointment.objects.filter(status='completed')
+    if salon_id:
+        appointments = appointments.filter(salon_id=salon_id)
+
+    return appointments.filter(
+        ~Exists(FinancialRecord.objects.filter(related_appointment=OuterRef('pk')))
+    ).select_related('service', 'employee__user', 'client').order_by('pk').iterator(chunk_size=chunk_size)
+
+
+class LedgerWriter:
+    """
+    Acumula registros financeiros e grava em lotes.
+
+    Registros com agendamento relacionado são idempotentes por
+    (agendamento, categoria): se já existir um lançamento igual no banco ou no
+    mesmo lote, o novo é descartado. Use como context manager para gravar o
+    lote final ao sair.
+    """
+
+    def __init__(self, batch_size=LEDGER_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.pending = []
+        self.created = 0
+        self.skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    @staticmethod
+    def idempotency_key(record):
+        """Chave (agendamento, categoria), ou None para lançamentos avulsos"""
+        if record.related_appointment_id is None:
+            return None
+        return record.related_appointment_id, record.category
+
+    def add(self, record):
+        """Enfileira um registro (None é ignorado) e grava o lote quando encher"""
+        if record is None:
+            return
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Grava os registros pendentes e ajusta os consolidados. Retorna quantos foram criados"""
+        from appointments.models import Appointment
+        from salons.models import FinancialRecord
+
+        if not self.pending:
+            return 0
+
+        pending, self.pending = self.pending, []
+        appointment_ids = {record.related_appointment_id for record in pending if record.related_appointment_id}
+
+        with transaction.atomic():
+            seen = set()
+            if appointment_ids:
+                # Trava os agendamentos do lote: outro writer com os mesmos
+                # agendamentos espera este terminar antes de ler o que já existe
+                list(
+                    Appointment.objects.select_for_update().filter(id__in=appointment_ids)
+                    .order_by('id').values_list('id', flat=True)
+                )
+                seen.update(
+                    FinancialRecord.objects.filter(related_appointment_id__in=appointment_ids)
+                    .values_list('related_appointment_id', 'category')
+                )
+
+            records = []
+            for record in pending:
+                key = self.idempotency_key(record)
+                if key is not None:
+                    if key in seen:
+                        self.skipped += 1
+                        continue
+                    seen.add(key)
+                records.append(record)
+
+            # A restrição descarta o que outra gravação tenha inserido mesmo assim
+            FinancialRecord.objects.bulk_create(records, batch_size=self.batch_size, ignore_conflicts=True)
+            inserted = self.confirm_inserted(records, appointment_ids)
+            self.skipped += len(records) - len(inserted)
+
+            # bulk_create não dispara os sinais: somar ao consolidado por chave,
+            # só o que foi de fato inserido
+            deltas = {}
+            for record in inserted:
+                amount, count = deltas.get(record.rollup_key(), (0, 0))
+                deltas[record.rollup_key()] = amount + record.amount, count + 1
+            for key, (amount, count) in deltas.items():
+                apply_rollup_delta(key, amount, count)
+            invalidate_revenue_days(inserted)
+
+        self.created += len(inserted)
+        return len(inserted)
+
+    def confirm_inserted(self, records, appointment_ids):
+        """
+        Registros do lote que foram gravados: os avulsos sempre entram; os com
+        agendamento só se o (agendamento, categoria) existe no banco agora. Com
+        os agendamentos travados, nenhuma outra gravação pode tê-lo criado.
+        """
+        from salons.models import FinancialRecord
+
+        if not appointment_ids:
+            return records
+
+        existing = set(
+            FinancialRecord.objects.filter(related_appointment_id__in=appointment_ids)
+            .values_list('related_appointment_id', 'category')
+        )
+        return [
+            record for record in records
+            if self.idempotency_key(record) is None or self.idempotency_key(record) in existing
+        ]
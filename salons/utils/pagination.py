@@ -0,0 +1,133 @@
+"""
+Paginação por cursor (keyset) das listas de agendamentos.
+Em vez de OFFSET, cada página continua a partir da chave
+(appointment_date, appointment_time, id) da última linha exibida, então o custo
+de uma página não cresce com o histórico do salão.
+"""
+import base64
+from datetime import date, time
+
+from django.db.models import Q
+
+
+APPOINTMENTS_PAGE_SIZE = 25
+
+KEYSET_FIELDS = ('appointment_date', 'appointment_time', 'id')
+
+
+class KeysetPage:
+    """Uma página de resultados e os cursores para as páginas vizinhas"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def encode_cursor(appointment):
+    """Codifica a chave de ordenação de um agendamento em um cursor para a URL"""
+    raw = f'{appointment.appointment_date.isoformat()}|{appointment.appointment_time.isoformat()}|{appointment.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodifica um cursor; retorna None se for inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        appointment_date, appointment_time, appointment_id = raw.split('|')
+        return date.fromisoformat(appointment_date), time.fromisoformat(appointment_time), int(appointment_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _after(key, descending):
+    """Filtro das linhas que vêm depois da chave na ordem pedida"""
+    appointment_date, appointment_time, appointment_id = key
+    op = 'lt' if descending else 'gt'
+    return (
+        Q(**{f'appointment_date__{op}': appointment_date})
+        | Q(appointment_date=appointment_date, **{f'appointment_time__{op}': appointment_time})
+        | Q(appointment_date=appointment_date, appointment_time=appointment_time, **{f'id__{op}': appointment_id})
+    )
+
+
+def keyset_paginate(queryset, after=None, before=None, descending=False, page_size=APPOINTMENTS_PAGE_SIZE):
+    """
+    Retorna uma página de agendamentos ordenada por (data, horário, id).
+
+    Args:
+        queryset: Agendamentos já filtrados (a ordenação existente é substituída)
+        after: Cursor da última linha da página anterior (avançar)
+        before: Cursor da primeira linha da página seguinte (voltar)
+        descending: Mais recentes primeiro
+        page_size: Linhas por página
+
+    Returns:
+        KeysetPage
+    """
+    prefix = '-' if descending else ''
+    ordering = [f'{prefix}{name}' for name in KEYSET_FIELDS]
+    reverse_ordering = [f'{"" if descending else "-"}{name}' for name in KEYSET_FIELDS]
+
+    before_key = decode_cursor(before) if before else None
+    after_key = decode_cursor(after) if after else None
+
+    if before_key:
+        # Voltando: busca na ordem inversa e desinverte
+        rows = list(queryset.filter(_after(before_key, not descending)).order_by(*reverse_ordering)[:page_size + 1])
+        if rows:
+            has_more = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            return KeysetPage(
+                object_list=rows,
+                next_cursor=encode_cursor(rows[-1]),
+                previous_cursor=encode_cursor(rows[0]) if has_more else None
+            )
+    elif after_key:
+        rows = list(queryset.filter(_after(after_key, descending)).order_by(*ordering)[:page_size + 1])
+        if rows:
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            return KeysetPage(
+                object_list=rows,
+                next_cursor=encode_cursor(rows[-1]) if has_more else None,
+                previous_cursor=encode_cursor(rows[0])
+            )
+
+    # Primeira página (também quando o cursor não aponta para mais nada)
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return KeysetPage(
+        object_list=rows,
+        next_cursor=encode_cursor(rows[-1]) if has_more else None
+    )
+
+
+def page_querystring(request):
+    """Parâmetros da listagem atual sem os cursores, para montar os links de página"""
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    return params.urlencode()
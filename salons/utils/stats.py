@@ -0,0 +1,108 @@
+"""
+Estatísticas dos painéis.
+Cada função responde com uma única consulta de agregação condicional
+(Count com filter=Q) em vez de um .count() por indicador.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def appointment_stats(appointments, today=None):
+    """
+    Indicadores de agendamentos sobre um queryset já filtrado (salão, funcionário...).
+
+    Returns:
+        dict: appointments_today, appointments_week, pending_appointments e total_appointments
+    """
+    today = today or timezone.now().date()
+    week_start = today - timedelta(days=today.weekday())
+
+    return appointments.order_by().aggregate(
+        appointments_today=Count('id', filter=Q(appointment_date=today)),
+        appointments_week=Count('id', filter=Q(appointment_date__gte=week_start, appointment_date__lte=today)),
+        pending_appointments=Count('id', filter=Q(status='scheduled')),
+        total_appointments=Count('id'),
+    )
+
+
+def salon_catalog_stats(salon):
+    """
+    Serviços e funcionários ativos do salão em uma consulta.
+
+    Returns:
+        dict: total_services e total_employees
+    """
+    from salons.models import Salon
+
+    return Salon.objects.filter(pk=salon.pk).aggregate(
+        total_services=Count('services', filter=Q(services__is_active=True), distinct=True),
+        total_employees=Count('employees', filter=Q(employees__is_active=True), distinct=True),
+    )
+
+
+def employee_occupancy(salon, date=None):
+    """
+    Ocupação de cada funcionário ativo no dia, a partir das máscaras de
+    DayAvailability (a ocupação do dia vem do cache de disponibilidade).
+
+    Returns:
+        list: [{'employee', 'busy_minutes', 'open_minutes', 'percent'}] por funcionário
+    """
+    from appointments.utils.availability import DayAvailability
+
+    date = date or timezone.localdate()
+    employees = list(salon.employees.filter(is_active=True).select_related('user').order_by('user__first_name', 'id'))
+    if not employees:
+        return []
+
+    occupancy = DayAvailability.load(salon, date).occupancy([employee.id for employee in employees])
+    return [
+        {
+            'employee': employee,
+            'busy_minutes': occupancy[employee.id]['busy_minutes'],
+            'open_minutes': occupancy[employee.id]['open_minutes'],
+            'percent': round(100 * occupancy[employee.id]['rate']),
+        }
+        for employee in employees
+    ]
+
+
+def subscription_stats(now=None):
+    """
+    Indicadores de assinaturas da plataforma em uma consulta.
+
+    Returns:
+        dict: active (vigentes), expired (vencidas ou expiradas), expiring_soon (3 dias),
+              trial_count, vip_count, active_count, expired_count e cancelled_count
+    """
+    from subscriptions.models import Subscription
+
+    now = now or timezone.now()
+
+    return Subscription.objects.aggregate(
+        active=Count('id', filter=Q(status='active', end_date__gt=now)),
+        expired=Count('id', filter=Q(status='expired') | Q(end_date__lte=now)),
+        expiring_soon=Count('id', filter=Q(status='active', end_date__gt=now, end_date__lte=now + timedelta(days=3))),
+        trial_count=Count('id', filter=Q(plan_type='trial_10')),
+        vip_count=Count('id', filter=Q(plan_type='vip_30')),
+        active_count=Count('id', filter=Q(status='active')),
+        expired_count=Count('id', filter=Q(status='expired')),
+        cancelled_count=Count('id', filter=Q(status='cancelled')),
+    )
+
+
+def user_type_stats():
+    """
+    Quantidade de proprietários e clientes em uma consulta.
+
+    Returns:
+        dict: total_owners e total_clients
+    """
+    from accounts.models import UserProfile
+
+    return UserProfile.objects.aggregate(
+        total_owners=Count('id', filter=Q(user_type='owner')),
+        total_clients=Count('id', filter=Q(user_type='client')),
+    )
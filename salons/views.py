@@ -5,16 +5,34 @@ from django.contrib.auth.models import User
 from django.contrib.auth import login
 from django.db import transaction
 from django.views.decorators.http import require_POST
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
+import calendar
 import uuid
+from decimal import Decimal
 from django.db.models import Count, Q, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.urls import reverse
+from subscriptions.utils.access import subscription_access
 from subscriptions.views import subscription_required
 from .models import Salon, Service, Employee, FinancialRecord
 from .forms import SalonForm, ServiceForm, EmployeeForm, EmployeeEditForm, SalonStatusForm
+from .utils.analytics import salon_analytics
+from .utils.exports import (
+    appointment_rows,
+    csv_response,
+    filter_appointments,
+    filter_financial_records,
+    financial_record_rows,
+    xlsx_available,
+    xlsx_response,
+)
+from .utils.finance import commission_earnings, estimated_fixed_employee_costs, monthly_summary
+from .utils.ledger import LedgerWriter
+from .utils.pagination import keyset_paginate, page_querystring
+from .utils.stats import appointment_stats, employee_occupancy, salon_catalog_stats
 from appointments.models import Appointment, LinkAgendamento, CancellationFee
+from appointments.utils.completion import complete_appointment
 from admin_panel.models import Product
 
 @login_required
@@ -29,8 +47,7 @@ def create_salon(request):
         return redirect('salons:owner_dashboard')
 
     # Verificar se tem assinatura ativa
-    subscription = getattr(request.user, 'subscription', None)
-    if not subscription or not subscription.is_active():
+    if not subscription_access(request)['active']:
         messages.warning(request, 'Você precisa de uma assinatura ativa para criar um salão.')
         return redirect('subscriptions:detail')
 
@@ -52,28 +69,17 @@ def owner_dashboard(request):
     """Dashboard do proprietário"""
     salon = request.user.salon
 
-    # Estatísticas
+    # Estatísticas (uma consulta de agendamentos e uma de serviços/funcionários)
     today = timezone.now().date()
-    week_start = today - timedelta(days=today.weekday())
 
     stats = {
-        'appointments_today': Appointment.objects.filter(
-            salon=salon, 
-            appointment_date=today
-        ).count(),
-        'appointments_week': Appointment.objects.filter(
-            salon=salon,
-            appointment_date__gte=week_start,
-            appointment_date__lte=today
-        ).count(),
-        'pending_appointments': Appointment.objects.filter(
-            salon=salon,
-            status='scheduled'
-        ).count(),
-        'total_services': salon.services.filter(is_active=True).count(),
-        'total_employees': salon.employees.filter(is_active=True).count(),
+        **appointment_stats(Appointment.objects.filter(salon=salon), today),
+        **salon_catalog_stats(salon),
     }
 
+    # Ocupação de hoje por profissional
+    today_occupancy = employee_occupancy(salon, timezone.localdate())
+
     # Próximos agendamentos
     upcoming_appointments = Appointment.objects.filter(
         salon=salon,
@@ -88,42 +94,18 @@ def owner_dashboard(request):
     current_month = timezone.now().month
     current_year = timezone.now().year
 
-    current_financial_records = FinancialRecord.objects.filter(
-        salon=salon,
-        reference_month=current_month,
-        reference_year=current_year
-    )
-
-    current_income = current_financial_records.filter(transaction_type='income').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-
-    # Separar despesas de funcionários das outras despesas
-    employee_expenses = current_financial_records.filter(
-        transaction_type='expense',
-        category__in=['employee_salary', 'employee_commission']
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    # Outras despesas (excluindo funcionários)
-    current_expenses = current_financial_records.filter(
-        transaction_type='expense'
-    ).exclude(
-        category__in=['employee_salary', 'employee_commission']
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Totais do mês lidos dos consolidados (receitas, despesas de funcionários e demais despesas)
+    summary = monthly_summary(salon, current_year, current_month)
 
     # Calcular custos estimados de funcionários (salários fixos não registrados)
-    from decimal import Decimal
-    estimated_employee_costs = Decimal('0.00')
-    for employee in salon.employees.filter(is_active=True):
-        if employee.payment_type != 'percentage':  # Apenas salários fixos
-            estimated_employee_costs += Decimal(str(employee.calculate_monthly_cost()))
+    estimated_employee_costs = estimated_fixed_employee_costs(salon)
 
     # Total de custos com funcionários
-    total_employee_costs = Decimal(str(employee_expenses)) + estimated_employee_costs
+    total_employee_costs = summary['employee_expenses'] + estimated_employee_costs
 
     financial_summary = {
-        'current_income': current_income,
-        'current_expenses': current_expenses,
+        'current_income': summary['income'],
+        'current_expenses': summary['other_expenses'],
         'employee_costs': total_employee_costs,
         'net_result': Decimal('0.00'),
     }
@@ -143,6 +125,7 @@ def owner_dashboard(request):
         'salon': salon,
         'stats': stats,
         'upcoming_appointments': upcoming_appointments,
+        'today_occupancy': today_occupancy,
         'subscription': subscription,
         'financial_summary': financial_summary,
         'featured_products': featured_products,  # Mudou de suggested_products para featured_products
@@ -238,36 +221,67 @@ def delete_service(request, service_id):
     })
 
 @subscription_required
-def appointments_list(request):
-    """Lista de agendamentos do salão"""
+def salon_analytics_data(request):
+    """Séries por período (diário, semanal ou mensal) para os gráficos do painel"""
     salon = request.user.salon
 
-    # Filtros
-    status_filter = request.GET.get('status', '')
-    date_filter = request.GET.get('date', '')
+    try:
+        date_from = request.GET.get('from')
+        date_to = request.GET.get('to')
+        data = salon_analytics(
+            salon,
+            bucket=request.GET.get('bucket', 'daily'),
+            date_from=datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None,
+            date_to=datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    appointments = Appointment.objects.filter(salon=salon)
+    return JsonResponse(data)
 
-    if status_filter:
-        appointments = appointments.filter(status=status_filter)
-
-    if date_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            appointments = appointments.filter(appointment_date=filter_date)
-        except ValueError:
-            pass
+@subscription_required
+def appointments_list(request):
+    """Lista de agendamentos do salão"""
+    salon = request.user.salon
 
-    appointments = appointments.order_by('-appointment_date', '-appointment_time')
+    # Filtros
+    appointments, status_filter, date_filter = filter_appointments(salon, request.GET)
+
+    # Página atual por cursor, mais recentes primeiro
+    appointments = keyset_paginate(
+        appointments.select_related('client', 'service', 'employee__user'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        descending=True
+    )
 
     return render(request, 'salons/appointments_list.html', {
         'salon': salon,
         'appointments': appointments,
+        'pagination_query': page_querystring(request),
         'status_choices': Appointment.STATUS_CHOICES,
         'status_filter': status_filter,
         'date_filter': date_filter,
+        'xlsx_available': xlsx_available(),
     })
 
+def _export_response(request, rows, filename, fallback_url):
+    """Responde com CSV ou, se pedido e disponível, XLSX"""
+    if request.GET.get('format') == 'xlsx':
+        if not xlsx_available():
+            messages.error(request, 'Exportação em Excel indisponível no momento. Use o formato CSV.')
+            return redirect(fallback_url)
+        return xlsx_response(rows, filename)
+    return csv_response(rows, filename)
+
+@subscription_required
+def export_appointments(request):
+    """Exporta os agendamentos filtrados (CSV ou XLSX)"""
+    salon = request.user.salon
+    appointments = filter_appointments(salon, request.GET)[0]
+    filename = f'agendamentos_{salon.id}_{timezone.localdate():%Y%m%d}'
+    return _export_response(request, appointment_rows(appointments), filename, 'salons:appointments_list')
+
 @login_required
 @require_POST
 def delete_appointment_cascade(request, appointment_id):
@@ -418,7 +432,6 @@ def employee_dashboard(request):
 
     # Estatísticas do funcionário
     today = timezone.now().date()
-    week_start = today - timedelta(days=today.weekday())
 
     my_appointments = Appointment.objects.filter(
         employee=employee,
@@ -426,16 +439,7 @@ def employee_dashboard(request):
     ).order_by('appointment_date', 'appointment_time')
 
     stats = {
-        'appointments_today': my_appointments.filter(
-            appointment_date=today
-        ).count(),
-        'appointments_week': my_appointments.filter(
-            appointment_date__gte=week_start,
-            appointment_date__lte=today
-        ).count(),
-        'pending_appointments': my_appointments.filter(
-            status='scheduled'
-        ).count(),
+        **appointment_stats(my_appointments, today),
         'my_services': employee.services.filter(is_active=True).count(),
     }
 
@@ -447,37 +451,14 @@ def employee_dashboard(request):
     # Calcular ganhos por serviço se o funcionário recebe por porcentagem
     earnings_by_service = []
     if employee.payment_type == 'percentage':
-        # Buscar agendamentos concluídos do mês atual
-        current_month = today.month
-        current_year = today.year
-
-        completed_appointments = Appointment.objects.filter(
+        # Agendamentos concluídos do mês atual, agrupados por serviço no banco
+        month_start = today.replace(day=1)
+        month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+        earnings_by_service = commission_earnings(
             employee=employee,
-            status='completed',
-            appointment_date__month=current_month,
-            appointment_date__year=current_year
-        ).select_related('service')
-
-        # Agrupar por serviço e calcular ganhos
-        service_earnings = {}
-        for appointment in completed_appointments:
-            service = appointment.service
-            earning = service.price * (employee.commission_percentage / 100)
-
-            if service.name in service_earnings:
-                service_earnings[service.name]['count'] += 1
-                service_earnings[service.name]['total_earned'] += earning
-            else:
-                service_earnings[service.name] = {
-                    'service': service,
-                    'count': 1,
-                    'price': service.price,
-                    'commission_rate': employee.commission_percentage,
-                    'earning_per_service': earning,
-                    'total_earned': earning
-                }
-
-        earnings_by_service = list(service_earnings.values())
+            date_from=month_start,
+            date_to=month_end
+        )
 
     total_monthly_earnings = sum(item['total_earned'] for item in earnings_by_service)
 
@@ -520,14 +501,12 @@ def employee_appointments(request):
             Q(appointment_date__lt=today) | 
             Q(status__in=['completed', 'cancelled'])
         )
-        appointments = appointments.order_by('-appointment_date', '-appointment_time')
     else:  # upcoming
         # Para próximos, apenas agendamentos futuros que não foram concluídos ou cancelados
         appointments = base_appointments.filter(
             appointment_date__gte=today,
             status__in=['scheduled', 'confirmed', 'rescheduled']
         )
-        appointments = appointments.order_by('appointment_date', 'appointment_time')
 
     # Aplicar filtros adicionais
     if status_filter:
@@ -540,26 +519,33 @@ def employee_appointments(request):
         except ValueError:
             pass
 
-    # Contar próximos e histórico para exibir nas abas
-    upcoming_count = base_appointments.filter(
-        appointment_date__gte=today,
-        status__in=['scheduled', 'confirmed', 'rescheduled']
-    ).count()
+    # Página atual por cursor (histórico: mais recentes primeiro)
+    appointments = keyset_paginate(
+        appointments,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        descending=view_type == 'history'
+    )
 
-    history_count = base_appointments.filter(
-        Q(appointment_date__lt=today) | 
-        Q(status__in=['completed', 'cancelled'])
-    ).count()
+    # Contar próximos e histórico para exibir nas abas (uma consulta)
+    tab_counts = Appointment.objects.filter(employee=employee).aggregate(
+        upcoming_count=Count('id', filter=Q(
+            appointment_date__gte=today,
+            status__in=['scheduled', 'confirmed', 'rescheduled']
+        )),
+        history_count=Count('id', filter=Q(appointment_date__lt=today) | Q(status__in=['completed', 'cancelled']))
+    )
 
     return render(request, 'salons/employee_appointments.html', {
         'appointments': appointments,
+        'pagination_query': page_querystring(request),
         'employee': employee,
         'salon': salon,
         'status_filter': status_filter,
         'date_filter': date_filter,
         'view_type': view_type,
-        'upcoming_count': upcoming_count,
-        'history_count': history_count,
+        'upcoming_count': tab_counts['upcoming_count'],
+        'history_count': tab_counts['history_count'],
         'status_choices': Appointment.STATUS_CHOICES,
         'today': timezone.now().date()
     })
@@ -604,44 +590,11 @@ def employee_manage_appointment(request, appointment_id):
             messages.success(request, 'Agendamento cancelado.')
 
         elif action == 'complete':
-            appointment.status = 'completed'
-            appointment.save()
-
-            # Criar registro financeiro automático para o serviço concluído
-            from .models import FinancialRecord
-            current_month = appointment.appointment_date.month
-            current_year = appointment.appointment_date.year
-
-            # Criar receita do serviço
-            FinancialRecord.objects.create(
-                salon=employee.salon,
-                transaction_type='income',
-                category='service',
-                amount=appointment.service.price,
-                description=f'Serviço: {appointment.service.name} - Cliente: {appointment.client.get_full_name() or appointment.client.username}',
-                reference_month=current_month,
-                reference_year=current_year,
-                related_appointment=appointment,
-                created_by=request.user
-            )
-
-            # Se o funcionário recebe por comissão, criar registro da comissão
-            if employee.payment_type == 'percentage':
-                commission_amount = appointment.service.price * (employee.commission_percentage / 100)
-                FinancialRecord.objects.create(
-                    salon=employee.salon,
-                    transaction_type='expense',
-                    category='employee_commission',
-                    amount=commission_amount,
-                    description=f'Comissão: {employee.user.get_full_name()} - {appointment.service.name}',
-                    reference_month=current_month,
-                    reference_year=current_year,
-                    related_employee=employee,
-                    related_appointment=appointment,
-                    created_by=request.user
-                )
-
-            messages.success(request, 'Agendamento marcado como concluído!')
+            # Lançamentos financeiros são aplicados pelo outbox de conclusão
+            if complete_appointment(appointment, request.user):
+                messages.success(request, 'Agendamento marcado como concluído!')
+            else:
+                messages.info(request, 'Este agendamento já estava concluído.')
 
     return redirect('salons:employee_appointments')
 
@@ -776,44 +729,11 @@ def manage_appointment_status(request, appointment_id):
             messages.success(request, 'Agendamento cancelado.')
 
         elif action == 'complete':
-            appointment.status = 'completed'
-            appointment.save()
-
-            # Criar registro financeiro automático para o serviço concluído
-            from .models import FinancialRecord
-            current_month = appointment.appointment_date.month
-            current_year = appointment.appointment_date.year
-
-            # Criar receita do serviço
-            FinancialRecord.objects.create(
-                salon=salon,
-                transaction_type='income',
-                category='service',
-                amount=appointment.service.price,
-                description=f'Serviço: {appointment.service.name} - Cliente: {appointment.client.get_full_name() or appointment.client.username}',
-                reference_month=current_month,
-                reference_year=current_year,
-                related_appointment=appointment,
-                created_by=request.user
-            )
-
-            # Se o funcionário recebe por comissão, criar registro da comissão
-            if appointment.employee and appointment.employee.payment_type == 'percentage':
-                commission_amount = appointment.service.price * (appointment.employee.commission_percentage / 100)
-                FinancialRecord.objects.create(
-                    salon=salon,
-                    transaction_type='expense',
-                    category='employee_commission',
-                    amount=commission_amount,
-                    description=f'Comissão: {appointment.employee.user.get_full_name()} - {appointment.service.name}',
-                    reference_month=current_month,
-                    reference_year=current_year,
-                    related_employee=appointment.employee,
-                    related_appointment=appointment,
-                    created_by=request.user
-                )
-
-            messages.success(request, 'Agendamento marcado como concluído e registros financeiros atualizados!')
+            # Lançamentos financeiros são aplicados depois, pela fila de jobs
+            if complete_appointment(appointment, request.user):
+                messages.success(request, 'Agendamento marcado como concluído! Os registros financeiros serão lançados em instantes.')
+            else:
+                messages.info(request, 'Este agendamento já estava concluído.')
 
     return redirect('salons:appointments_list')
 
@@ -829,36 +749,14 @@ def financial_dashboard(request):
     current_month = now.month
     current_year = now.year
 
-    # Buscar registros do mês atual
-    current_records = FinancialRecord.objects.filter(
-        salon=salon,
-        reference_month=current_month,
-        reference_year=current_year
-    )
-
-    # Cálculos do mês atual
-    current_income = current_records.filter(transaction_type='income').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-
-    # Separar despesas de funcionários das outras despesas
-    employee_expenses = current_records.filter(
-        transaction_type='expense',
-        category__in=['employee_salary', 'employee_commission']
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    # Outras despesas (excluindo funcionários)
-    current_expenses = current_records.filter(
-        transaction_type='expense'
-    ).exclude(
-        category__in=['employee_salary', 'employee_commission']
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Cálculos do mês atual a partir dos consolidados
+    summary = monthly_summary(salon, current_year, current_month)
+    current_income = summary['income']
+    employee_expenses = summary['employee_expenses']
+    current_expenses = summary['other_expenses']
 
     # Calcular custos estimados de funcionários (salários fixos não registrados)
-    estimated_employee_costs = 0
-    for employee in salon.employees.filter(is_active=True):
-        if employee.payment_type != 'percentage':  # Apenas salários fixos
-            estimated_employee_costs += employee.calculate_monthly_cost()
+    estimated_employee_costs = estimated_fixed_employee_costs(salon)
 
     # Total de custos com funcionários (registrados + estimados)
     total_employee_costs = employee_expenses + estimated_employee_costs
@@ -869,11 +767,7 @@ def financial_dashboard(request):
     ).order_by('-created_at')[:10]
 
     # Resumo por categoria de despesas
-    expense_categories = current_records.filter(
-        transaction_type='expense'
-    ).values('category').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
+    expense_categories = summary['expense_categories']
 
     context = {
         'salon': salon,
@@ -945,23 +839,7 @@ def financial_records_list(request):
     salon = request.user.salon
 
     # Filtros
-    month_filter = request.GET.get('month')
-    year_filter = request.GET.get('year')
-    type_filter = request.GET.get('type')
-    category_filter = request.GET.get('category')
-
-    records = FinancialRecord.objects.filter(salon=salon)
-
-    if month_filter:
-        records = records.filter(reference_month=int(month_filter))
-    if year_filter:
-        records = records.filter(reference_year=int(year_filter))
-    if type_filter:
-        records = records.filter(transaction_type=type_filter)
-    if category_filter:
-        records = records.filter(category=category_filter)
-
-    records = records.order_by('-reference_year', '-reference_month', '-created_at')
+    records, filters = filter_financial_records(salon, request.GET)
 
     # Totalizadores
     total_income = records.filter(transaction_type='income').aggregate(
@@ -977,16 +855,20 @@ def financial_records_list(request):
         'total_income': total_income,
         'total_expenses': total_expenses,
         'net_result': total_income - total_expenses,
-        'filters': {
-            'month': month_filter,
-            'year': year_filter,
-            'type': type_filter,
-            'category': category_filter,
-        }
+        'filters': filters,
+        'xlsx_available': xlsx_available(),
     }
 
     return render(request, 'salons/financial_records_list.html', context)
 
+@subscription_required
+def export_financial_records(request):
+    """Exporta os registros financeiros filtrados (CSV ou XLSX)"""
+    salon = request.user.salon
+    records = filter_financial_records(salon, request.GET)[0]
+    filename = f'registros_financeiros_{salon.id}_{timezone.localdate():%Y%m%d}'
+    return _export_response(request, financial_record_rows(records), filename, 'salons:financial_records_list')
+
 @subscription_required
 def generate_employee_expenses(request):
     """Gerar despesas automáticas dos funcionários para o mês atual"""
@@ -1008,13 +890,15 @@ def generate_employee_expenses(request):
             messages.warning(request, f'Já existem {existing_records} registros de salários para {month}/{year}')
             return redirect('salons:financial_dashboard')
 
-        # Criar registros para funcionários ativos
-        created_count = 0
-        for employee in salon.employees.filter(is_active=True):
-            if employee.payment_type != 'percentage':  # Não criar para comissionados
+        # Criar registros para funcionários ativos (gravados em lote)
+        employees = salon.employees.filter(is_active=True).exclude(
+            payment_type='percentage'  # Não criar para comissionados
+        ).select_related('user')
+        with LedgerWriter() as writer:
+            for employee in employees:
                 monthly_cost = employee.calculate_monthly_cost()
                 if monthly_cost > 0:
-                    FinancialRecord.objects.create(
+                    writer.add(FinancialRecord(
                         salon=salon,
                         transaction_type='expense',
                         category='employee_salary',
@@ -1024,10 +908,9 @@ def generate_employee_expenses(request):
                         reference_year=year,
                         related_employee=employee,
                         created_by=request.user
-                    )
-                    created_count += 1
+                    ))
 
-        messages.success(request, f'{created_count} registros de salários gerados para {month}/{year}!')
+        messages.success(request, f'{writer.created} registros de salários gerados para {month}/{year}!')
         return redirect('salons:financial_dashboard')
 
     return redirect('salons:financial_dashboard')
@@ -81,6 +81,7 @@ const getChartColors = (theme = 'light') => {
 // Initialize charts when DOM is ready
 document.addEventListener('DOMContentLoaded', function() {
     initializeCharts();
+    initializeAnalyticsCharts();
     
     // Listen for theme changes
     window.addEventListener('themeChanged', function(e) {
@@ -364,9 +365,89 @@ function loadChart(container, chartType) {
     }, 500);
 }
 
+// Analytics charts fed by the salon analytics endpoint.
+// Containers sharing the same data-analytics-url reuse a single request.
+function initializeAnalyticsCharts() {
+    const containers = document.querySelectorAll('.chart-container[data-analytics-url]');
+    const requests = {};
+
+    containers.forEach(container => {
+        const url = container.dataset.analyticsUrl;
+        if (!requests[url]) {
+            requests[url] = fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    return response.json();
+                });
+        }
+
+        requests[url]
+            .then(data => {
+                const canvas = document.createElement('canvas');
+                container.innerHTML = '';
+                container.appendChild(canvas);
+                const chartType = container.dataset.analyticsChart;
+                chartInstances[`analytics_${chartType}`] = createAnalyticsChart(canvas, chartType, data);
+            })
+            .catch(() => {
+                container.innerHTML = '<p class="text-muted text-center my-4">Não foi possível carregar o gráfico.</p>';
+            });
+    });
+}
+
+function createAnalyticsChart(ctx, chartType, data) {
+    const currentTheme = document.documentElement.getAttribute('data-theme') || 'light';
+    const colors = getChartColors(currentTheme);
+    const palette = [colors.primary, colors.success, colors.warning, colors.danger, colors.info];
+    const labels = data.labels.map(label => label.split('-').reverse().join('/'));
+
+    let type = 'line';
+    let datasets = [];
+
+    switch (chartType) {
+        case 'bookings':
+            type = 'bar';
+            datasets = [
+                { label: 'Agendamentos', data: data.series.bookings, backgroundColor: colors.primary },
+                { label: 'Cancelamentos', data: data.series.cancellations, backgroundColor: colors.danger }
+            ];
+            break;
+        case 'revenue':
+            datasets = [{
+                label: 'Receita (R$)',
+                data: data.series.revenue.map(Number),
+                borderColor: colors.success,
+                backgroundColor: colors.success + '20',
+                borderWidth: 3,
+                fill: true,
+                tension: 0.4
+            }];
+            break;
+        case 'utilization':
+            datasets = data.utilization.map((employee, index) => ({
+                label: employee.name,
+                data: employee.data,
+                borderColor: palette[index % palette.length],
+                backgroundColor: palette[index % palette.length] + '20',
+                borderWidth: 2,
+                tension: 0.3
+            }));
+            break;
+    }
+
+    return new Chart(ctx, {
+        type: type,
+        data: { labels: labels, datasets: datasets },
+        options: chartConfig
+    });
+}
+
 // Export for global access
 window.chartUtils = {
     initializeCharts,
+    initializeAnalyticsCharts,
     setupLazyCharts,
     updateChartsTheme,
     chartInstances
@@ -1,3 +1,37 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.backends import UserContextBackend
+from subscriptions.models import Subscription
+from subscriptions.utils.access import subscription_access
+
+
+class SubscriptionAccessTests(TestCase):
+    """A decisão de acesso usa a assinatura carregada junto com o usuário da sessão"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('dono', 'dono@example.com', 'senha')
+
+    def access(self):
+        user = UserContextBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            return subscription_access(SimpleNamespace(user=user))
+
+    def test_without_subscription(self):
+        self.assertEqual(self.access(), {'exists': False, 'active': False, 'until': None})
+
+    def test_active_subscription(self):
+        subscription = Subscription.objects.create(user=self.user, plan_type='vip_30')
+        access = self.access()
+        self.assertTrue(access['exists'] and access['active'])
+        self.assertEqual(access['until'], subscription.end_date)
+
+    def test_cancellation_applies_on_the_next_request(self):
+        subscription = Subscription.objects.create(user=self.user)
+        self.assertTrue(self.access()['active'])
+
+        subscription.status = 'cancelled'
+        subscription.save()
+        self.assertEqual(self.access()['active'], False)
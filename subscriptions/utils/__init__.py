@@ -0,0 +1 @@
+# Utils package for subscriptions
@@ -0,0 +1,20 @@
+"""
+Decisão de acesso por assinatura (ativa até quando).
+A assinatura já vem carregada junto com o usuário da sessão
+(UserContextBackend usa select_related), então a decisão não faz consulta extra.
+"""
+
+
+def subscription_access(request):
+    """
+    Situação da assinatura do usuário logado.
+
+    Returns:
+        dict: {'exists': bool, 'active': bool, 'until': datetime ou None}
+    """
+    subscription = getattr(request.user, 'subscription', None)
+    return {
+        'exists': subscription is not None,
+        'active': bool(subscription and subscription.is_active()),
+        'until': subscription.end_date if subscription else None,
+    }
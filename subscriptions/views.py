@@ -3,7 +3,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from .models import Subscription
-from admin_panel.models import PlanPricing
+from .utils.access import subscription_access
+from admin_panel.utils.pricing import active_plan_list
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,7 +38,7 @@ def subscription_detail(request):
         logger.info(f"DEBUG: Usuário {request.user.email} não possui assinatura.")
 
     # Buscar planos disponíveis
-    available_plans = PlanPricing.objects.filter(is_active=True).order_by('plan_type')
+    available_plans = active_plan_list()
 
     return render(request, 'subscriptions/detail.html', {
         'subscription': subscription,
@@ -107,8 +108,7 @@ def subscription_required(view_func):
             messages.error(request, 'Acesso negado.')
             return redirect('accounts:dashboard')
 
-        subscription = getattr(request.user, 'subscription', None)
-        if not subscription or not subscription.is_active():
+        if not subscription_access(request)['active']:
             messages.warning(request, 'Sua assinatura expirou. Renove para continuar usando o sistema.')
             return redirect('subscriptions:detail')
 
@@ -126,7 +126,7 @@ def detail(request):
     subscription = getattr(request.user, 'subscription', None)
 
     # Buscar planos disponíveis
-    available_plans = PlanPricing.objects.filter(is_active=True).order_by('plan_type')
+    available_plans = active_plan_list()
 
     context = {
         'subscription': subscription,